@@ -0,0 +1,114 @@
+"""
+Cold-start benchmark: how long `import src.agent` takes in a fresh interpreter.
+
+Each run is a new `python -X importtime` process, so nothing is cached in
+sys.modules. Reports the median wall time of the import and the modules with
+the largest cumulative import time (from the median run), and writes them
+as JSON. Heavy SDKs that should stay lazy are listed as "loaded" if the
+import pulled them in anyway.
+
+    cd agent && python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# Imported on first use, never by `import src.agent`.
+LAZY_MODULES = ["google.generativeai", "google.genai", "pydantic_ai.models.google", "psycopg2"]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import src.agent
+elapsed = time.perf_counter() - start
+print("RESULT", elapsed, ",".join(m for m in {lazy!r} if m in sys.modules))
+"""
+
+
+def one_run() -> tuple[float, list[str], list[tuple[str, int]]]:
+    env = {**os.environ, "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "benchmark")}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", PROBE.format(lazy=LAZY_MODULES)],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    result = next(line for line in proc.stdout.splitlines() if line.startswith("RESULT"))
+    _, elapsed, loaded = (result.split(" ") + [""])[:3]
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(cumulative)))
+    return float(elapsed), [m for m in loaded.split(",") if m], modules
+
+
+def run(args) -> dict:
+    runs = []
+    for _ in range(args.runs):
+        runs.append(one_run())
+        print(f"import src.agent: {runs[-1][0] * 1000:.0f}ms", file=sys.stderr)
+
+    times = [r[0] for r in runs]
+    median_run = sorted(runs, key=lambda r: r[0])[len(runs) // 2]
+    top = sorted(median_run[2], key=lambda m: -m[1])[:args.top]
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "import_ms": {
+            "median": round(statistics.median(times) * 1000, 1),
+            "min": round(min(times) * 1000, 1),
+            "max": round(max(times) * 1000, 1),
+        },
+        "lazy_modules_loaded": median_run[1],
+        "top_modules_ms": {name: round(us / 1000, 1) for name, us in top},
+    }
+
+
+def compare(before_path: str, after_path: str) -> None:
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    for stat in ("median", "min", "max"):
+        a, b = before["import_ms"][stat], after["import_ms"][stat]
+        print(f"import {stat:<8}{a:>10}{b:>10}{(b - a) / a * 100:>+9.1f}%")
+    print(f"lazy modules loaded: {before['lazy_modules_loaded']} -> {after['lazy_modules_loaded']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to report")
+    parser.add_argument("--out", default="benchmarks/results/import_time.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args)
+    print(json.dumps(report["import_ms"]), file=sys.stderr)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Offline load test and latency benchmark for the agent service.
+
+Serves the real `main_app` with uvicorn inside this process, swaps Gemini
+for stand-ins (a pydantic-ai FunctionModel for AG-UI runs, a fake `genai`
+model for /chat/completions) and Postgres for a seeded SQLite file, then
+drives each scenario at a fixed concurrency. Reports p50/p95/p99 latency,
+SSE time-to-first-byte and requests/sec, and writes them as JSON.
+
+    cd agent && python -m benchmarks.load_test --agencies 500 --requests 200 --concurrency 20
+    python -m benchmarks.load_test --compare before.json after.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import uuid
+from typing import Awaitable, Callable
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+import uvicorn  # noqa: E402
+
+from benchmarks.stand_ins import FakeGenerativeModel, SQLitePool, scripted_model, seed_companies  # noqa: E402
+from src import agent as service  # noqa: E402
+from src.catalog import catalog  # noqa: E402
+from src.contact_queue import contact_queue  # noqa: E402
+from src.metrics import timed_model  # noqa: E402
+from src.search_index import search_index  # noqa: E402
+from src.sessions import SessionDeps  # noqa: E402
+
+Sample = tuple[float, float | None]  # (latency seconds, ttfb seconds or None)
+
+
+def summarize(samples: list[Sample], wall: float, errors: int) -> dict:
+    latencies = np.array([s[0] for s in samples]) * 1000
+    ttfbs = np.array([s[1] for s in samples if s[1] is not None]) * 1000
+    result = {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / wall, 1) if wall else None,
+    }
+    if latencies.size:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        result.update(latency_ms={"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3)})
+    if ttfbs.size:
+        p50, p95, p99 = np.percentile(ttfbs, [50, 95, 99])
+        result.update(ttfb_ms={"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3)})
+    return result
+
+
+async def drive(one: Callable[[int], Awaitable[Sample]], total: int, concurrency: int) -> dict:
+    """Run `total` calls of `one` with at most `concurrency` in flight."""
+    slots = asyncio.Semaphore(concurrency)
+    samples: list[Sample] = []
+    errors = 0
+
+    async def task(i: int):
+        nonlocal errors
+        async with slots:
+            try:
+                samples.append(await one(i))
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"  first error: {e!r}", file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(task(i) for i in range(total)))
+    return summarize(samples, time.perf_counter() - start, errors)
+
+
+async def timed_stream(client: httpx.AsyncClient, url: str, payload: dict) -> Sample:
+    """POST and read an SSE body, timing the first chunk and the end."""
+    start = time.perf_counter()
+    ttfb = None
+    async with client.stream("POST", url, json=payload, headers={"accept": "text/event-stream"}) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if ttfb is None and chunk.strip():
+                ttfb = time.perf_counter() - start
+    return time.perf_counter() - start, ttfb
+
+
+def ag_ui_payload(prompt: str) -> dict:
+    return {
+        "threadId": f"bench-{uuid.uuid4()}",
+        "runId": str(uuid.uuid4()),
+        "state": {},
+        "messages": [{"id": "m1", "role": "user", "content": prompt}],
+        "tools": [],
+        "context": [],
+        "forwardedProps": {},
+    }
+
+
+def tool_call(name: str, **kwargs):
+    """Call an agent tool directly with a fresh session, timing it."""
+    func = getattr(service, name)
+
+    async def one(i: int) -> Sample:
+        ctx = types.SimpleNamespace(deps=SessionDeps(state=service.AppState(), thread_id=f"bench-{i}"))
+        start = time.perf_counter()
+        result = await func(ctx, **kwargs)
+        elapsed = time.perf_counter() - start
+        payload = getattr(result, "return_value", result)
+        if not payload.get("success"):
+            raise RuntimeError(payload.get("error") or payload.get("message"))
+        return elapsed, None
+
+    return one
+
+
+PROFILE = {"industry": "fintech", "stage": "series_a", "target_market": "mid-market banks", "budget": 15000}
+
+
+def search_after_profile(prefetched: bool, gap_ms: float):
+    """Time search_agencies after update_company_info, as the model would call them.
+
+    With `prefetched` the update goes through the tool (which starts the
+    prefetch) and the search follows after a model turn's worth of delay;
+    otherwise the profile is set directly and the search ranks live.
+    """
+    async def one(i: int) -> Sample:
+        state = service.AppState() if prefetched else service.AppState(**PROFILE)
+        ctx = types.SimpleNamespace(deps=SessionDeps(state=state, thread_id=f"bench-profile-{i}"))
+        if prefetched:
+            await service.update_company_info(ctx, **PROFILE)
+            await asyncio.sleep(gap_ms / 1000)
+        start = time.perf_counter()
+        result = await service.search_agencies(ctx)
+        elapsed = time.perf_counter() - start
+        if not getattr(result, "return_value", result).get("success"):
+            raise RuntimeError("search failed")
+        return elapsed, None
+
+    return one
+
+
+async def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="gtm-bench-")
+    db_path = os.path.join(workdir, "companies.db")
+    seed_companies(db_path, args.agencies)
+
+    pool = SQLitePool(db_path, latency_ms=args.db_latency_ms)
+    service.db = pool
+    catalog.pool = pool
+    search_index.pool = pool
+    contact_queue.pool = pool
+    contact_queue.path = os.path.join(workdir, "contact-spool.jsonl")
+    search_index.directory = os.path.join(workdir, "search-index")
+    FakeGenerativeModel.ttft = args.llm_ttft_ms / 1000
+    FakeGenerativeModel.token_delay = args.llm_token_ms / 1000
+    service.voice_sessions.model_factory = lambda system_instruction: FakeGenerativeModel(
+        system_instruction=system_instruction
+    )
+
+    config = uvicorn.Config(service.main_app, host="127.0.0.1", port=0, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    # The override is context-local, so it must wrap the task serving requests.
+    model = timed_model(scripted_model(args.llm_ttft_ms, args.llm_token_ms), "ag_ui")
+    with service.agent.override(model=model):
+        serve_task = asyncio.create_task(server.serve())
+    while not (server.started and search_index.is_ready and service.warm_up.done):
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+
+    results: dict = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    clm_turns = itertools.count()
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as client:
+            scenarios: dict[str, Callable[[int], Awaitable[Sample]]] = {
+                "ag_ui_chat": lambda i: timed_stream(client, "/", ag_ui_payload("hello")),
+                "ag_ui_search_agencies": lambda i: timed_stream(
+                    client, "/", ag_ui_payload('tool:search_agencies {"specialization": "ABM"}')
+                ),
+                # Unique turns, so every request misses the reply cache.
+                "clm_voice": lambda i: timed_stream(
+                    client, "/chat/completions",
+                    {"messages": [{"role": "user", "content": f"what is plg {next(clm_turns)}"}]},
+                ),
+                "clm_voice_cached": lambda i: timed_stream(
+                    client, "/chat/completions",
+                    {"messages": [{"role": "user", "content": "What is PLG?"}]},
+                ),
+                "tool_search_agencies": tool_call("search_agencies", location="London", specialization="ABM"),
+                "tool_search_profile_live": search_after_profile(False, args.llm_ttft_ms),
+                "tool_search_profile_prefetched": search_after_profile(True, args.llm_ttft_ms),
+                "tool_generate_report_playbook": tool_call(
+                    "generate_report", strategy_type="sales_led", total_budget=PROFILE["budget"],
+                ),
+                "tool_get_top_agencies": tool_call("get_top_agencies", limit=10),
+                "tool_get_agency_details": tool_call("get_agency_details", slug="agency-1"),
+                "tool_search_knowledge": tool_call("search_knowledge", query="ABM playbook for fintech"),
+                "tool_save_contact_request": tool_call(
+                    "save_contact_request", full_name="Bench User", email="bench@example.com",
+                ),
+            }
+            for name, one in scenarios.items():
+                if args.only and name not in args.only:
+                    continue
+                # Warm up (JIT-free, but fills caches and pools fairly).
+                await drive(one, min(args.concurrency, args.requests), args.concurrency)
+                results[name] = await drive(one, args.requests, args.concurrency)
+                print(f"{name:<28}{json.dumps(results[name])}", file=sys.stderr)
+    finally:
+        server.should_exit = True
+        await serve_task
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "results": results,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """Print p50/p95 latency, TTFB and rps deltas between two result files."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(f"{'scenario':<28}{'metric':<16}{'before':>12}{'after':>12}{'change':>10}")
+    for name, new in after["results"].items():
+        old = before["results"].get(name)
+        if not old:
+            continue
+        metrics = [("rps", old.get("rps"), new.get("rps"))]
+        for group in ("latency_ms", "ttfb_ms"):
+            for p in ("p50", "p95"):
+                if group in old and group in new:
+                    metrics.append((f"{group[:-3]} {p}", old[group][p], new[group][p]))
+        for metric, a, b in metrics:
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"{name:<28}{metric:<16}{a:>12}{b:>12}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agencies", type=int, default=500, help="synthetic companies rows to seed")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-ttft-ms", type=float, default=300, help="stand-in LLM time to first token")
+    parser.add_argument("--llm-token-ms", type=float, default=20, help="stand-in LLM inter-token delay")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="extra latency per DB call")
+    parser.add_argument("--only", nargs="*", help="run just these scenarios")
+    parser.add_argument("--out", default="benchmarks/results/latest.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = asyncio.run(run(args))
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Tool-call output size and fill latency for playbook-backed reports.
+
+For each strategy type over a spread of company profiles, compares the
+generate_report arguments the model has to write:
+
+- written: strategy name, summary, action items, audience and phases spelled
+  out in full (the rendered playbook stands in for what the model used to
+  write from scratch),
+- playbook: just the strategy type, with the tool filling the rest.
+
+Tokens are estimated at --chars-per-token and turned into decode time at
+--tokens-per-sec. Also times a playbook render, which replaces that decode.
+
+    cd agent && python -m benchmarks.playbooks
+"""
+import argparse
+import json
+import timeit
+from itertools import product
+
+from src.playbooks import playbooks
+
+STAGES = ["seed", "series_a", "growth"]
+INDUSTRIES = ["saas", "fintech", "devtools", "healthcare"]
+
+
+def written_arguments(strategy_type: str, stage: str, industry: str) -> dict:
+    playbook = playbooks.render(strategy_type, stage, industry, "Acme", "mid-market operations teams")
+    return {
+        "strategy_type": strategy_type,
+        "strategy_name": playbook.name,
+        "summary": playbook.summary,
+        "action_items": playbook.action_items,
+        "recommended_for": playbook.recommended_for,
+        "phases": playbook.phases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chars-per-token", type=float, default=4.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=150.0, help="model decode rate")
+    args = parser.parse_args()
+
+    print(f"playbook library v{playbooks.version}")
+    print(f"{'strategy':<12}{'written tok':>13}{'playbook tok':>14}{'decode saved':>14}{'render (us)':>13}")
+    for strategy_type in ("plg", "sales_led", "hybrid"):
+        profiles = list(product(STAGES, INDUSTRIES))
+        written = sum(
+            len(json.dumps(written_arguments(strategy_type, *p))) for p in profiles
+        ) / len(profiles) / args.chars_per_token
+        short = len(json.dumps({"strategy_type": strategy_type})) / args.chars_per_token
+        render = min(timeit.repeat(
+            lambda: playbooks.render(strategy_type, "series_a", "fintech", "Acme", "mid-market operations teams"),
+            number=2000, repeat=5,
+        )) / 2000 * 1e6
+        saved = (written - short) / args.tokens_per_sec
+        print(f"{strategy_type:<12}{written:>13.0f}{short:>14.0f}{saved:>13.1f}s{render:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+SSE encoding and write throughput, in frames/sec and bytes/sec.
+
+- encode: CLM content frames built by dumping a fresh nested dict per frame
+  (how they used to be built) vs from sse.ChunkFrames' pre-serialized
+  template, one frame per word.
+- stream_clm / stream_ag_ui: a whole reply pushed through the response
+  pipeline (stream_sse_response, or AG-UI TEXT_MESSAGE_CONTENT events, then
+  sse.coalesce), with every frame written separately (flush interval 0)
+  and coalesced. Counts the writes the ASGI server would make per reply.
+- http_ag_ui (--http): the same AG-UI replies served by uvicorn on
+  localhost and read by --concurrency httpx clients, so socket writes and
+  ASGI messages are part of the cost.
+
+Tokens arrive every --token-us microseconds (0 = as fast as possible).
+
+    cd agent && python -m benchmarks.sse_throughput --frames 200000 --http
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import httpx
+import uvicorn
+from ag_ui.core import TextMessageContentEvent
+from ag_ui.encoder import EventEncoder
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from src.sse import SSE_FLUSH_INTERVAL, ChunkFrames, coalesce, orjson
+from src.voice import stream_sse_response
+
+WORDS = (
+    "For a seed-stage SaaS company, product-led growth usually works best, because users can "
+    "try the product before talking to sales. What does your current onboarding look like?"
+).split(" ")
+
+
+def dict_frame(msg_id: str, content: str) -> str:
+    chunk = {
+        "id": msg_id,
+        "object": "chat.completion.chunk",
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+def bench_encode(frames: int) -> dict:
+    words = [WORDS[i % len(WORDS)] + " " for i in range(frames)]
+    results = {}
+
+    start = time.perf_counter()
+    size = sum(len(dict_frame("clm-1", w)) for w in words)
+    results["dict_dumps"] = _rates(frames, size, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    template = ChunkFrames("clm-1")
+    size = sum(len(template.content(w)) for w in words)
+    results["template"] = _rates(frames, size, time.perf_counter() - start)
+    return results
+
+
+async def _tokens(count: int, delay: float):
+    for i in range(count):
+        if delay:
+            await asyncio.sleep(delay)
+        yield WORDS[i % len(WORDS)] + " "
+
+
+async def _ag_ui_frames(count: int, delay: float):
+    encoder = EventEncoder()
+    async for token in _tokens(count, delay):
+        yield encoder.encode(TextMessageContentEvent(message_id="m1", delta=token))
+
+
+async def _drain(stream) -> tuple[int, int, int]:
+    writes = frames = size = 0
+    async for chunk in stream:
+        writes += 1
+        frames += chunk.count(b"data: ")
+        size += len(chunk)
+    return writes, frames, size
+
+
+async def bench_stream(kind: str, replies: int, tokens: int, delay: float, interval: float) -> dict:
+    writes = frames = size = 0
+    start = time.perf_counter()
+    for i in range(replies):
+        if kind == "clm":
+            source = stream_sse_response(_tokens(tokens, delay), f"clm-{i}")
+        else:
+            source = _ag_ui_frames(tokens, delay)
+        w, f, s = await _drain(coalesce(source, flush_interval=interval))
+        writes, frames, size = writes + w, frames + f, size + s
+    result = _rates(frames, size, time.perf_counter() - start)
+    result["writes_per_reply"] = round(writes / replies, 1)
+    result["frames_per_reply"] = round(frames / replies, 1)
+    return result
+
+
+async def bench_http(replies: int, tokens: int, delay: float, interval: float, concurrency: int) -> dict:
+    async def endpoint(request):
+        return StreamingResponse(
+            coalesce(_ag_ui_frames(tokens, delay), flush_interval=interval), media_type="text/event-stream",
+        )
+
+    app = Starlette(routes=[Route("/", endpoint, methods=["POST"])])
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    frames = size = 0
+    remaining = iter(range(replies))
+
+    async def worker(client):
+        nonlocal frames, size
+        for _ in remaining:
+            async with client.stream("POST", "/") as response:
+                async for chunk in response.aiter_bytes():
+                    frames += chunk.count(b"data: ")
+                    size += len(chunk)
+
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+    finally:
+        server.should_exit = True
+        await serve_task
+    return _rates(frames, size, elapsed)
+
+
+def _rates(frames: int, size: int, elapsed: float) -> dict:
+    return {
+        "frames_per_sec": round(frames / elapsed),
+        "bytes_per_sec": round(size / elapsed),
+        "seconds": round(elapsed, 3),
+    }
+
+
+async def run(args) -> dict:
+    report = {"encode": bench_encode(args.frames)}
+    delay = args.token_us / 1e6
+    for kind in ("clm", "ag_ui"):
+        report[f"stream_{kind}"] = {
+            "per_frame": await bench_stream(kind, args.replies, args.tokens, delay, 0),
+            "coalesced": await bench_stream(kind, args.replies, args.tokens, delay, args.flush_interval),
+        }
+    if args.http:
+        report["http_ag_ui"] = {
+            "per_frame": await bench_http(args.replies, args.tokens, delay, 0, args.concurrency),
+            "coalesced": await bench_http(args.replies, args.tokens, delay, args.flush_interval, args.concurrency),
+        }
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "json_backend": "orjson" if orjson is not None else "json",
+        "params": {k: v for k, v in vars(args).items() if k != "out"},
+        **report,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200_000, help="frames to encode")
+    parser.add_argument("--replies", type=int, default=200, help="replies to stream")
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per reply")
+    parser.add_argument("--token-us", type=float, default=0, help="microseconds between tokens")
+    parser.add_argument("--http", action="store_true", help="also stream over localhost HTTP")
+    parser.add_argument("--concurrency", type=int, default=8, help="HTTP clients (--http)")
+    parser.add_argument("--flush-interval", type=float, default=SSE_FLUSH_INTERVAL or 0.005)
+    parser.add_argument("--out", default="benchmarks/results/sse_throughput.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    for name, results in report.items():
+        if isinstance(results, dict) and name.startswith(("encode", "stream", "http")):
+            for mode, r in results.items():
+                extra = f"  {r['writes_per_reply']} writes/reply" if "writes_per_reply" in r else ""
+                print(
+                    f"{name:<14}{mode:<12}{r['frames_per_sec']:>12,} frames/s{r['bytes_per_sec'] / 1e6:>10.1f} MB/s{extra}",
+                    file=sys.stderr,
+                )
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Offline stand-ins for the agent's upstream services.
+
+- `SQLitePool`: the `DatabasePool` interface over a SQLite file seeded with a
+  synthetic `companies` table, so the catalog and DB tools run unmodified.
+- `FakeGenerativeModel`: a `google.generativeai` model whose chat streams
+  canned tokens with configurable time-to-first-token and inter-token delay.
+- `scripted_model`: a pydantic-ai `FunctionModel` that optionally calls one
+  tool and then streams a short reply, standing in for Gemini on AG-UI runs.
+"""
+import asyncio
+import json
+import random
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional, Sequence
+
+from pydantic_ai.messages import ModelMessage, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+ARRAY_COLUMNS = ("specializations", "service_areas", "key_services")
+
+SPECIALIZATIONS = [
+    "Demand Generation", "ABM", "PLG", "Content Marketing", "SEO", "Paid Media",
+    "Sales Development", "RevOps", "Brand Strategy", "Lifecycle Marketing",
+    "Partner Marketing", "Product Marketing",
+]
+CITIES = [
+    "London, UK", "New York, NY", "San Francisco, CA", "Austin, TX", "Berlin, Germany",
+    "Toronto, Canada", "Sydney, Australia", "Amsterdam, Netherlands", "Chicago, IL", "Remote",
+]
+INDUSTRIES = ["SaaS", "fintech", "healthcare", "developer tools", "ecommerce", "cybersecurity", "edtech"]
+ARTICLE_SENTENCES = [
+    "start with a narrow ideal customer profile and expand once win rates are stable.",
+    "instrument activation so the product surfaces expansion signals to sales.",
+    "pair intent data with tight sales and marketing handoffs.",
+    "measure payback by channel rather than blended CAC.",
+    "build a content engine around the questions buyers ask in discovery calls.",
+]
+REGIONS = ["UK", "US", "EMEA", "North America", "APAC", "Remote", "Europe", "Global"]
+
+REPLY_TOKENS = (
+    "Great question! For a seed-stage SaaS company, product-led growth usually "
+    "works best, because users can try the product before talking to sales. "
+    "What does your current onboarding look like?"
+).split(" ")
+
+
+def seed_companies(path: str, count: int, seed: int = 7, articles_count: int = 500) -> None:
+    """Create and fill `companies`, `articles` and `contact_submissions` in a SQLite file."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        DROP TABLE IF EXISTS companies;
+        DROP TABLE IF EXISTS contact_submissions;
+        DROP TABLE IF EXISTS articles;
+        CREATE TABLE companies (
+            id INTEGER PRIMARY KEY, app TEXT, status TEXT, slug TEXT UNIQUE, name TEXT,
+            description TEXT, overview TEXT, headquarters TEXT, logo_url TEXT, website TEXT,
+            specializations TEXT, service_areas TEXT, key_services TEXT, global_rank INTEGER,
+            founded_year INTEGER, employee_count TEXT, pricing_model TEXT, min_budget INTEGER,
+            avg_rating REAL, review_count INTEGER, updated_at TEXT
+        );
+        CREATE TABLE articles (
+            id INTEGER PRIMARY KEY, app TEXT, status TEXT, slug TEXT UNIQUE, title TEXT, excerpt TEXT,
+            meta_description TEXT, content TEXT, guide_type TEXT, category TEXT
+        );
+        CREATE TABLE contact_submissions (
+            id INTEGER PRIMARY KEY, submission_type TEXT, full_name TEXT, email TEXT,
+            company_name TEXT, message TEXT, site TEXT, created_at TEXT, idempotency_key TEXT
+        );
+        CREATE UNIQUE INDEX contact_submissions_idempotency_key_idx
+            ON contact_submissions (idempotency_key) WHERE idempotency_key IS NOT NULL;
+    """)
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(1, count + 1):
+        specs = rng.sample(SPECIALIZATIONS, rng.randint(1, 4))
+        rows.append((
+            i, "gtm", "published" if rng.random() > 0.05 else "draft", f"agency-{i}", f"Agency {i}",
+            f"{specs[0]} agency helping B2B companies grow.", f"Agency {i} runs {', '.join(specs)} programs.",
+            rng.choice(CITIES), None, f"https://agency-{i}.example.com",
+            json.dumps(specs), json.dumps(rng.sample(REGIONS, rng.randint(1, 3))),
+            json.dumps([f"{s} programs" for s in specs]),
+            i if rng.random() > 0.3 else None, rng.randint(1995, 2023), rng.choice(["1-10", "11-50", "51-200"]),
+            rng.choice(["retainer", "project", "hourly"]), rng.choice([None, 2000, 5000, 10000, 25000]),
+            round(rng.uniform(3.5, 5.0), 1), rng.randint(0, 200),
+            (now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))).isoformat(),
+        ))
+    conn.executemany(f"INSERT INTO companies VALUES ({', '.join('?' * 21)})", rows)
+
+    articles = []
+    for i in range(1, articles_count + 1):
+        topic = rng.choice(SPECIALIZATIONS)
+        industry = rng.choice(INDUSTRIES)
+        body = " ".join(
+            f"{rng.choice(SPECIALIZATIONS)} for {rng.choice(INDUSTRIES)} teams: {rng.choice(ARTICLE_SENTENCES)}"
+            for _ in range(40)
+        )
+        articles.append((
+            i, "gtm", "published", f"article-{i}", f"{topic} playbook for {industry} companies",
+            f"How {industry} companies run {topic}.", None, body, "guide", industry,
+        ))
+    conn.executemany("INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", articles)
+    conn.commit()
+    conn.close()
+
+
+class SQLitePool:
+    """Async `DatabasePool` look-alike backed by SQLite."""
+
+    def __init__(self, path: str, latency_ms: float = 0.0):
+        self.path = path
+        self.latency = latency_ms / 1000
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._conn is not None
+
+    async def open(self) -> None:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+
+    async def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    async def fetch_all(self, query: str, params: Optional[Sequence[Any]] = None) -> list[dict]:
+        return await self.run(lambda conn: self._execute(conn, query, params))
+
+    async def fetch_one(self, query: str, params: Optional[Sequence[Any]] = None) -> Optional[dict]:
+        rows = await self.run(lambda conn: self._execute(conn, query, params))
+        return rows[0] if rows else None
+
+    async def fetch_prepared(self, name: str, query: str, params: Optional[Sequence[Any]] = None) -> list[dict]:
+        # SQLite caches compiled statements itself. $n -> ?, with params in
+        # placeholder order (numbered ?n with a sequence is deprecated).
+        params = list(params or [])
+        ordered = [params[int(n) - 1] for n in re.findall(r"\$(\d+)", query)]
+        return await self.fetch_all(re.sub(r"\$\d+", "?", query), ordered)
+
+    async def run(self, work: Callable[[Any], Any]) -> Any:
+        if self._conn is None:
+            await self.open()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await asyncio.to_thread(self._locked, work)
+
+    def _locked(self, work):
+        with self._lock:
+            return work(self._conn)
+
+    @staticmethod
+    def _execute(conn, query: str, params) -> list[dict]:
+        """Run a psycopg2-style query (%s placeholders, NOW()) on SQLite."""
+        query = query.replace("%s", "?").replace("NOW()", "CURRENT_TIMESTAMP")
+        params = [p.isoformat() if isinstance(p, datetime) else p for p in (params or [])]
+        return [_decode(row) for row in conn.execute(query, params).fetchall()]
+
+
+def _decode(row: sqlite3.Row) -> dict:
+    data = dict(row)
+    for column in ARRAY_COLUMNS:
+        if isinstance(data.get(column), str):
+            data[column] = json.loads(data[column])
+    if isinstance(data.get("updated_at"), str):
+        data["updated_at"] = datetime.fromisoformat(data["updated_at"])
+    return data
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StreamingResponse:
+    def __init__(self, tokens: list[str], ttft: float, token_delay: float):
+        self.tokens, self.ttft, self.token_delay = tokens, ttft, token_delay
+
+    async def __aiter__(self):
+        await asyncio.sleep(self.ttft)
+        for i, token in enumerate(self.tokens):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield _Chunk(token)
+
+
+class _FakeChat:
+    def __init__(self, model: "FakeGenerativeModel", history):
+        self.model = model
+        self.history = list(history or [])
+
+    async def send_message_async(self, content, stream: bool = False):
+        tokens = [t + " " for t in REPLY_TOKENS[:-1]] + [REPLY_TOKENS[-1]]
+        self.history.append({"role": "user", "parts": [content]})
+        self.history.append({"role": "model", "parts": ["".join(tokens)]})
+        return _StreamingResponse(tokens, self.model.ttft, self.model.token_delay)
+
+
+class FakeGenerativeModel:
+    """Drop-in for `genai.GenerativeModel` in the CLM endpoint."""
+
+    ttft = 0.3
+    token_delay = 0.02
+
+    def __init__(self, model_name: str = "", **kwargs):
+        self.model_name = model_name
+        self.kwargs = kwargs
+
+    def start_chat(self, history=None, **kwargs):
+        return _FakeChat(self, history)
+
+
+def scripted_model(ttft_ms: float = 300, token_ms: float = 20) -> FunctionModel:
+    """FunctionModel that runs the tool named in the prompt, then replies.
+
+    A user message like "tool:search_agencies {...json args...}" makes the first
+    model turn call that tool; every other turn streams REPLY_TOKENS.
+    """
+    async def stream(messages: list[ModelMessage], info: AgentInfo):
+        await asyncio.sleep(ttft_ms / 1000)
+        last = messages[-1].parts[-1]
+        if isinstance(last, UserPromptPart) and isinstance(last.content, str) and last.content.startswith("tool:"):
+            name, _, args = last.content[5:].partition(" ")
+            yield {0: DeltaToolCall(name=name, json_args=args or "{}", tool_call_id="bench-call")}
+            return
+        for i, token in enumerate(REPLY_TOKENS):
+            if i:
+                await asyncio.sleep(token_ms / 1000)
+            yield token + " "
+
+    return FunctionModel(stream_function=stream)
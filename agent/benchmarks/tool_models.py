@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: per-call model definitions vs. hoisted models + TypeAdapters.
+
+"before" replays what generate_budget_breakdown / generate_timeline used to
+do on every call (define BaseModel subclasses inside the function, then
+validate); "after" uses the module-level models and cached adapters.
+
+    cd agent && python -m benchmarks.tool_models
+"""
+import os
+import timeit
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from pydantic import BaseModel  # noqa: E402
+
+from src.agent import BudgetBreakdown, budget_categories_adapter, phases_adapter  # noqa: E402
+
+CATEGORIES = [
+    {"name": "Paid Ads", "amount": 5000, "percentage": 50},
+    {"name": "Content", "amount": 3000, "percentage": 30},
+    {"name": "Events", "amount": 2000, "percentage": 20},
+]
+PHASES = [
+    {"name": f"Phase {i}", "duration": f"Month {i}", "activities": ["Set up CRM", "Define ICP"],
+     "milestones": ["CRM live", "ICP documented"]}
+    for i in range(1, 5)
+]
+
+
+def budget_before():
+    class BudgetCategory(BaseModel):
+        name: str
+        amount: float
+        percentage: float
+
+    class LocalBudgetBreakdown(BaseModel):
+        total: float
+        categories: list[BudgetCategory]
+
+    return LocalBudgetBreakdown(total=10000, categories=[BudgetCategory(**c) for c in CATEGORIES])
+
+
+def budget_after():
+    return BudgetBreakdown(total=10000, categories=budget_categories_adapter.validate_python(CATEGORIES))
+
+
+def timeline_before():
+    class Phase(BaseModel):
+        name: str
+        duration: str
+        activities: list[str]
+        milestones: list[str]
+
+    return [Phase(**p) for p in PHASES]
+
+
+def timeline_after():
+    return phases_adapter.validate_python(PHASES)
+
+
+def measure(func, number: int) -> float:
+    """Best-of-5 microseconds per call."""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    rows = [
+        ("generate_budget_breakdown", measure(budget_before, 200), measure(budget_after, 20000)),
+        ("generate_timeline", measure(timeline_before, 200), measure(timeline_after, 20000)),
+    ]
+    print(f"{'tool':<28}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, before, after in rows:
+        print(f"{name:<28}{before:>14.1f}{after:>14.2f}{before / after:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+-- Idempotency key for contact submissions written by the agent's
+-- write-behind queue (src/contact_queue.py). A retried batch re-inserts
+-- rows that may already have landed; the unique index turns those into
+-- no-ops. Rows from the web form leave it NULL.
+ALTER TABLE contact_submissions ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS contact_submissions_idempotency_key_idx
+    ON contact_submissions (idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
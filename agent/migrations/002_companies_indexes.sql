@@ -0,0 +1,40 @@
+-- Indexes for the agency listings (web pages and /api/agencies) and the
+-- agent's catalog reads. Every listing filters app + status = 'published',
+-- so the indexes are partial on published rows. Run outside a transaction
+-- (CREATE INDEX CONCURRENTLY). benchmarks/query_plans.py captures the
+-- plans before and after against a seeded Postgres. On 100k rows (PG 18)
+-- every @> / keyset / refresh query below switches from a sequential scan
+-- to these indexes; the old `= ANY(...)` forms still scan.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ORDER BY global_rank NULLS LAST listings, and (global_rank, id) keyset
+-- pages of them.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS companies_published_rank_idx
+    ON companies (app, status, global_rank, id)
+    WHERE status = 'published';
+
+-- Containment filters: service_areas @> ARRAY[$1]::text[] and friends.
+-- (`$1 = ANY(column)` cannot use a GIN index; the queries use @>.)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS companies_published_specializations_idx
+    ON companies USING gin (specializations)
+    WHERE status = 'published';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS companies_published_service_areas_idx
+    ON companies USING gin (service_areas)
+    WHERE status = 'published';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS companies_published_category_tags_idx
+    ON companies USING gin (category_tags)
+    WHERE status = 'published';
+
+-- headquarters ILIKE '%London%'.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS companies_published_headquarters_trgm_idx
+    ON companies USING gin (headquarters gin_trgm_ops)
+    WHERE status = 'published';
+
+-- The catalog's incremental refresh: app = 'gtm' AND updated_at > $1.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS companies_app_updated_at_idx
+    ON companies (app, updated_at);
+
+-- idx_companies_service_areas (MIGRATION_PLAN.md) stays: companies is
+-- shared with other apps, whose queries may not filter on published rows.
@@ -0,0 +1,200 @@
+"""
+Admission control for upstream LLM calls.
+
+Each upstream (today just Gemini) gets a concurrency limit and a bounded
+wait queue. A call that finds every slot taken waits in the queue, in
+priority order (voice before text chat before background work), until a
+slot frees up or its deadline passes. When the queue is full, a new call
+displaces the lowest-priority waiter if it outranks it, and is rejected
+otherwise. Either way the rejection is immediate: callers turn `Overloaded`
+into a 503 or a canned reply instead of piling onto a saturated upstream
+and collecting 429s.
+"""
+import asyncio
+import heapq
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from pydantic_ai.models.wrapper import WrapperModel
+
+from .metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_REJECTED,
+    ADMISSION_WAIT_SECONDS,
+    METRICS_ENABLED,
+)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+# Longest a call may wait for a slot. Voice gives up sooner: a late answer
+# is worse than a short fallback.
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+LLM_VOICE_QUEUE_TIMEOUT = float(os.getenv("LLM_VOICE_QUEUE_TIMEOUT", "2"))
+
+# Lower admits first.
+PRIORITIES = {"voice": 0, "chat": 1, "background": 2}
+
+
+class Overloaded(Exception):
+    """No slot could be granted; `retry_after` is a hint in seconds."""
+
+    def __init__(self, upstream: str, reason: str, retry_after: int = 1):
+        super().__init__(f"{upstream} overloaded ({reason})")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency limit plus a bounded priority queue with deadlines."""
+
+    def __init__(self, upstream: str, limit: int = 16, max_queue: int = 64):
+        self.upstream = upstream
+        self.limit = limit
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.queued = 0
+        # (priority, arrival, future); entries whose future is done are stale.
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._arrivals = 0
+
+    @property
+    def saturated(self) -> bool:
+        """True when a new chat-priority call would be rejected outright."""
+        return self.in_flight >= self.limit and self.queued >= self.max_queue and not self._displaceable(
+            PRIORITIES["chat"]
+        )
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "chat", timeout: Optional[float] = None):
+        await self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: str = "chat", timeout: Optional[float] = None) -> None:
+        """Take a slot, waiting up to `timeout` seconds; raises Overloaded."""
+        start = time.perf_counter()
+        rank = PRIORITIES[priority]
+        if self.in_flight < self.limit and self.queued == 0:
+            self.in_flight += 1
+            self._admitted(priority, start)
+            return
+        if self.queued >= self.max_queue and not self._displace(rank):
+            self._rejected(priority, "queue_full")
+            raise Overloaded(self.upstream, "queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._arrivals += 1
+        heapq.heappush(self._waiters, (rank, self._arrivals, future))
+        self.queued += 1
+        self._gauges()
+        try:
+            async with asyncio.timeout(timeout):
+                await future
+        except BaseException as e:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Granted just as we gave up: pass the slot on.
+                self.release()
+            elif not future.done() or future.cancelled():
+                future.cancel()
+                self.queued -= 1
+                self._gauges()
+            # Otherwise displaced; the counters are already settled.
+            if isinstance(e, TimeoutError):
+                self._rejected(priority, "timeout")
+                raise Overloaded(self.upstream, "timeout") from None
+            if isinstance(e, Overloaded):
+                self._rejected(priority, e.reason)
+            raise
+        self._admitted(priority, start)
+
+    def release(self) -> None:
+        """Hand the slot to the best live waiter, or free it."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.queued -= 1
+            future.set_result(None)
+            self._gauges()
+            return
+        self.in_flight -= 1
+        self._gauges()
+
+    def _displaceable(self, rank: int) -> Optional[asyncio.Future]:
+        worst = max(
+            ((r, arrival, f) for r, arrival, f in self._waiters if not f.done()),
+            key=lambda w: (w[0], w[1]),
+            default=None,
+        )
+        return worst[2] if worst is not None and worst[0] > rank else None
+
+    def _displace(self, rank: int) -> bool:
+        """Reject the lowest-priority, newest waiter if `rank` outranks it."""
+        victim = self._displaceable(rank)
+        if victim is None:
+            return False
+        victim.set_exception(Overloaded(self.upstream, "displaced"))
+        self.queued -= 1
+        return True
+
+    # -- metrics --
+
+    def _admitted(self, priority: str, start: float) -> None:
+        if METRICS_ENABLED:
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, self.upstream, priority)
+            self._gauges()
+
+    def _rejected(self, priority: str, reason: str) -> None:
+        if METRICS_ENABLED:
+            ADMISSION_REJECTED.inc(1, self.upstream, priority, reason)
+
+    def _gauges(self) -> None:
+        if METRICS_ENABLED:
+            ADMISSION_IN_FLIGHT.set(self.in_flight, self.upstream)
+            ADMISSION_QUEUE_DEPTH.set(self.queued, self.upstream)
+
+
+class _AdmittedModel(WrapperModel):
+    """Holds an admission slot for each model request (streamed: until the stream closes)."""
+
+    def __init__(self, wrapped, controller: AdmissionController, priority: str, timeout: float):
+        super().__init__(wrapped)
+        self.controller = controller
+        self.priority = priority
+        self.timeout = timeout
+
+    async def request(self, *args, **kwargs):
+        async with self.controller.slot(self.priority, self.timeout):
+            return await self.wrapped.request(*args, **kwargs)
+
+    @asynccontextmanager
+    async def request_stream(self, *args, **kwargs):
+        async with self.controller.slot(self.priority, self.timeout):
+            async with self.wrapped.request_stream(*args, **kwargs) as stream:
+                yield stream
+
+
+def admitted_model(model, controller: AdmissionController, priority: str = "chat", timeout: float = 10.0):
+    """Wrap a pydantic-ai model so every request goes through `controller`."""
+    return _AdmittedModel(model, controller, priority, timeout)
+
+
+async def admitted_tokens(
+    tokens: AsyncIterable[str],
+    controller: AdmissionController,
+    priority: str,
+    timeout: Optional[float],
+) -> AsyncIterator[str]:
+    """Hold a slot while a token stream is consumed (slot taken on first pull)."""
+    async with controller.slot(priority, timeout):
+        async for token in tokens:
+            yield token
+
+
+gemini_admission = AdmissionController("gemini", limit=LLM_MAX_CONCURRENCY, max_queue=LLM_MAX_QUEUE)
@@ -3,27 +3,68 @@ GTM.quest Agent - AI-Powered Go-To-Market Strategy Advisor
 
 Built with Pydantic AI + AG-UI for CopilotKit integration.
 """
+import heapq
 from textwrap import dedent
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import Annotated, AsyncIterator, Optional
+from pydantic import BaseModel, BeforeValidator, Field, PlainSerializer, TypeAdapter, ValidationError
 from pydantic_ai import Agent, RunContext
 from pydantic_ai.ag_ui import StateDeps
-from pydantic_ai.models.google import GoogleModel
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
 import os
 import sys
 
 from dotenv import load_dotenv
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-# Database connection
-import psycopg2
-from psycopg2.extras import RealDictCursor
-
-def get_db_connection():
-    """Get a database connection."""
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+from .admission import (
+    LLM_QUEUE_TIMEOUT,
+    LLM_VOICE_QUEUE_TIMEOUT,
+    admitted_model,
+    admitted_tokens,
+    gemini_admission,
+)
+from .cache import AGENCY_CACHE_MAX_ENTRIES, AGENCY_CACHE_TTL, ResultCache
+from .catalog import RANK_KEY_TYPES, InvalidCursor, catalog, decode_cursor, encode_cursor, rank_key
+from .compaction import (
+    COMPACT_BATCH_TURNS,
+    COMPACT_KEEP_TURNS,
+    COMPACT_MAX_CONVERSATIONS,
+    COMPACT_SUMMARY_TOKENS,
+    COMPACT_TRIGGER_TOKENS,
+    HistoryCompactor,
+    gemini_summarizer,
+)
+from .budget import allocate_budget, is_valid_budget
+from .contact_queue import Submission, contact_queue
+from .db import db
+from .matching import MATCH_KEY_TYPES, AgencyMatcher, pricing_tier
+from .metrics import (
+    ACTIVE_SESSIONS,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    METRICS_ENABLED,
+    count_sse_bytes,
+    instrument_tool,
+    render as render_metrics,
+    timed_model,
+    timed_tokens,
+)
+from .playbooks import RenderedPlaybook, playbooks
+from .prefetch import PREFETCH_CANDIDATES, PREFETCH_MAX_SESSIONS, AgencyPrefetcher, Profile
+from .response_cache import reply_cache
+from .roi import project_roi
+from .search_index import search_index
+from .startup import WarmUp, generativeai, lazy_google_model
+from .sse import coalesce
+from .state_sync import state_snapshot, syncs_state
+from .voice import FALLBACK_REPLY, gemini_text_stream, single_reply, stream_sse_response
 
 
 # =====
@@ -55,6 +96,44 @@ class Provider(BaseModel):
     match_score: Optional[float] = None
 
 
+# Recommendations kept per thread; the lowest match scores drop off first.
+MAX_RECOMMENDED_PROVIDERS = int(os.getenv("MAX_RECOMMENDED_PROVIDERS", "12"))
+
+
+def _providers_by_slug(value):
+    if isinstance(value, list):
+        return {(p.get("slug") if isinstance(p, dict) else p.slug): p for p in value}
+    return value
+
+
+# Held as slug -> Provider so an agency is upserted in place rather than
+# appended again; still sent to the frontend as a list in insertion order.
+ProviderSet = Annotated[
+    dict[str, Provider],
+    BeforeValidator(_providers_by_slug),
+    PlainSerializer(lambda providers: list(providers.values()), return_type=list[Provider]),
+]
+
+
+def upsert_provider(
+    providers: dict[str, Provider],
+    provider: Provider,
+    limit: int = MAX_RECOMMENDED_PROVIDERS,
+) -> bool:
+    """Add or replace `provider` by slug, keeping the `limit` best matches.
+
+    An existing entry keeps its position. Returns False if the provider
+    didn't make the cut.
+    """
+    providers[provider.slug] = provider
+    overflow = len(providers) - limit
+    if overflow > 0:
+        # Oldest first among equal scores, so earlier picks give way.
+        for weakest in heapq.nsmallest(overflow, providers.values(), key=lambda p: p.match_score or 0.0):
+            del providers[weakest.slug]
+    return provider.slug in providers
+
+
 class ROIProjection(BaseModel):
     """ROI projection for the GTM strategy."""
     estimated_cac: float
@@ -75,10 +154,17 @@ class UseCase(BaseModel):
     logo_url: Optional[str] = None
 
 
+class BudgetCategory(BaseModel):
+    """One channel's share of the budget."""
+    name: str
+    amount: float
+    percentage: float
+
+
 class BudgetBreakdown(BaseModel):
     """Budget allocation breakdown."""
     total: float
-    categories: list[dict] = Field(default_factory=list)
+    categories: list[BudgetCategory] = Field(default_factory=list)
 
 
 class Phase(BaseModel):
@@ -89,6 +175,16 @@ class Phase(BaseModel):
     milestones: list[str] = Field(default_factory=list)
 
 
+class ProviderRecommendation(BaseModel):
+    """One entry for add_provider_recommendations."""
+    name: str
+    provider_type: str = Field(description="One of 'agency', 'tool', 'platform'")
+    description: str
+    specializations: list[str] = Field(default_factory=list)
+    pricing_tier: str = Field(default="mid", description="One of 'budget', 'mid', 'premium'")
+    match_score: float = Field(description="Score from 0-1 indicating fit with user's needs")
+
+
 class AppState(BaseModel):
     """Main state synced with frontend via useCoAgent."""
     # Company info gathered during conversation
@@ -100,20 +196,121 @@ class AppState(BaseModel):
 
     # Generated outputs (populate main panel)
     strategy: Optional[GTMStrategy] = None
-    recommended_providers: list[Provider] = Field(default_factory=list)
+    recommended_providers: ProviderSet = Field(default_factory=dict)
     roi_projection: Optional[ROIProjection] = None
     use_cases: list[UseCase] = Field(default_factory=list)
     budget_breakdown: Optional[BudgetBreakdown] = None
     timeline_phases: list[Phase] = Field(default_factory=list)
 
 
+# Validators for tool arguments that arrive as lists of plain dicts; built once
+# here rather than on every tool call.
+budget_categories_adapter = TypeAdapter(list[BudgetCategory])
+phases_adapter = TypeAdapter(list[Phase])
+
+
+# =====
+# History Compaction
+# =====
+
+summarize_with_gemini = gemini_summarizer('gemini-2.0-flash')
+
+
+async def summarize_history(previous: Optional[str], turns: list[str], max_words: int) -> str:
+    # Lowest priority: when Gemini is busy the compactor falls back to an
+    # extractive summary rather than queueing behind live traffic.
+    async with gemini_admission.slot("background", LLM_QUEUE_TIMEOUT):
+        return await summarize_with_gemini(previous, turns, max_words)
+
+
+# Rolling summaries for long AG-UI threads and voice sessions
+compactor = HistoryCompactor(
+    summarize_history,
+    keep_turns=COMPACT_KEEP_TURNS,
+    trigger_tokens=COMPACT_TRIGGER_TOKENS,
+    summary_tokens=COMPACT_SUMMARY_TOKENS,
+    batch_turns=COMPACT_BATCH_TURNS,
+    max_conversations=COMPACT_MAX_CONVERSATIONS,
+)
+
+
+def state_facts(state: AppState) -> str:
+    """What AppState already records, so the summary doesn't have to."""
+    facts = [
+        f"{label}: {value}"
+        for label, value in [
+            ("company", state.company_name),
+            ("industry", state.industry),
+            ("stage", state.stage),
+            ("target market", state.target_market),
+            ("budget", f"${state.budget:,.0f}/month" if state.budget else None),
+            ("strategy", f"{state.strategy.name} ({state.strategy.type})" if state.strategy else None),
+        ]
+        if value
+    ]
+    if state.recommended_providers:
+        names = ", ".join(p.name for p in state.recommended_providers.values())
+        facts.append(f"recommended providers: {names}")
+    return "; ".join(facts)
+
+
+def render_turn(messages: list[ModelMessage]) -> str:
+    """One exchange (user prompt through the final reply) as plain text."""
+    lines = []
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, UserPromptPart):
+                lines.append(f"User: {part.content if isinstance(part.content, str) else '[attachment]'}")
+            elif isinstance(part, TextPart):
+                lines.append(f"Assistant: {part.content}")
+            elif isinstance(part, ToolCallPart):
+                lines.append(f"Called {part.tool_name}({part.args_as_json_str()[:200]})")
+            elif isinstance(part, ToolReturnPart):
+                lines.append(f"{part.tool_name} returned: {part.model_response_str()[:300]}")
+    return "\n".join(lines)
+
+
+async def compact_history(
+    ctx: RunContext[StateDeps[AppState]], messages: list[ModelMessage]
+) -> list[ModelMessage]:
+    """History processor: older turns become the thread's rolling summary."""
+    starts = [
+        i for i, message in enumerate(messages)
+        if isinstance(message, ModelRequest) and any(isinstance(p, UserPromptPart) for p in message.parts)
+    ]
+    if len(starts) <= compactor.keep_turns:
+        return messages
+    starts[0] = 0
+    turns = [messages[a:b] for a, b in zip(starts, starts[1:] + [len(messages)])]
+    plan = compactor.plan(
+        getattr(ctx.deps, "thread_id", None),
+        [render_turn(turn) for turn in turns],
+        facts=state_facts(ctx.deps.state),
+        path="ag_ui",
+    )
+    if plan is None:
+        return messages
+    system = [p for p in messages[0].parts if isinstance(p, SystemPromptPart)]
+    head = ModelRequest(parts=[*system, SystemPromptPart(content=plan.block)])
+    return [head, *messages[starts[plan.cut]:]]
+
+
 # =====
 # Agent Definition
 # =====
 
+# Built on the first request (or by the startup warm-up), not at import.
+chat_model = lazy_google_model('gemini-2.0-flash')
+
 agent = Agent(
-    model=GoogleModel('gemini-2.0-flash'),
+    model=admitted_model(
+        timed_model(chat_model, "ag_ui"),
+        gemini_admission,
+        priority="chat",
+        timeout=LLM_QUEUE_TIMEOUT,
+    ),
     deps_type=StateDeps[AppState],
+    history_processors=[compact_history],
     system_prompt=dedent("""
         You are an expert Go-To-Market (GTM) strategist helping companies plan their market entry.
 
@@ -135,10 +332,16 @@ agent = Agent(
         2. **Strategy Phase**: Once you have enough info:
            - Recommend a GTM approach (PLG, Sales-Led, or Hybrid)
            - Explain why this approach fits their situation
-           - Use the generate_strategy tool to populate the report
+           - Use the generate_strategy tool to populate the report, or generate_report to fill
+             strategy, ROI, budget and timeline in one call once you know enough
+           - These tools (and generate_timeline) fill anything you leave out from our playbook for
+             the strategy type, stage and industry; only write the parts that should differ
 
         3. **Recommendations Phase**:
            - Suggest relevant agencies and tools
+           - Use search_knowledge to ground suggestions and success stories in our agencies and articles
+           - Add several providers or success stories at once with add_provider_recommendations
+             and add_use_cases rather than one call per item
            - Provide ROI projections
            - Share similar success stories
 
@@ -157,17 +360,72 @@ agent = Agent(
 # Agent Tools
 # =====
 
+def company_playbook(state: AppState, strategy_type: Optional[str]) -> Optional[RenderedPlaybook]:
+    """The closest playbook for `strategy_type`, filled in for the company in `state`."""
+    return playbooks.render(
+        strategy_type,
+        stage=state.stage,
+        industry=state.industry,
+        company_name=state.company_name,
+        target_market=state.target_market,
+    )
+
+
+def build_strategy(
+    state: AppState,
+    strategy_type: str,
+    strategy_name: Optional[str] = None,
+    summary: Optional[str] = None,
+    action_items: Optional[list[str]] = None,
+    recommended_for: Optional[list[str]] = None,
+) -> tuple[Optional[GTMStrategy], Optional[RenderedPlaybook]]:
+    """The strategy from the tool arguments, with anything left out taken from the closest playbook.
+
+    The strategy is None if a field is missing and there's no playbook for `strategy_type`.
+    """
+    playbook = company_playbook(state, strategy_type)
+    if playbook is None:
+        if not (strategy_name and summary):
+            return None, None
+        return GTMStrategy(
+            name=strategy_name,
+            type=strategy_type,
+            summary=summary,
+            action_items=action_items or [],
+            recommended_for=recommended_for or [],
+        ), None
+    return GTMStrategy(
+        name=strategy_name or playbook.name,
+        # 'Product-Led' -> 'plg', so later lookups (timeline, ROI, budget) agree.
+        type=playbook.strategy_type,
+        summary=summary or playbook.summary,
+        action_items=action_items or playbook.action_items,
+        recommended_for=recommended_for or playbook.recommended_for,
+    ), playbook
+
+
+UNKNOWN_STRATEGY_MESSAGE = (
+    "There's no playbook for that strategy type. Use 'plg', 'sales_led' or 'hybrid', "
+    "or pass strategy_name and summary yourself."
+)
+
+
 @agent.tool
+@instrument_tool
+@syncs_state("strategy")
 async def generate_strategy(
     ctx: RunContext[StateDeps[AppState]],
     strategy_type: str,
-    strategy_name: str,
-    summary: str,
-    action_items: list[str],
-    recommended_for: list[str],
+    strategy_name: Optional[str] = None,
+    summary: Optional[str] = None,
+    action_items: Optional[list[str]] = None,
+    recommended_for: Optional[list[str]] = None,
 ) -> dict:
     """Generate a GTM strategy recommendation and update the frontend state.
 
+    Anything left out is filled from our playbook for the strategy type and the
+    company's stage and industry, so pass only what should differ from it.
+
     Args:
         strategy_type: One of 'plg' (Product-Led Growth), 'sales_led', or 'hybrid'
         strategy_name: Human-readable name like "Product-Led Growth"
@@ -175,26 +433,57 @@ async def generate_strategy(
         action_items: List of specific action items to implement
         recommended_for: List of company types this works best for
     """
-    strategy = GTMStrategy(
-        name=strategy_name,
-        type=strategy_type,
-        summary=summary,
-        action_items=action_items,
-        recommended_for=recommended_for,
+    strategy, playbook = build_strategy(
+        ctx.deps.state, strategy_type, strategy_name, summary, action_items, recommended_for,
     )
+    if strategy is None:
+        return {
+            "success": False,
+            "error": f"Unknown strategy type: {strategy_type}",
+            "message": UNKNOWN_STRATEGY_MESSAGE,
+        }
 
     # Update state to populate frontend
     ctx.deps.state.strategy = strategy
+    # The motion changes agency ranking too.
+    prefetcher.schedule(getattr(ctx.deps, "thread_id", None), company_profile(ctx.deps.state))
 
-    print(f"[GTM] Generated strategy: {strategy_name}", file=sys.stderr)
+    source = f" from playbook {playbook.ref}" if playbook else ""
+    print(f"[GTM] Generated strategy: {strategy.name}{source}", file=sys.stderr)
 
-    return {
+    result = {
         "success": True,
-        "message": f"Strategy '{strategy_name}' has been generated and added to your report.",
+        "message": f"Strategy '{strategy.name}' has been generated and added to your report.",
     }
+    if playbook is not None:
+        result.update(
+            playbook=playbook.ref,
+            summary=strategy.summary,
+            action_items=strategy.action_items,
+        )
+    return result
+
+
+def recommended_provider(item: ProviderRecommendation) -> Provider:
+    slug = item.name.lower().replace(" ", "-")
+    # Catalog agencies keep their database id, so search_agencies and the
+    # recommendation tools converge on the same entry.
+    row = catalog.get(slug)
+    return Provider(
+        id=str(row["id"]) if row else slug,
+        name=item.name,
+        slug=slug,
+        type=item.provider_type,
+        description=item.description,
+        specializations=item.specializations,
+        pricing_tier=item.pricing_tier,
+        match_score=item.match_score,
+    )
 
 
 @agent.tool
+@instrument_tool
+@syncs_state("recommended_providers")
 async def add_provider_recommendation(
     ctx: RunContext[StateDeps[AppState]],
     name: str,
@@ -214,23 +503,20 @@ async def add_provider_recommendation(
         pricing_tier: One of 'budget', 'mid', 'premium'
         match_score: Score from 0-1 indicating fit with user's needs
     """
-    import uuid
-
-    provider = Provider(
-        id=str(uuid.uuid4()),
+    provider = recommended_provider(ProviderRecommendation(
         name=name,
-        slug=name.lower().replace(" ", "-"),
-        type=provider_type,
+        provider_type=provider_type,
         description=description,
         specializations=specializations,
         pricing_tier=pricing_tier,
         match_score=match_score,
-    )
+    ))
 
-    # Add to state
-    if ctx.deps.state.recommended_providers is None:
-        ctx.deps.state.recommended_providers = []
-    ctx.deps.state.recommended_providers.append(provider)
+    if not upsert_provider(ctx.deps.state.recommended_providers, provider):
+        return {
+            "success": False,
+            "message": f"{name} scores below the {MAX_RECOMMENDED_PROVIDERS} providers already recommended.",
+        }
 
     print(f"[GTM] Added provider: {name} ({match_score*100:.0f}% match)", file=sys.stderr)
 
@@ -240,43 +526,103 @@ async def add_provider_recommendation(
     }
 
 
+def build_roi_projection(
+    state: AppState,
+    strategy: Optional[GTMStrategy],
+    notes: Optional[str] = None,
+) -> tuple[ROIProjection, float]:
+    """Benchmark ROI for the company in `state` under `strategy`, plus LTV:CAC."""
+    estimate = project_roi(
+        stage=state.stage,
+        industry=state.industry,
+        strategy_type=strategy.type if strategy else None,
+        budget=state.budget,
+    )
+    projection = ROIProjection(
+        estimated_cac=round(estimate.cac[1], 2),
+        estimated_ltv=round(estimate.ltv[1], 2),
+        payback_months=max(1, round(estimate.payback_months[1])),
+        confidence=estimate.confidence,
+        notes=f"{estimate.notes} {notes}" if notes else estimate.notes,
+    )
+    return projection, round(estimate.ltv_cac_ratio, 1)
+
+
+@agent.tool
+@instrument_tool
+@syncs_state("recommended_providers")
+async def add_provider_recommendations(
+    ctx: RunContext[StateDeps[AppState]],
+    providers: list[ProviderRecommendation],
+) -> dict:
+    """Add several provider (agency/tool) recommendations to the report in one call.
+
+    Prefer this over repeated add_provider_recommendation calls.
+
+    Args:
+        providers: The providers to add, each with name, provider_type, description,
+                   specializations, pricing_tier and match_score
+    """
+    # Applied to a copy and swapped in, so the report changes in one step.
+    recommended = dict(ctx.deps.state.recommended_providers)
+    candidates = [recommended_provider(item) for item in providers]
+    for provider in candidates:
+        upsert_provider(recommended, provider)
+    ctx.deps.state.recommended_providers = recommended
+
+    added = [p.name for p in candidates if p.slug in recommended]
+    dropped = [p.name for p in candidates if p.slug not in recommended]
+
+    print(f"[GTM] Added {len(added)} providers ({len(dropped)} below the cut)", file=sys.stderr)
+
+    message = f"Added {len(added)} providers to your recommendations."
+    if dropped:
+        message += f" {', '.join(dropped)} scored below the {MAX_RECOMMENDED_PROVIDERS} providers already recommended."
+    return {
+        "success": bool(added) or not candidates,
+        "added": added,
+        "dropped": dropped,
+        "message": message,
+    }
+
+
 @agent.tool
+@instrument_tool
+@syncs_state("roi_projection")
 async def generate_roi_projection(
     ctx: RunContext[StateDeps[AppState]],
-    estimated_cac: float,
-    estimated_ltv: float,
-    payback_months: int,
-    confidence: str,
-    notes: str,
+    notes: Optional[str] = None,
 ) -> dict:
     """Generate ROI projections for the GTM strategy.
 
+    CAC, LTV and payback are computed from benchmarks for the company's stage,
+    industry, budget and strategy type already in the report, so call
+    update_company_info and generate_strategy first when you can.
+
     Args:
-        estimated_cac: Estimated Customer Acquisition Cost in dollars
-        estimated_ltv: Estimated Lifetime Value in dollars
-        payback_months: Estimated months to payback CAC
-        confidence: One of 'low', 'medium', 'high'
-        notes: Explanatory notes about the projection
+        notes: Optional extra context to append to the projection notes
     """
-    projection = ROIProjection(
-        estimated_cac=estimated_cac,
-        estimated_ltv=estimated_ltv,
-        payback_months=payback_months,
-        confidence=confidence,
-        notes=notes,
-    )
+    projection, ltv_cac_ratio = build_roi_projection(ctx.deps.state, ctx.deps.state.strategy, notes)
 
     ctx.deps.state.roi_projection = projection
 
-    print(f"[GTM] Generated ROI projection: CAC=${estimated_cac}, LTV=${estimated_ltv}", file=sys.stderr)
+    print(f"[GTM] Generated ROI projection: CAC=${projection.estimated_cac}, LTV=${projection.estimated_ltv}", file=sys.stderr)
 
     return {
         "success": True,
+        "estimated_cac": projection.estimated_cac,
+        "estimated_ltv": projection.estimated_ltv,
+        "payback_months": projection.payback_months,
+        "ltv_cac_ratio": ltv_cac_ratio,
+        "confidence": projection.confidence,
+        "notes": projection.notes,
         "message": "ROI projection has been added to your report.",
     }
 
 
 @agent.tool
+@instrument_tool
+@syncs_state("use_cases")
 async def add_use_case(
     ctx: RunContext[StateDeps[AppState]],
     company_name: str,
@@ -315,6 +661,33 @@ async def add_use_case(
 
 
 @agent.tool
+@instrument_tool
+@syncs_state("use_cases")
+async def add_use_cases(
+    ctx: RunContext[StateDeps[AppState]],
+    use_cases: list[UseCase],
+) -> dict:
+    """Add several similar-company success stories to the report in one call.
+
+    Prefer this over repeated add_use_case calls.
+
+    Args:
+        use_cases: Success stories, each with company_name, industry, challenge,
+                   solution and results (e.g. {"revenue_increase": "150%"})
+    """
+    ctx.deps.state.use_cases = [*(ctx.deps.state.use_cases or []), *use_cases]
+
+    print(f"[GTM] Added {len(use_cases)} use cases", file=sys.stderr)
+
+    return {
+        "success": True,
+        "message": f"Added {len(use_cases)} case studies to your report.",
+    }
+
+
+@agent.tool
+@instrument_tool
+@syncs_state("company_name", "industry", "stage", "target_market", "budget")
 async def update_company_info(
     ctx: RunContext[StateDeps[AppState]],
     company_name: Optional[str] = None,
@@ -355,6 +728,10 @@ async def update_company_info(
 
     print(f"[GTM] Updated company info: {', '.join(updated)}", file=sys.stderr)
 
+    if industry or stage or target_market or budget:
+        # An agency search usually follows; rank for the new profile now.
+        prefetcher.schedule(getattr(ctx.deps, "thread_id", None), company_profile(ctx.deps.state))
+
     return {
         "success": True,
         "message": f"Updated: {', '.join(updated)}",
@@ -365,51 +742,93 @@ async def update_company_info(
 # Database Query Tools
 # =====
 
+matcher = AgencyMatcher(catalog)
+
+# Ranked search pages, invalidated when catalog rows change. Details and
+# top-N listings are plain dict reads and go straight to the catalog.
+search_cache = ResultCache("agency_search", max_entries=AGENCY_CACHE_MAX_ENTRIES, ttl=AGENCY_CACHE_TTL)
+
+
+def catalog_generation() -> int:
+    return catalog.generation
+
+
+async def rank_agencies(
+    profile: Profile,
+    location: Optional[str],
+    specialization: Optional[str],
+    limit: int,
+    after: Optional[tuple],
+) -> tuple[list, bool]:
+    """matcher.rank (off the loop) through the search cache: (matches, every filter matched)."""
+    async def load():
+        return await matcher.rank_in_thread(
+            location=location,
+            specialization=specialization,
+            limit=limit,
+            after=after,
+            **profile.rank_args(),
+        )
+
+    key = (profile, location, specialization, limit, after)
+    return await search_cache.get_or_load(key, catalog_generation, load)
+
+# Candidates ranked in the background once the company profile changes.
+prefetcher = AgencyPrefetcher(
+    catalog,
+    matcher,
+    candidates=PREFETCH_CANDIDATES,
+    max_sessions=PREFETCH_MAX_SESSIONS,
+)
+
+
+def company_profile(state: AppState) -> Profile:
+    return Profile(
+        industry=state.industry,
+        stage=state.stage,
+        target_market=state.target_market,
+        budget=state.budget,
+        strategy_type=state.strategy.type if state.strategy else None,
+    )
+
+
 @agent.tool
+@instrument_tool
+@syncs_state("recommended_providers")
 async def search_agencies(
     ctx: RunContext[StateDeps[AppState]],
     location: Optional[str] = None,
     specialization: Optional[str] = None,
     max_results: int = 5,
+    cursor: Optional[str] = None,
 ) -> dict:
-    """Search for GTM agencies from our database.
+    """Search for GTM agencies from our database, ranked for this company.
+
+    Agencies are scored against the filters and everything already known
+    about the company (industry, stage, target market, budget, strategy).
 
     Args:
         location: Filter by location (e.g., 'London', 'New York', 'Remote')
         specialization: Filter by specialization (e.g., 'Demand Generation', 'ABM', 'PLG')
         max_results: Maximum number of agencies to return (default 5)
+        cursor: next_cursor from a previous search, to get the next page
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        query = """
-            SELECT id, slug, name, description, headquarters, logo_url,
-                   specializations, service_areas, global_rank, website,
-                   pricing_model, min_budget, avg_rating, review_count
-            FROM companies
-            WHERE app = 'gtm' AND status = 'published'
-        """
-        params = []
-
-        if location:
-            query += " AND (headquarters ILIKE %s OR %s = ANY(service_areas))"
-            params.extend([f"%{location}%", location])
-
-        if specialization:
-            query += " AND %s = ANY(specializations)"
-            params.append(specialization)
-
-        query += " ORDER BY global_rank NULLS LAST LIMIT %s"
-        params.append(max_results)
-
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        profile = company_profile(ctx.deps.state)
+        after = decode_cursor(cursor, MATCH_KEY_TYPES) if cursor else None
+        matches, exact = None, True
+        if not location and not specialization and after is None:
+            matches = await prefetcher.get(getattr(ctx.deps, "thread_id", None), profile, max_results + 1)
+        if matches is None:
+            await catalog.ensure_loaded()
+            # One extra to know whether there is a next page.
+            matches, exact = await rank_agencies(profile, location, specialization, max_results + 1, after)
+        next_cursor = encode_cursor(matches[max_results - 1].key) if 0 < max_results < len(matches) else None
+        matches = matches[:max_results]
 
         agencies = []
-        for row in results:
+        for match in matches:
+            row = match.row
             agencies.append({
                 "name": row["name"],
                 "slug": row["slug"],
@@ -420,6 +839,7 @@ async def search_agencies(
                 "website": row["website"],
                 "pricing_model": row["pricing_model"],
                 "min_budget": row["min_budget"],
+                "match_score": match.score,
             })
 
             # Also add to provider recommendations
@@ -430,24 +850,35 @@ async def search_agencies(
                 type="agency",
                 description=row["description"] or "",
                 specializations=row["specializations"] or [],
-                pricing_tier="mid" if not row["min_budget"] else ("budget" if row["min_budget"] < 5000 else ("premium" if row["min_budget"] > 15000 else "mid")),
+                pricing_tier=pricing_tier(row["min_budget"]),
                 website=row["website"],
                 logo_url=row["logo_url"],
                 rating=float(row["avg_rating"]) if row["avg_rating"] else None,
-                match_score=0.9 if row["global_rank"] and row["global_rank"] <= 10 else 0.7,
+                match_score=match.score,
             )
-            if provider not in ctx.deps.state.recommended_providers:
-                ctx.deps.state.recommended_providers.append(provider)
+            upsert_provider(ctx.deps.state.recommended_providers, provider)
 
         print(f"[GTM] Found {len(agencies)} agencies", file=sys.stderr)
 
+        message = f"Found {len(agencies)} GTM agencies" + (f" in {location}" if location else "") + (f" specializing in {specialization}" if specialization else "")
+        if not exact:
+            message = f"No agencies matched every filter; here are the {len(agencies)} closest matches"
+
         return {
             "success": True,
             "count": len(agencies),
+            "exact_match": exact,
             "agencies": agencies,
-            "message": f"Found {len(agencies)} GTM agencies" + (f" in {location}" if location else "") + (f" specializing in {specialization}" if specialization else ""),
+            "next_cursor": next_cursor,
+            "message": message,
         }
 
+    except InvalidCursor as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "message": "That page of results is out of date. Search again without a cursor.",
+        }
     except Exception as e:
         print(f"[GTM] Database error: {e}", file=sys.stderr)
         return {
@@ -457,7 +888,49 @@ async def search_agencies(
         }
 
 
+def _agency_details(slug: str) -> Optional[dict]:
+    row = catalog.get(slug)
+    if not row:
+        return None
+    return {
+        "name": row["name"],
+        "slug": row["slug"],
+        "description": row["description"],
+        "overview": row["overview"],
+        "headquarters": row["headquarters"],
+        "website": row["website"],
+        "specializations": row["specializations"] or [],
+        "service_areas": row["service_areas"] or [],
+        "key_services": row["key_services"] or [],
+        "global_rank": row["global_rank"],
+        "founded_year": row["founded_year"],
+        "employee_count": row["employee_count"],
+        "pricing_model": row["pricing_model"],
+        "min_budget": row["min_budget"],
+        "avg_rating": row["avg_rating"],
+        "review_count": row["review_count"],
+    }
+
+
+def _top_agencies(limit: int, after: Optional[tuple]) -> tuple[list[dict], Optional[str]]:
+    rows = catalog.top(limit + 1, after)
+    next_cursor = encode_cursor(rank_key(rows[limit - 1])) if 0 < limit < len(rows) else None
+    return [
+        {
+            "rank": row["global_rank"],
+            "name": row["name"],
+            "slug": row["slug"],
+            "description": row["description"],
+            "headquarters": row["headquarters"],
+            "specializations": row["specializations"] or [],
+            "website": row["website"],
+        }
+        for row in rows[:limit]
+    ], next_cursor
+
+
 @agent.tool
+@instrument_tool
 async def get_agency_details(
     ctx: RunContext[StateDeps[AppState]],
     slug: str,
@@ -468,54 +941,21 @@ async def get_agency_details(
         slug: The agency slug (e.g., 'singlegrain', 'refinelabs')
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT id, slug, name, description, headquarters, logo_url, website,
-                   specializations, service_areas, key_services, global_rank,
-                   founded_year, employee_count, pricing_model, min_budget,
-                   avg_rating, review_count, overview
-            FROM companies
-            WHERE app = 'gtm' AND status = 'published' AND slug = %s
-            LIMIT 1
-        """, [slug])
-
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
-
-        if not row:
+        await catalog.ensure_loaded()
+        agency = _agency_details(slug.strip().lower())
+
+        if not agency:
             return {
                 "success": False,
                 "message": f"Agency '{slug}' not found.",
             }
 
-        agency = {
-            "name": row["name"],
-            "slug": row["slug"],
-            "description": row["description"],
-            "overview": row["overview"],
-            "headquarters": row["headquarters"],
-            "website": row["website"],
-            "specializations": row["specializations"] or [],
-            "service_areas": row["service_areas"] or [],
-            "key_services": row["key_services"] or [],
-            "global_rank": row["global_rank"],
-            "founded_year": row["founded_year"],
-            "employee_count": row["employee_count"],
-            "pricing_model": row["pricing_model"],
-            "min_budget": row["min_budget"],
-            "avg_rating": float(row["avg_rating"]) if row["avg_rating"] else None,
-            "review_count": row["review_count"],
-        }
-
-        print(f"[GTM] Retrieved agency: {row['name']}", file=sys.stderr)
+        print(f"[GTM] Retrieved agency: {agency['name']}", file=sys.stderr)
 
         return {
             "success": True,
             "agency": agency,
-            "message": f"Here's information about {row['name']}.",
+            "message": f"Here's information about {agency['name']}.",
         }
 
     except Exception as e:
@@ -528,43 +968,23 @@ async def get_agency_details(
 
 
 @agent.tool
+@instrument_tool
 async def get_top_agencies(
     ctx: RunContext[StateDeps[AppState]],
     limit: int = 10,
+    cursor: Optional[str] = None,
 ) -> dict:
     """Get the top-ranked GTM agencies.
 
     Args:
         limit: Number of agencies to return (default 10)
+        cursor: next_cursor from a previous call, to get the next page
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT id, slug, name, description, headquarters, logo_url,
-                   specializations, global_rank, website, pricing_model, min_budget
-            FROM companies
-            WHERE app = 'gtm' AND status = 'published' AND global_rank IS NOT NULL
-            ORDER BY global_rank ASC
-            LIMIT %s
-        """, [limit])
-
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        agencies = []
-        for row in results:
-            agencies.append({
-                "rank": row["global_rank"],
-                "name": row["name"],
-                "slug": row["slug"],
-                "description": row["description"],
-                "headquarters": row["headquarters"],
-                "specializations": row["specializations"] or [],
-                "website": row["website"],
-            })
+        await catalog.ensure_loaded()
+        limit = max(int(limit), 0)
+        after = decode_cursor(cursor, RANK_KEY_TYPES) if cursor else None
+        agencies, next_cursor = _top_agencies(limit, after)
 
         print(f"[GTM] Retrieved top {len(agencies)} agencies", file=sys.stderr)
 
@@ -572,9 +992,16 @@ async def get_top_agencies(
             "success": True,
             "count": len(agencies),
             "agencies": agencies,
+            "next_cursor": next_cursor,
             "message": f"Here are the top {len(agencies)} ranked GTM agencies.",
         }
 
+    except InvalidCursor as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "message": "That cursor isn't valid. Call again without a cursor.",
+        }
     except Exception as e:
         print(f"[GTM] Database error: {e}", file=sys.stderr)
         return {
@@ -585,78 +1012,242 @@ async def get_top_agencies(
 
 
 @agent.tool
-async def generate_budget_breakdown(
+@instrument_tool
+async def search_knowledge(
     ctx: RunContext[StateDeps[AppState]],
-    total_budget: float,
-    categories: list[dict],
+    query: str,
+    kind: Optional[str] = None,
+    limit: int = 5,
 ) -> dict:
-    """Generate a budget breakdown for the GTM strategy.
+    """Search our agency profiles and GTM articles by topic.
+
+    Use this to ground recommendations and use cases in real agencies and
+    published guides (e.g. "PLG onboarding for developer tools", "ABM for
+    fintech") instead of relying on memory.
 
     Args:
-        total_budget: Total monthly budget in dollars
-        categories: List of budget categories with name, amount, and percentage
-                   Example: [{"name": "Paid Ads", "amount": 5000, "percentage": 50}]
+        query: What to look for, in plain words
+        kind: Optional 'agency' or 'article' to search only one kind
+        limit: Maximum number of results (default 5)
     """
-    from pydantic import BaseModel
+    if not search_index.is_ready:
+        return {
+            "success": False,
+            "message": "The knowledge index is still loading. Try search_agencies instead.",
+        }
+
+    hits = search_index.search(query, kind=kind if kind in ("agency", "article") else None, limit=limit)
 
-    class BudgetCategory(BaseModel):
-        name: str
-        amount: float
-        percentage: float
+    print(f"[GTM] Knowledge search '{query[:40]}': {len(hits)} results", file=sys.stderr)
+
+    return {
+        "success": True,
+        "count": len(hits),
+        "results": [
+            {
+                "kind": hit.kind,
+                "slug": hit.slug,
+                "title": hit.title,
+                "snippet": hit.snippet,
+                "url": hit.url,
+                "score": hit.score,
+            }
+            for hit in hits
+        ],
+        "message": f"Found {len(hits)} relevant {({'agency': 'agencies', 'article': 'articles'}).get(kind, 'results')}.",
+    }
 
-    class BudgetBreakdown(BaseModel):
-        total: float
-        categories: list[BudgetCategory]
 
-    breakdown = BudgetBreakdown(
-        total=total_budget,
-        categories=[BudgetCategory(**cat) for cat in categories]
+def build_budget_breakdown(
+    total_budget: float,
+    strategy: Optional[GTMStrategy],
+    stage: Optional[str],
+) -> BudgetBreakdown:
+    allocation = allocate_budget(
+        total_budget,
+        strategy_type=strategy.type if strategy else None,
+        stage=stage,
     )
+    return BudgetBreakdown(
+        total=allocation.total,
+        categories=budget_categories_adapter.validate_python(allocation.categories),
+    )
+
+
+@agent.tool
+@instrument_tool
+@syncs_state("budget_breakdown", "budget")
+async def generate_budget_breakdown(
+    ctx: RunContext[StateDeps[AppState]],
+    total_budget: Optional[float] = None,
+) -> dict:
+    """Generate a budget breakdown for the GTM strategy.
+
+    The split across channels is computed from the strategy type and company
+    stage already in the report; amounts always add up to the total.
+
+    Args:
+        total_budget: Total monthly budget in dollars (defaults to the budget already shared)
+    """
+    state = ctx.deps.state
+    total_budget = total_budget or state.budget
+    if not is_valid_budget(total_budget):
+        return {
+            "success": False,
+            "message": "I need a monthly budget before I can break it down.",
+        }
+
+    breakdown = build_budget_breakdown(total_budget, state.strategy, state.stage)
 
     ctx.deps.state.budget_breakdown = breakdown
-    ctx.deps.state.budget = total_budget
+    ctx.deps.state.budget = breakdown.total
 
-    print(f"[GTM] Generated budget breakdown: ${total_budget} across {len(categories)} categories", file=sys.stderr)
+    print(f"[GTM] Generated budget breakdown: ${breakdown.total} across {len(breakdown.categories)} categories", file=sys.stderr)
 
     return {
         "success": True,
-        "message": f"Budget breakdown of ${total_budget:,.0f}/mo has been added to the report.",
+        "categories": [c.model_dump() for c in breakdown.categories],
+        "message": f"Budget breakdown of ${breakdown.total:,.0f}/mo has been added to the report.",
     }
 
 
 @agent.tool
+@instrument_tool
+@syncs_state("timeline_phases")
 async def generate_timeline(
     ctx: RunContext[StateDeps[AppState]],
-    phases: list[dict],
+    phases: Optional[list[dict]] = None,
 ) -> dict:
     """Generate implementation timeline phases for the GTM strategy.
 
+    Leave out `phases` to use our playbook timeline for the strategy already
+    in the report and the company's stage and industry.
+
     Args:
         phases: List of phases with name, duration, activities, and milestones
                 Example: [{"name": "Foundation", "duration": "Month 1-2",
                           "activities": ["Set up CRM", "Define ICP"],
                           "milestones": ["CRM live", "ICP documented"]}]
     """
-    from pydantic import BaseModel
+    state = ctx.deps.state
+    playbook = None
+    if not phases:
+        playbook = company_playbook(state, state.strategy.type if state.strategy else None)
+        if playbook is None:
+            return {
+                "success": False,
+                "error": "No phases given and no playbook for the current strategy",
+                "message": "Generate a plg, sales_led or hybrid strategy first, or pass the phases.",
+            }
+        phases = playbook.phases
+
+    try:
+        timeline = phases_adapter.validate_python(phases)
+    except ValidationError as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "message": "Each phase needs a name, duration, activities and milestones.",
+        }
 
-    class Phase(BaseModel):
-        name: str
-        duration: str
-        activities: list[str]
-        milestones: list[str]
+    state.timeline_phases = timeline
 
-    timeline = [Phase(**phase) for phase in phases]
-    ctx.deps.state.timeline_phases = timeline
+    source = f" from playbook {playbook.ref}" if playbook else ""
+    print(f"[GTM] Generated timeline with {len(timeline)} phases{source}", file=sys.stderr)
 
-    print(f"[GTM] Generated timeline with {len(phases)} phases", file=sys.stderr)
+    result = {
+        "success": True,
+        "message": f"Implementation timeline with {len(timeline)} phases has been added to your report.",
+    }
+    if playbook is not None:
+        result.update(playbook=playbook.ref, phases=[f"{p.name} ({p.duration})" for p in timeline])
+    return result
 
-    return {
+
+@agent.tool
+@instrument_tool
+@syncs_state("strategy", "roi_projection", "budget_breakdown", "budget", "timeline_phases")
+async def generate_report(
+    ctx: RunContext[StateDeps[AppState]],
+    strategy_type: str,
+    strategy_name: Optional[str] = None,
+    summary: Optional[str] = None,
+    action_items: Optional[list[str]] = None,
+    recommended_for: Optional[list[str]] = None,
+    phases: Optional[list[Phase]] = None,
+    total_budget: Optional[float] = None,
+    roi_notes: Optional[str] = None,
+) -> dict:
+    """Fill the strategy, ROI projection, budget breakdown and timeline in one call.
+
+    ROI and budget are computed for the new strategy from the company's stage,
+    industry and budget. Strategy fields and phases left out are filled from our
+    playbook for the strategy type, stage and industry. Nothing is changed
+    unless every section is valid.
+
+    Args:
+        strategy_type: One of 'plg' (Product-Led Growth), 'sales_led', or 'hybrid'
+        strategy_name: Human-readable name like "Product-Led Growth"
+        summary: 2-3 sentence summary of the strategy
+        action_items: List of specific action items to implement
+        recommended_for: List of company types this works best for
+        phases: Timeline phases, each with name, duration, activities and milestones
+        total_budget: Total monthly budget in dollars (defaults to the budget already shared)
+        roi_notes: Optional extra context to append to the ROI notes
+    """
+    state = ctx.deps.state
+    strategy, playbook = build_strategy(state, strategy_type, strategy_name, summary, action_items, recommended_for)
+    if strategy is None or not (phases or playbook):
+        return {
+            "success": False,
+            "error": f"Unknown strategy type: {strategy_type}",
+            "message": (
+                "There's no playbook for that strategy type. Use 'plg', 'sales_led' or 'hybrid', "
+                "or pass strategy_name, summary and phases yourself."
+            ),
+        }
+    if not phases:
+        phases = phases_adapter.validate_python(playbook.phases)
+    projection, ltv_cac_ratio = build_roi_projection(state, strategy, roi_notes)
+    total_budget = total_budget or state.budget
+    breakdown = build_budget_breakdown(total_budget, strategy, state.stage) if is_valid_budget(total_budget) else None
+
+    state.strategy = strategy
+    state.roi_projection = projection
+    if breakdown is not None:
+        state.budget_breakdown = breakdown
+        state.budget = breakdown.total
+    state.timeline_phases = phases
+    prefetcher.schedule(getattr(ctx.deps, "thread_id", None), company_profile(state))
+
+    sections = ["strategy", "ROI projection"] + (["budget breakdown"] if breakdown else []) + ["timeline"]
+    source = f" from playbook {playbook.ref}" if playbook else ""
+    print(f"[GTM] Generated report: {strategy.name} ({', '.join(sections)}){source}", file=sys.stderr)
+
+    message = f"Added {', '.join(sections[:-1])} and {sections[-1]} to your report."
+    if breakdown is None:
+        message += " Share a monthly budget to add a budget breakdown."
+    result = {
         "success": True,
-        "message": f"Implementation timeline with {len(phases)} phases has been added to your report.",
+        "estimated_cac": projection.estimated_cac,
+        "estimated_ltv": projection.estimated_ltv,
+        "ltv_cac_ratio": ltv_cac_ratio,
+        "payback_months": projection.payback_months,
+        "budget_categories": [c.model_dump() for c in breakdown.categories] if breakdown else [],
+        "message": message,
     }
+    if playbook is not None:
+        result.update(
+            playbook=playbook.ref,
+            summary=strategy.summary,
+            action_items=strategy.action_items,
+            phases=[f"{p.name} ({p.duration})" for p in phases],
+        )
+    return result
 
 
 @agent.tool
+@instrument_tool
 async def save_contact_request(
     ctx: RunContext[StateDeps[AppState]],
     full_name: str,
@@ -672,27 +1263,30 @@ async def save_contact_request(
         company_name: Optional company name
         message: Optional message or notes
     """
+    submission = Submission.create(
+        getattr(ctx.deps, "thread_id", None),
+        full_name=full_name,
+        email=email,
+        company_name=company_name,
+        message=message,
+    )
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        # Spooled to disk now and written in the background (or inserted
+        # directly when no spool is configured).
+        outcome = await contact_queue.submit(submission)
 
-        cursor.execute("""
-            INSERT INTO contact_submissions
-            (submission_type, full_name, email, company_name, message, site, created_at)
-            VALUES ('gtm_consultation', %s, %s, %s, %s, 'gtm', NOW())
-            RETURNING id
-        """, [full_name, email, company_name, message])
-
-        result = cursor.fetchone()
-        conn.commit()
-        cursor.close()
-        conn.close()
-
-        print(f"[GTM] Saved contact request from {email}", file=sys.stderr)
+        print(f"[GTM] Contact request from {email}: {outcome}", file=sys.stderr)
 
+        if outcome == "duplicate":
+            return {
+                "success": True,
+                "duplicate": True,
+                "reference": submission.key[:12],
+                "message": f"This request from {email} was already saved earlier in the conversation; nothing new was added.",
+            }
         return {
             "success": True,
-            "contact_id": result["id"] if result else None,
+            "reference": submission.key[:12],
             "message": f"Thanks {full_name}! Your contact request has been saved. An agency will reach out to {email} soon.",
         }
 
@@ -709,22 +1303,105 @@ async def save_contact_request(
 # FastAPI App with AG-UI + CLM
 # =====
 
+import asyncio
 import json
+from contextlib import asynccontextmanager
+from ag_ui.core import RunAgentInput
+from ag_ui.encoder import EventEncoder
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import StreamingResponse
-import google.generativeai as genai
+from pydantic_ai.ag_ui import SSE_CONTENT_TYPE, run_ag_ui
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+from .sessions import (
+    SESSION_IDLE_TTL,
+    SESSION_MAX_BYTES,
+    SESSION_MAX_SESSIONS,
+    SESSION_SQLITE_PATH,
+    SESSION_SQLITE_TTL,
+    SESSION_SWEEP_SECONDS,
+    SessionDeps,
+    SessionStore,
+    Snapshot,
+)
+from .voice_sessions import (
+    VOICE_MAX_MODELS,
+    VOICE_MAX_SESSIONS,
+    VOICE_SESSION_IDLE_TTL,
+    VoiceSessionStore,
+    transcript,
+)
+
+def voice_model(system_instruction: str):
+    return generativeai().GenerativeModel('gemini-2.0-flash-exp', system_instruction=system_instruction)
 
-# Configure Google AI
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
-# Create AG-UI app from agent
-ag_ui_app = agent.to_ag_ui(deps=StateDeps(AppState()))
+# Gemini chats reused across the turns of a Hume voice session
+voice_sessions = VoiceSessionStore(
+    voice_model,
+    max_sessions=VOICE_MAX_SESSIONS,
+    idle_ttl=VOICE_SESSION_IDLE_TTL,
+    max_models=VOICE_MAX_MODELS,
+    compactor=compactor,
+)
+
+# Per-thread AppState for AG-UI runs
+sessions = SessionStore(
+    AppState,
+    max_sessions=SESSION_MAX_SESSIONS,
+    idle_ttl=SESSION_IDLE_TTL,
+    max_bytes=SESSION_MAX_BYTES,
+    sqlite_path=SESSION_SQLITE_PATH,
+    sqlite_ttl=SESSION_SQLITE_TTL,
+    sweep_interval=SESSION_SWEEP_SECONDS,
+)
+ACTIVE_SESSIONS.set_function(lambda: len(sessions))
+
+
+warm_up = WarmUp()
+
+
+async def warm_llm_clients() -> None:
+    """Import the Gemini SDKs and build the chat and default voice models."""
+    def build():
+        chat_model.wrapped
+        return voice_sessions.build_model(GTM_VOICE_SYSTEM_PROMPT)
+
+    # Built on a worker thread, cached on the loop, which owns the model LRU.
+    voice_sessions.add_model(GTM_VOICE_SYSTEM_PROMPT, await asyncio.to_thread(build))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serving at once and warm up in the background; tear down on shutdown."""
+    await sessions.open()
+    sessions.start()
+    # Tools also open the pool, load the catalog and build clients lazily,
+    # but /ready stays 503 until every step has succeeded (failed ones retry).
+    warm_up.start({
+        "database": db.open,
+        "catalog": catalog.ensure_loaded,
+        "llm_clients": warm_llm_clients,
+    })
+    catalog.start()
+    search_index.start()
+    contact_queue.start()
+    yield
+    await warm_up.stop()
+    await contact_queue.close()
+    await search_index.stop()
+    await compactor.close()
+    await prefetcher.close()
+    await catalog.stop()
+    await db.close()
+    await sessions.close()
+
 
 # Main FastAPI app
 main_app = FastAPI(
     title="GTM.quest Agent",
     description="AI-Powered Go-To-Market Strategy Advisor",
+    lifespan=lifespan,
 )
 
 # CORS for cross-origin requests
@@ -739,10 +1416,32 @@ main_app.add_middleware(
 
 @main_app.get("/health")
 async def health_check():
-    """Health check endpoint."""
+    """Liveness: the process is up and serving."""
     return {"status": "healthy", "agent": "gtm_agent"}
 
 
+@main_app.get("/ready")
+async def readiness_check():
+    """Readiness: 503 until every startup warm-up step has succeeded."""
+    report = warm_up.report()
+    return JSONResponse(
+        {"status": "ready" if report["ready"] else "warming_up", **report},
+        status_code=200 if report["ready"] else 503,
+    )
+
+
+if METRICS_ENABLED:
+    @main_app.get("/metrics")
+    async def metrics():
+        """Prometheus scrape endpoint."""
+        return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+    @main_app.get("/metrics/clm-cache")
+    async def clm_cache_stats():
+        """Voice reply cache totals and its most-hit entries."""
+        return reply_cache.stats()
+
+
 # =====
 # CLM Endpoint for Hume Voice
 # =====
@@ -763,24 +1462,12 @@ Voice guidelines:
 """
 
 
-async def stream_sse_response(content: str, msg_id: str):
-    """Stream OpenAI-compatible SSE chunks for Hume EVI."""
-    words = content.split(' ')
-    for i, word in enumerate(words):
-        chunk = {
-            "id": msg_id,
-            "object": "chat.completion.chunk",
-            "choices": [{
-                "index": 0,
-                "delta": {"content": word + (' ' if i < len(words) - 1 else '')},
-                "finish_reason": None
-            }]
-        }
-        yield f"data: {json.dumps(chunk)}\n\n"
+def send_voice_turn(chat, message: str) -> AsyncIterator[str]:
+    """Stream one voice turn ahead of text chat in the Gemini queue.
 
-    # Send finish chunk
-    yield f"data: {json.dumps({'choices': [{'delta': {}, 'finish_reason': 'stop'}]})}\n\n"
-    yield "data: [DONE]\n\n"
+    Overloaded surfaces in stream_sse_response, which speaks FALLBACK_REPLY.
+    """
+    return admitted_tokens(gemini_text_stream(chat, message), gemini_admission, "voice", LLM_VOICE_QUEUE_TIMEOUT)
 
 
 @main_app.post("/chat/completions")
@@ -790,63 +1477,91 @@ async def clm_endpoint(request: Request):
         body = await request.json()
         messages = body.get("messages", [])
 
-        # Extract user message
-        user_msg = ""
+        # Hume's system prompt carries the user's context when provided
         system_prompt = GTM_VOICE_SYSTEM_PROMPT
-
         for msg in messages:
             if msg.get("role") == "system":
-                # Use Hume's system prompt if provided (contains user context)
                 system_prompt = msg.get("content", GTM_VOICE_SYSTEM_PROMPT)
-            elif msg.get("role") == "user":
-                user_msg = msg.get("content", "")
-
-        if not user_msg:
-            user_msg = "Hello"
-
-        # Call Google Gemini for response
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
-
-        # Build conversation history for context
-        history = []
-        for msg in messages:
-            role = msg.get("role", "")
-            content = msg.get("content", "")
-            if role == "user":
-                history.append({"role": "user", "parts": [content]})
-            elif role == "assistant":
-                history.append({"role": "model", "parts": [content]})
-
-        # Create chat with history
-        chat = model.start_chat(history=history[:-1] if history else [])
 
-        # Add system prompt to the user message for context
-        full_prompt = f"{system_prompt}\n\nUser: {user_msg}\n\nRespond naturally and concisely (1-2 sentences for voice):"
-
-        response = chat.send_message(full_prompt)
-        response_text = response.text.strip()
+        turns = transcript(messages)
+        user_msg = turns[-1]["parts"][0] if turns and turns[-1]["role"] == "user" else "Hello"
 
         # Generate message ID
         msg_id = f"clm-{hash(user_msg) % 100000}"
 
-        print(f"[CLM] User: {user_msg[:50]}... -> Response: {response_text[:50]}...", file=sys.stderr)
-
+        cache_key = reply_cache.key(system_prompt, turns)
+        cached = reply_cache.get(cache_key)
+        if cached is not None:
+            # The session's chat catches up from the transcript next turn.
+            tokens = single_reply(cached)
+        else:
+            # Hume appends the session's customSessionId to the CLM URL.
+            session_id = request.query_params.get("custom_session_id")
+            reply = voice_sessions.stream_turn(session_id, system_prompt, turns, send_voice_turn)
+            if cache_key is not None:
+                reply = reply_cache.record(cache_key, user_msg, reply)
+            tokens = timed_tokens(reply, "clm")
         return StreamingResponse(
-            stream_sse_response(response_text, msg_id),
+            count_sse_bytes(coalesce(stream_sse_response(tokens, msg_id, log_label=user_msg)), "clm"),
             media_type="text/event-stream"
         )
 
     except Exception as e:
         print(f"[CLM] Error: {e}", file=sys.stderr)
-        error_msg = "I'm having trouble responding right now. Could you try again?"
         return StreamingResponse(
-            stream_sse_response(error_msg, "clm-error"),
+            coalesce(stream_sse_response(single_reply(FALLBACK_REPLY), "clm-error")),
             media_type="text/event-stream"
         )
 
 
-# Mount AG-UI app at root for CopilotKit
-main_app.mount("/", ag_ui_app)
+# =====
+# AG-UI Endpoint for CopilotKit
+# =====
+
+@main_app.post("/")
+async def ag_ui_endpoint(request: Request):
+    """Run the agent for one AG-UI request against its thread's stored state."""
+    accept = request.headers.get("accept", SSE_CONTENT_TYPE)
+    try:
+        run_input = RunAgentInput.model_validate(await request.json())
+        # The stored state is authoritative; client state only seeds new threads.
+        state, base = await sessions.load(run_input.thread_id)
+        if state is None:
+            state = AppState.model_validate(run_input.state or {})
+            base = Snapshot.of(state)
+    except ValidationError as e:
+        return Response(content=e.json(), media_type="application/json", status_code=422)
+
+    if gemini_admission.saturated:
+        # Turn the run away before streaming rather than queueing it behind a full backlog.
+        return Response(
+            content=json.dumps({"error": "The assistant is busy. Please retry shortly."}),
+            media_type="application/json",
+            status_code=503,
+            headers={"Retry-After": "2"},
+        )
+
+    # Tools send JSON Patch deltas; the client only needs a full snapshot when
+    # it connects or its copy has drifted from the stored state.
+    current = state.model_dump(mode="json")
+    snapshot = state_snapshot(state) if run_input.state != current else None
+    run_input = run_input.model_copy(update={"state": current})
+    deps = SessionDeps(state=state, thread_id=run_input.thread_id)
+
+    async def event_stream():
+        pending = snapshot
+        try:
+            async for chunk in run_ag_ui(agent, run_input, accept, deps=deps):
+                yield chunk
+                if pending is not None:
+                    # Right after RUN_STARTED.
+                    yield EventEncoder(accept=accept).encode(pending)
+                    pending = None
+        finally:
+            await sessions.save(deps.thread_id, deps.live_state, base)
+
+    return StreamingResponse(count_sse_bytes(coalesce(event_stream()), "ag_ui"), media_type=accept)
+
 
 # Export for uvicorn
 app = main_app
@@ -0,0 +1,145 @@
+"""
+Budget allocation optimizer.
+
+Each channel has a concave response curve `weight * log(1 + spend / scale)`:
+`weight` reflects how well the channel fits the GTM motion and stage, and
+`scale` is roughly the spend at which returns start to flatten. Maximizing
+total response for a fixed budget has a closed-form "water-filling"
+solution, so the split is exact, deterministic and takes microseconds.
+"""
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from .roi import normalize_stage, normalize_strategy
+
+CHANNELS = [
+    "Paid Acquisition",
+    "Content & SEO",
+    "Outbound & SDRs",
+    "Account-Based Marketing",
+    "Product-Led Onboarding",
+    "Events & Community",
+    "Partnerships",
+    "Tools & Data",
+]
+
+# Channel fit for each GTM motion (same order as CHANNELS).
+STRATEGY_WEIGHTS = {
+    "plg":       np.array([1.0, 1.3, 0.3, 0.2, 1.6, 0.8, 0.6, 0.5]),
+    "sales_led": np.array([0.6, 0.7, 1.6, 1.4, 0.2, 0.9, 0.8, 0.6]),
+    "hybrid":    np.array([0.9, 1.0, 1.1, 0.9, 0.9, 0.8, 0.7, 0.6]),
+}
+
+# Stage adjustments: early companies lean on cheap channels, later ones can
+# afford ABM, events and partner programs.
+STAGE_WEIGHTS = {
+    "pre_seed":   np.array([1.0, 1.3, 0.9, 0.3, 1.2, 0.8, 0.6, 0.7]),
+    "seed":       np.array([1.0, 1.2, 1.0, 0.5, 1.1, 0.9, 0.7, 0.8]),
+    "series_a":   np.array([1.0, 1.0, 1.1, 0.9, 1.0, 1.0, 0.9, 0.9]),
+    "series_b":   np.array([1.0, 0.9, 1.1, 1.2, 1.0, 1.1, 1.1, 1.0]),
+    "growth":     np.array([1.0, 0.9, 1.0, 1.3, 0.9, 1.2, 1.2, 1.0]),
+    "enterprise": np.array([0.9, 0.8, 1.0, 1.4, 0.7, 1.2, 1.3, 1.0]),
+}
+
+# Monthly spend ($) where each channel's returns start to flatten, per GTM
+# motion. A small scale also means a channel pays off from the first dollar,
+# so it decides what a small budget funds: outbound is cheap to start for a
+# sales-led team (one SDR, a data tool) but slow to pay off for PLG.
+STRATEGY_SCALES = {
+    "plg":       np.array([3_000, 2_000, 8_000, 8_000, 1_500, 5_000, 4_000, 2_500], dtype=float),
+    "sales_led": np.array([4_000, 2_500, 4_000, 5_000, 8_000, 5_000, 4_000, 1_500], dtype=float),
+    "hybrid":    np.array([3_000, 2_500, 3_000, 6_000, 2_000, 5_000, 4_000, 2_500], dtype=float),
+}
+
+
+@dataclass(frozen=True)
+class Allocation:
+    total: float
+    categories: list[dict]  # {"name", "amount", "percentage"}
+    stage: str
+    strategy_type: str
+
+
+def solve_allocation(weights: np.ndarray, scales: np.ndarray, budget: float) -> np.ndarray:
+    """Maximize sum(w * log(1 + x / s)) subject to sum(x) = budget, x >= 0.
+
+    The optimum sets every funded channel's marginal return w / (s + x) to a
+    common level; channels whose marginal return at zero spend is below it
+    get nothing. Sorting by w / s makes the funded set a prefix.
+    """
+    order = np.argsort(-(weights / scales))
+    w, s = weights[order], scales[order]
+    # Common marginal level if the first k channels are funded.
+    levels = np.cumsum(w) / (budget + np.cumsum(s))
+    # k is the largest prefix whose last channel still has positive spend.
+    funded = np.nonzero(w / s > levels)[0]
+    k = int(funded[-1]) + 1 if funded.size else 1
+    spend = np.zeros_like(w)
+    spend[:k] = w[:k] / levels[k - 1] - s[:k]
+
+    result = np.zeros_like(spend)
+    result[order] = np.maximum(spend, 0.0)
+    return result
+
+
+def _round_to_total(values: np.ndarray, total: int) -> np.ndarray:
+    """Round to integers that sum exactly to `total` (largest remainder)."""
+    floors = np.floor(values).astype(np.int64)
+    shortfall = int(total - floors.sum())
+    if shortfall > 0:
+        floors[np.argsort(-(values - floors))[:shortfall]] += 1
+    return floors
+
+
+def is_valid_budget(total_budget: Optional[float]) -> bool:
+    """Whether there is a budget to split: finite and at least one cent."""
+    return total_budget is not None and math.isfinite(total_budget) and round(total_budget * 100) >= 1
+
+
+def allocate_budget(
+    total_budget: float,
+    strategy_type: Optional[str] = None,
+    stage: Optional[str] = None,
+    min_share: float = 0.02,
+) -> Allocation:
+    """Split a monthly budget across GTM channels.
+
+    Channels that would get less than `min_share` of the total are dropped
+    and their spend re-solved across the rest. Amounts are whole cents that
+    sum exactly to the total; percentages sum to exactly 100.
+    """
+    if not is_valid_budget(total_budget):
+        raise ValueError("total_budget must be positive")
+
+    strategy_key = normalize_strategy(strategy_type) or "hybrid"
+    stage_key = normalize_stage(stage) or "seed"
+    weights = STRATEGY_WEIGHTS[strategy_key] * STAGE_WEIGHTS[stage_key]
+    scales = STRATEGY_SCALES[strategy_key]
+    total_cents = int(round(total_budget * 100))
+
+    active = np.ones(len(CHANNELS), dtype=bool)
+    while True:
+        spend = np.zeros(len(CHANNELS))
+        spend[active] = solve_allocation(weights[active], scales[active], total_budget)
+        small = active & (spend < min_share * total_budget)
+        if not small.any() or small.sum() == active.sum():
+            break
+        active &= ~small
+
+    cents = _round_to_total(spend / spend.sum() * total_cents, total_cents)
+    tenths = _round_to_total(cents / total_cents * 1000, 1000)
+
+    categories = [
+        {"name": CHANNELS[i], "amount": int(cents[i]) / 100, "percentage": int(tenths[i]) / 10}
+        for i in np.argsort(-cents, kind="stable")
+        if cents[i] > 0
+    ]
+    return Allocation(
+        total=total_cents / 100,
+        categories=categories,
+        stage=stage_key,
+        strategy_type=strategy_key,
+    )
@@ -0,0 +1,116 @@
+"""
+LRU + TTL result cache with request coalescing.
+
+Sits in front of agency search ranking: a hit returns the already-ranked
+page, and concurrent misses for the same key share one in-flight load
+(single-flight) instead of each scoring the whole catalog.
+Every entry records the source version it was built from (the catalog
+generation), so a change to the underlying rows invalidates it on the next
+read without any explicit purge.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple
+
+from .metrics import CACHE_ENTRIES, CACHE_REQUESTS, METRICS_ENABLED
+
+AGENCY_CACHE_MAX_ENTRIES = int(os.getenv("AGENCY_CACHE_MAX_ENTRIES", "512"))
+AGENCY_CACHE_TTL = float(os.getenv("AGENCY_CACHE_TTL", "300"))
+
+
+class _Entry(NamedTuple):
+    value: Any
+    version: Hashable
+    expires_at: float
+
+
+class ResultCache:
+    """Bounded async cache; `get_or_load` is the only way in."""
+
+    def __init__(self, name: str, max_entries: int = 512, ttl: float = 300.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._gauge()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        version: Callable[[], Hashable],
+        load: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return the cached value for `key`, loading it at most once at a time.
+
+        `version()` is read before and after the load; an entry is only
+        stored if the source didn't change while it was being built.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version() and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._count("hit")
+            return entry.value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            self._count("coalesced")
+        else:
+            self.misses += 1
+            self._count("miss")
+            # Its own task, so one caller being cancelled doesn't fail the rest.
+            task = asyncio.create_task(self._fill(key, version, load))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fill(
+        self,
+        key: Hashable,
+        version: Callable[[], Hashable],
+        load: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        before = version()
+        value = await load()
+        if version() == before:
+            self._store(key, _Entry(value, before, time.monotonic() + self.ttl))
+        return value
+
+    def _store(self, key: Hashable, entry: _Entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._gauge()
+
+    def _count(self, result: str) -> None:
+        if METRICS_ENABLED:
+            CACHE_REQUESTS.inc(1, self.name, result)
+
+    def _gauge(self) -> None:
+        if METRICS_ENABLED:
+            CACHE_ENTRIES.set(len(self._entries), self.name)
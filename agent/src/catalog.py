@@ -0,0 +1,281 @@
+"""
+In-process catalog of published GTM agencies.
+
+The published catalog is a few hundred rows, so it is loaded once at startup
+and kept in memory, sorted by rank, with inverted indexes for location
+filters (service area, headquarters token); ranking for search lives in
+matching.AgencyMatcher. A background task pulls
+rows changed since the last `updated_at` watermark, so the search tools never
+touch Postgres on the request path. `generation` goes up whenever the rows
+actually change, for caches built on top of the catalog.
+
+Loads read the table in keyset pages (`id > last id`) rather than one
+result set, and both go through `fetch_prepared` (prepared statements on a
+direct connection, plain queries behind a pooler).
+Listings page the same way: `encode_cursor` turns the sort key of the last
+row a tool returned into an opaque cursor, and the next page starts after
+that key, so pages stay stable while the catalog changes underneath.
+"""
+import asyncio
+import base64
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from bisect import bisect_right
+from typing import Optional, Sequence
+
+from .db import DatabasePool, db
+
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+# Incremental refreshes can't see hard deletes, so reload everything now and then.
+CATALOG_FULL_RELOAD_SECONDS = float(os.getenv("CATALOG_FULL_RELOAD_SECONDS", "3600"))
+# Re-read a small window before the watermark to catch rows committed late.
+WATERMARK_OVERLAP = timedelta(seconds=5)
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "1000"))
+
+CATALOG_QUERY = """
+    SELECT id, slug, name, description, overview, headquarters, logo_url, website,
+           specializations, service_areas, key_services, global_rank,
+           founded_year, employee_count, pricing_model, min_budget,
+           avg_rating, review_count, status, updated_at
+    FROM companies
+    WHERE app = 'gtm'
+"""
+# $n placeholders; see DatabasePool.fetch_prepared.
+FIRST_PAGE_QUERY = CATALOG_QUERY + " AND status = 'published' ORDER BY id LIMIT $1"
+NEXT_PAGE_QUERY = CATALOG_QUERY + " AND status = 'published' AND id > $1 ORDER BY id LIMIT $2"
+CHANGED_QUERY = CATALOG_QUERY + " AND updated_at > $1"
+
+_TOKEN_RE = re.compile(r"[^\w]+")
+
+
+def normalize(value: str) -> str:
+    """Case- and whitespace-insensitive key for facet lookups."""
+    return " ".join(value.casefold().split())
+
+
+def tokenize(value: str) -> list[str]:
+    """Split a location like 'London, UK' into ['london', 'uk']."""
+    return [t for t in _TOKEN_RE.split(value.casefold()) if t]
+
+
+def rank_key(row: dict) -> tuple:
+    """Catalog order: global rank (unranked last), then name; slug makes it total."""
+    rank = row.get("global_rank")
+    return (rank is None, rank if rank is not None else 0, row["name"] or "", row["slug"])
+
+
+# Element types of a rank_key, for decode_cursor.
+RANK_KEY_TYPES = (bool, (int, float), str, str)
+
+
+class InvalidCursor(ValueError):
+    """A pagination cursor that is malformed, or no longer matches the data it paged."""
+
+
+def encode_cursor(key: Sequence) -> str:
+    """Opaque pagination cursor for a sort key of JSON-able values."""
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence) -> tuple:
+    """The sort key inside a cursor from `encode_cursor`.
+
+    `types` gives the isinstance check for each element, so a well-formed
+    cursor for some other key can't reach a comparison as the wrong types.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        key = None
+    if (
+        not isinstance(key, list)
+        or len(key) != len(types)
+        or not all(isinstance(value, t) for value, t in zip(key, types))
+    ):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+    return tuple(key)
+
+
+class AgencyCatalog:
+    """Published agencies indexed by facet and sorted by global rank."""
+
+    def __init__(
+        self,
+        pool: DatabasePool,
+        refresh_interval: float = 60.0,
+        full_reload_interval: float = 3600.0,
+        page_size: int = 1000,
+    ):
+        self.pool = pool
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.page_size = page_size
+        self.rows: dict[str, dict] = {}
+        self.by_service_area: dict[str, set[str]] = {}
+        self.by_headquarters_token: dict[str, set[str]] = {}
+        self.ranked: list[str] = []
+        self.watermark: Optional[datetime] = None
+        self.loaded_at: Optional[float] = None
+        self.generation = 0
+        self._task: Optional[asyncio.Task] = None
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    # -- loading --
+
+    async def load(self) -> None:
+        """Replace the whole catalog with a fresh read of `companies`."""
+        async with self._load_lock:
+            await self._load()
+
+    async def ensure_loaded(self) -> None:
+        """Load on first use; concurrent callers share a single load."""
+        if not self.is_loaded:
+            async with self._load_lock:
+                if not self.is_loaded:
+                    await self._load()
+
+    async def _load(self) -> None:
+        rows: list[dict] = []
+        page = await self.pool.fetch_prepared("gtm_catalog_first_page", FIRST_PAGE_QUERY, [self.page_size])
+        while True:
+            rows += page
+            if len(page) < self.page_size:
+                break
+            page = await self.pool.fetch_prepared(
+                "gtm_catalog_next_page", NEXT_PAGE_QUERY, [page[-1]["id"], self.page_size],
+            )
+        self.rows = {}
+        self.watermark = None
+        self._apply(rows, changed=True)
+        self.loaded_at = time.monotonic()
+        print(f"[Catalog] Loaded {len(self.rows)} agencies", file=sys.stderr)
+
+    async def refresh(self) -> int:
+        """Apply rows changed since the watermark. Returns the number applied."""
+        if not self.is_loaded or self.watermark is None:
+            await self.load()
+            return len(self.rows)
+        async with self._load_lock:
+            rows = await self.pool.fetch_prepared(
+                "gtm_catalog_changed", CHANGED_QUERY, [self.watermark - WATERMARK_OVERLAP],
+            )
+            if rows:
+                self._apply(rows)
+            return len(rows)
+
+    def start(self) -> None:
+        """Start the background refresh task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop(), name="catalog-refresh")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                if self.loaded_at is None or time.monotonic() - self.loaded_at > self.full_reload_interval:
+                    await self.load()
+                else:
+                    changed = await self.refresh()
+                    if changed:
+                        print(f"[Catalog] Refreshed {changed} agencies", file=sys.stderr)
+            except Exception as e:
+                print(f"[Catalog] Refresh failed: {e}", file=sys.stderr)
+
+    def _apply(self, rows: list[dict], changed: bool = False) -> None:
+        """Upsert (or drop unpublished) rows and rebuild the derived indexes."""
+        for row in rows:
+            row = dict(row)
+            if isinstance(row.get("avg_rating"), Decimal):
+                row["avg_rating"] = float(row["avg_rating"])
+            updated_at = row.get("updated_at")
+            if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+            if row.get("status") == "published":
+                changed = changed or self.rows.get(row["slug"]) != row
+                self.rows[row["slug"]] = row
+            elif self.rows.pop(row["slug"], None) is not None:
+                changed = True
+        if not changed:
+            # Only the re-read overlap window came back.
+            return
+        self._reindex()
+        self.generation += 1
+
+    def _reindex(self) -> None:
+        by_service_area: dict[str, set[str]] = {}
+        by_headquarters_token: dict[str, set[str]] = {}
+        for slug, row in self.rows.items():
+            for area in row.get("service_areas") or []:
+                by_service_area.setdefault(normalize(area), set()).add(slug)
+            for token in tokenize(row.get("headquarters") or ""):
+                by_headquarters_token.setdefault(token, set()).add(slug)
+
+        ranked = sorted(self.rows, key=lambda s: rank_key(self.rows[s]))
+
+        # Swap in one go so readers never see half-built indexes.
+        self.by_service_area = by_service_area
+        self.by_headquarters_token = by_headquarters_token
+        self.ranked = ranked
+
+    # -- queries --
+
+    def get(self, slug: str) -> Optional[dict]:
+        return self.rows.get(slug)
+
+    def top(self, limit: int = 10, after: Optional[tuple] = None) -> list[dict]:
+        """Top-ranked agencies (only those with a global rank), after `after` in rank_key order."""
+        start = 0
+        if after is not None:
+            start = bisect_right(self.ranked, after, key=lambda s: rank_key(self.rows[s]))
+        result = []
+        for slug in self.ranked[start:]:
+            row = self.rows[slug]
+            if row.get("global_rank") is None or len(result) >= limit:
+                break
+            result.append(row)
+        return result
+
+    def match_location(self, location: str) -> set[str]:
+        needle = location.casefold()
+        tokens = tokenize(location)
+        if tokens:
+            postings = [self.by_headquarters_token.get(t, set()) for t in tokens]
+            hq = set.intersection(*postings)
+        else:
+            hq = set()
+        if not hq:
+            # Partial words ("Lond") aren't in the token index; the catalog is
+            # small enough to scan.
+            hq = set(self.rows)
+        hq = {s for s in hq if needle in (self.rows[s].get("headquarters") or "").casefold()}
+        return hq | self.by_service_area.get(normalize(location), set())
+
+
+catalog = AgencyCatalog(
+    db,
+    refresh_interval=CATALOG_REFRESH_SECONDS,
+    full_reload_interval=CATALOG_FULL_RELOAD_SECONDS,
+    page_size=CATALOG_PAGE_SIZE,
+)
@@ -0,0 +1,222 @@
+"""
+Conversation history compaction.
+
+Once a conversation's history grows past COMPACT_TRIGGER_TOKENS, every turn
+except the last COMPACT_KEEP_TURNS is replaced by a rolling summary plus
+the structured facts already in AppState. The summary is written by a
+background task; the request path only ever uses the latest finished one
+and never waits for it. Turns that happened since that summary are sent
+verbatim until the next one folds them in. Until the first summary is
+ready the history goes out as-is.
+
+Token counts are estimated (~4 characters per token), which is plenty for
+budgeting and for the tokens-saved metric. `plan` runs on every model
+request, including each tool-call round trip within one run, so savings
+are counted once per user turn rather than once per call.
+"""
+import asyncio
+import hashlib
+import os
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from .metrics import HISTORY_SUMMARIES, HISTORY_TOKENS_SAVED, METRICS_ENABLED
+from .startup import generativeai
+
+COMPACT_KEEP_TURNS = int(os.getenv("COMPACT_KEEP_TURNS", "6"))
+COMPACT_TRIGGER_TOKENS = int(os.getenv("COMPACT_TRIGGER_TOKENS", "4000"))
+COMPACT_SUMMARY_TOKENS = int(os.getenv("COMPACT_SUMMARY_TOKENS", "300"))
+# Re-summarize once this many turns have aged out of the verbatim window.
+COMPACT_BATCH_TURNS = int(os.getenv("COMPACT_BATCH_TURNS", "2"))
+COMPACT_MAX_CONVERSATIONS = int(os.getenv("COMPACT_MAX_CONVERSATIONS", "2000"))
+
+# (previous summary or None, turns to fold in, word budget) -> new summary
+Summarizer = Callable[[Optional[str], list[str], int], Awaitable[str]]
+
+
+SUMMARY_PROMPT = """You maintain the running summary of a conversation between a go-to-market (GTM)
+strategist and a founder. Rewrite the summary so it also covers the new turns below. Keep the
+company's situation, goals, constraints, decisions, recommendations already made and open
+questions. Plain prose, at most {max_words} words, no preamble.
+
+Current summary:
+{previous}
+
+New turns:
+{turns}"""
+
+
+def gemini_summarizer(model_name: str = "gemini-2.0-flash") -> Summarizer:
+    """Summarizer backed by a Gemini model, created on the first summary."""
+    model = None
+
+    async def summarize(previous: Optional[str], turns: list[str], max_words: int) -> str:
+        nonlocal model
+        if model is None:
+            model = generativeai().GenerativeModel(model_name)
+        prompt = SUMMARY_PROMPT.format(
+            max_words=max_words,
+            previous=previous or "(none yet)",
+            turns="\n\n".join(turns),
+        )
+        response = await model.generate_content_async(
+            prompt, generation_config={"max_output_tokens": max_words * 2, "temperature": 0.2}
+        )
+        return response.text
+
+    return summarize
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def extractive_summary(previous: Optional[str], turns: list[str], max_words: int) -> str:
+    """No-LLM fallback: the start of each turn, newest kept when over budget."""
+    lines = [previous] if previous else []
+    lines += [" ".join(t.split()[:40]) for t in turns]
+    words: list[str] = []
+    for line in reversed(lines):
+        line_words = line.split()
+        if len(words) + len(line_words) > max_words:
+            if not words:
+                # Even the newest turn is over budget: keep its start.
+                words = line_words[:max_words]
+            break
+        words = line_words + words
+    return " ".join(words)
+
+
+@dataclass(frozen=True)
+class Compacted:
+    """Replace the first `cut` turns with `block`."""
+    cut: int
+    block: str
+    tokens_saved: int
+
+
+@dataclass
+class _Summary:
+    text: str
+    covered: int
+    anchor: str  # digest of the last covered turn, to detect edited history
+    counted: int = 0  # turn count whose savings the metric already has
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class HistoryCompactor:
+    """Per-conversation rolling summaries, refreshed off the request path."""
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        keep_turns: int = 6,
+        trigger_tokens: int = 4000,
+        summary_tokens: int = 300,
+        batch_turns: int = 2,
+        max_conversations: int = 2000,
+    ):
+        self.summarize = summarize
+        self.keep_turns = keep_turns
+        self.trigger_tokens = trigger_tokens
+        self.summary_tokens = summary_tokens
+        self.batch_turns = batch_turns
+        self.max_conversations = max_conversations
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def plan(self, key: str, turns: list[str], facts: str = "", path: str = "") -> Optional[Compacted]:
+        """How to compact `turns` (rendered, oldest first) right now, if at all.
+
+        Also schedules a background summary when enough turns have aged out
+        of the verbatim window since the last one.
+        """
+        if not key or len(turns) <= self.keep_turns:
+            return None
+        sizes = [estimate_tokens(t) for t in turns]
+        if sum(sizes) <= self.trigger_tokens:
+            return None
+
+        target = len(turns) - self.keep_turns
+        summary = self._summaries.get(key)
+        if summary is not None and (
+            summary.covered > target or summary.anchor != _digest(turns[summary.covered - 1])
+        ):
+            # History was edited or truncated under us; start over.
+            summary = None
+        covered = summary.covered if summary else 0
+        if summary is None or target - covered >= self.batch_turns:
+            self._schedule(key, summary, turns[covered:target], target, _digest(turns[target - 1]), path)
+
+        if summary is None:
+            return None
+        self._summaries.move_to_end(key)
+        block = "Summary of the earlier conversation: " + summary.text
+        if facts:
+            block += "\n\nKnown facts: " + facts
+        saved = sum(sizes[:summary.covered]) - estimate_tokens(block)
+        if saved <= 0:
+            return None
+        if summary.counted != len(turns):
+            summary.counted = len(turns)
+            if METRICS_ENABLED:
+                HISTORY_TOKENS_SAVED.inc(saved, path)
+        return Compacted(cut=summary.covered, block=block, tokens_saved=saved)
+
+    def _schedule(
+        self,
+        key: str,
+        previous: Optional[_Summary],
+        turns: list[str],
+        covered: int,
+        anchor: str,
+        path: str,
+    ) -> None:
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._refresh(key, previous, turns, covered, anchor, path))
+        self._tasks[key] = task
+        task.add_done_callback(lambda t: self._tasks.pop(key, None) if self._tasks.get(key) is t else None)
+
+    async def _refresh(
+        self,
+        key: str,
+        previous: Optional[_Summary],
+        turns: list[str],
+        covered: int,
+        anchor: str,
+        path: str,
+    ) -> None:
+        max_words = max(self.summary_tokens * 3 // 4, 20)
+        prior = previous.text if previous else None
+        try:
+            text = await self.summarize(prior, turns, max_words)
+            outcome = "ok"
+        except Exception as e:
+            print(f"[Compact] Summary failed, using extractive fallback: {e}", file=sys.stderr)
+            text = extractive_summary(prior, turns, max_words)
+            outcome = "fallback"
+        if METRICS_ENABLED:
+            HISTORY_SUMMARIES.inc(1, path, outcome)
+        current = self._summaries.get(key)
+        self._summaries[key] = _Summary(
+            text=text.strip(),
+            covered=covered,
+            anchor=anchor,
+            counted=current.counted if current else 0,
+        )
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > self.max_conversations:
+            self._summaries.popitem(last=False)
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
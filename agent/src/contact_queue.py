@@ -0,0 +1,459 @@
+"""
+Write-behind queue for contact submissions.
+
+A submission is appended to a local spool file and fsync'd before the tool
+answers, so the user gets an immediate acknowledgement and the lead
+survives a slow or unavailable database. A background worker inserts
+spooled submissions into `contact_submissions` in multi-row batches,
+backing off while the database is failing, and appends an ack line for
+each batch that landed.
+
+Every submission carries an idempotency key (email + session + what was
+asked), so a batch retried after an ambiguous failure, or replayed from
+the spool after a crash, never creates duplicate rows (see
+migrations/001), while a second, different request in the same chat is
+saved on its own. If migrations/001 hasn't been applied, the first insert
+fails on the ON CONFLICT clause; the queue then logs a warning and falls
+back to plain inserts (no dedup) rather than retrying that batch forever.
+
+When a batch insert fails, its rows are retried one at a time so a single
+bad record (a NUL byte, an over-long field) doesn't hold up the rest. A
+row that keeps failing for reasons other than the database being
+unreachable is moved to a dead-letter file (CONTACT_DEAD_LETTER_PATH,
+next to the spool by default) after CONTACT_MAX_ATTEMPTS tries and
+acked. Attempts are counted in memory, so a restart gives a failing row
+a fresh set of tries.
+
+The spool is JSON lines: submission records plus {"ack": key} lines. On
+startup, records without an ack are queued again. On shutdown the worker
+gets CONTACT_DRAIN_TIMEOUT seconds to empty the queue; anything left
+stays in the spool for the next start.
+
+The spool only protects leads if it outlives the process, so there is no
+default location: CONTACT_SPOOL_PATH must point at a persistent volume
+(a container's temp directory is wiped on every redeploy). Without it the
+queue logs a warning at startup and every submission is inserted
+directly, so a failed write is reported to the user rather than lost.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Optional
+
+from .db import db
+from .metrics import CONTACT_QUEUE_DEPTH, CONTACT_WRITES, METRICS_ENABLED
+
+CONTACT_SPOOL_PATH = os.getenv("CONTACT_SPOOL_PATH") or None
+CONTACT_BATCH_SIZE = int(os.getenv("CONTACT_BATCH_SIZE", "50"))
+# How long the worker lets submissions accumulate before inserting.
+CONTACT_FLUSH_INTERVAL = float(os.getenv("CONTACT_FLUSH_INTERVAL", "0.5"))
+CONTACT_RETRY_MAX_SECONDS = float(os.getenv("CONTACT_RETRY_MAX_SECONDS", "60"))
+CONTACT_DRAIN_TIMEOUT = float(os.getenv("CONTACT_DRAIN_TIMEOUT", "5"))
+# Tries before a row that the database keeps rejecting is dead-lettered.
+CONTACT_MAX_ATTEMPTS = int(os.getenv("CONTACT_MAX_ATTEMPTS", "5"))
+CONTACT_DEAD_LETTER_PATH = os.getenv("CONTACT_DEAD_LETTER_PATH") or None
+
+# Rewrite the spool without acknowledged records past this many acks.
+COMPACT_AFTER_ACKS = 1000
+
+INSERT_QUERY = """
+    INSERT INTO contact_submissions
+    (submission_type, full_name, email, company_name, message, site, created_at, idempotency_key)
+    VALUES {values}
+    ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+    RETURNING idempotency_key
+"""
+INSERT_ROW = "('gtm_consultation', %s, %s, %s, %s, 'gtm', %s, %s)"
+# Without migrations/001 (no idempotency_key column or unique index).
+PLAIN_INSERT_QUERY = """
+    INSERT INTO contact_submissions
+    (submission_type, full_name, email, company_name, message, site, created_at)
+    VALUES {values}
+    RETURNING id
+"""
+PLAIN_INSERT_ROW = "('gtm_consultation', %s, %s, %s, %s, 'gtm', %s)"
+
+
+def idempotency_key(
+    email: str,
+    session_id: Optional[str],
+    company_name: Optional[str] = None,
+    message: Optional[str] = None,
+) -> str:
+    """Same email, conversation and request -> same key. No session, no dedup.
+
+    Company and message are compared ignoring case and spacing, so a model
+    retrying the same call dedups but a request about something else doesn't.
+    """
+    request = "|".join(" ".join((v or "").casefold().split()) for v in (company_name, message))
+    basis = f"{email.strip().casefold()}|{session_id or uuid.uuid4().hex}|{request}"
+    return hashlib.sha256(basis.encode()).hexdigest()[:32]
+
+
+def _missing_idempotency_index(error: Exception) -> bool:
+    """Whether an insert failed because migrations/001 hasn't been applied."""
+    import psycopg2.errors
+
+    # UndefinedColumn: no idempotency_key column. InvalidColumnReference: no
+    # unique index matching the ON CONFLICT clause.
+    return isinstance(error, (psycopg2.errors.UndefinedColumn, psycopg2.errors.InvalidColumnReference))
+
+
+def _database_unavailable(error: Exception) -> bool:
+    """Whether an insert failed because of the database, not the rows in it."""
+    import psycopg2
+    import psycopg2.pool
+
+    # RuntimeError: the pool isn't configured (no DATABASE_URL).
+    return isinstance(error, (
+        OSError,
+        TimeoutError,
+        RuntimeError,
+        psycopg2.OperationalError,
+        psycopg2.InterfaceError,
+        psycopg2.pool.PoolError,
+    ))
+
+
+@dataclass
+class Submission:
+    key: str
+    full_name: str
+    email: str
+    company_name: Optional[str] = None
+    message: Optional[str] = None
+    created_at: str = ""
+
+    @classmethod
+    def create(
+        cls,
+        session_id: Optional[str],
+        full_name: str,
+        email: str,
+        company_name: Optional[str] = None,
+        message: Optional[str] = None,
+    ) -> "Submission":
+        return cls(
+            key=idempotency_key(email, session_id, company_name, message),
+            full_name=full_name,
+            email=email,
+            company_name=company_name,
+            message=message,
+            created_at=datetime.now(timezone.utc).isoformat(),
+        )
+
+
+class ContactQueue:
+    """Spool-backed, batching writer for `contact_submissions`."""
+
+    def __init__(
+        self,
+        pool: Any,
+        path: Optional[str],
+        batch_size: int = 50,
+        flush_interval: float = 0.5,
+        max_backoff: float = 60.0,
+        drain_timeout: float = 5.0,
+        max_attempts: int = 5,
+        dead_letter_path: Optional[str] = None,
+    ):
+        self.pool = pool
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.drain_timeout = drain_timeout
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path or (f"{path}.dead" if path else None)
+        self._pending: "OrderedDict[str, Submission]" = OrderedDict()
+        self._replayed = False
+        # Cleared if contact_submissions lacks the idempotency index.
+        self._upsert = True
+        # Failed single-row inserts per key, for dead-lettering.
+        self._attempts: dict[str, int] = {}
+        self._acks = 0
+        self._file = None
+        self._write_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    # -- lifecycle --
+
+    def start(self) -> None:
+        """Replay the spool and start the worker."""
+        if self.path is None:
+            print(
+                "[GTM] WARNING: CONTACT_SPOOL_PATH is not set. Contact submissions are written "
+                "directly to the database with no spool; set it to a path on a persistent volume.",
+                file=sys.stderr,
+            )
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="contact-queue")
+
+    async def close(self) -> None:
+        """Stop the worker and try to drain; leftovers stay spooled."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self._file is None:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), self.drain_timeout)
+        except Exception as e:
+            print(f"[GTM] Contact queue drain stopped: {e!r}", file=sys.stderr)
+        if self._pending:
+            print(f"[GTM] {len(self._pending)} contact submissions left in {self.path}", file=sys.stderr)
+        self._file.close()
+        self._file = None
+        self._replayed = False
+
+    # -- producers --
+
+    async def submit(self, submission: Submission) -> str:
+        """Durably accept a submission: 'queued', 'duplicate' or 'saved' (written directly)."""
+        if self.path is None:
+            return "saved" if await self._insert([submission]) else "duplicate"
+        if submission.key in self._pending:
+            return "duplicate"
+        try:
+            async with self._write_lock:
+                if submission.key in self._pending:
+                    return "duplicate"
+                await asyncio.to_thread(self._append, [asdict(submission)])
+                self._pending[submission.key] = submission
+        except (OSError, ValueError) as e:
+            # No usable spool: fall back to the synchronous insert.
+            print(f"[GTM] Contact spool unavailable, writing directly: {e}", file=sys.stderr)
+            return "saved" if await self._insert([submission]) else "duplicate"
+        self._gauge()
+        self._wake.set()
+        return "queued"
+
+    # -- worker --
+
+    async def _run(self) -> None:
+        if not self._replayed:
+            async with self._write_lock:
+                replayed = await asyncio.to_thread(self._replay)
+                self._replayed = True
+            if replayed:
+                print(f"[GTM] Replaying {replayed} spooled contact submissions", file=sys.stderr)
+                self._wake.set()
+            self._gauge()
+        delay = 0.0
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            await asyncio.sleep(self.flush_interval)
+            while self._pending:
+                try:
+                    await self._flush_batch()
+                    delay = 0.0
+                except Exception as e:
+                    delay = min(max(delay * 2, 1.0), self.max_backoff)
+                    print(
+                        f"[GTM] Contact insert failed ({len(self._pending)} pending), retrying in {delay:.1f}s: {e}",
+                        file=sys.stderr,
+                    )
+                    await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+
+    async def _drain(self) -> None:
+        while self._pending:
+            await self._flush_batch()
+
+    async def _flush_batch(self) -> None:
+        batch = list(islice(self._pending.values(), self.batch_size))
+        error = None
+        try:
+            inserted = await self._insert(batch)
+            done, dead = batch, []
+        except Exception as e:
+            if len(batch) > 1 and not _database_unavailable(e):
+                # Find the bad rows and save the rest.
+                inserted, done, dead, error = await self._insert_rows(batch)
+            else:
+                inserted, done, dead, error = 0, [], [], e
+                if not _database_unavailable(e):
+                    dead = self._failed(batch[0], e)
+        await self._ack(done, dead)
+        if done:
+            print(
+                f"[GTM] Saved {inserted} contact submissions ({len(done) - inserted} already present)",
+                file=sys.stderr,
+            )
+        if error is not None:
+            raise error
+
+    async def _insert_rows(self, batch: list[Submission]) -> tuple[int, list, list, Optional[Exception]]:
+        """Insert one row at a time: (inserted, saved, dead-lettered, last error)."""
+        inserted, done, dead, error = 0, [], [], None
+        for submission in batch:
+            try:
+                inserted += await self._insert([submission])
+            except Exception as e:
+                error = e
+                if _database_unavailable(e):
+                    break
+                dead += self._failed(submission, e)
+                continue
+            done.append(submission)
+        return inserted, done, dead, error
+
+    def _failed(self, submission: Submission, error: Exception) -> list[tuple[Submission, str]]:
+        """Count a rejected row; returns it for dead-lettering once out of attempts."""
+        attempts = self._attempts.get(submission.key, 0) + 1
+        if attempts < self.max_attempts:
+            self._attempts[submission.key] = attempts
+            return []
+        self._attempts.pop(submission.key, None)
+        print(
+            f"[GTM] Contact submission {submission.key} failed {attempts} times, "
+            f"moving it to {self.dead_letter_path}: {error!r}",
+            file=sys.stderr,
+        )
+        self._count("dead_letter")
+        return [(submission, repr(error))]
+
+    async def _ack(self, done: list[Submission], dead: list[tuple[Submission, str]]) -> None:
+        keys = [s.key for s in done] + [s.key for s, _ in dead]
+        if not keys:
+            return
+        async with self._write_lock:
+            if dead:
+                await asyncio.to_thread(self._dead_letter, dead)
+            await asyncio.to_thread(self._append, [{"ack": key} for key in keys])
+            for key in keys:
+                self._pending.pop(key, None)
+                self._attempts.pop(key, None)
+            self._acks += len(keys)
+            if not self._pending or self._acks >= COMPACT_AFTER_ACKS:
+                await asyncio.to_thread(self._compact)
+        self._gauge()
+
+    async def _insert(self, batch: list[Submission]) -> int:
+        query, row = (INSERT_QUERY, INSERT_ROW) if self._upsert else (PLAIN_INSERT_QUERY, PLAIN_INSERT_ROW)
+        params = []
+        for s in batch:
+            params += [s.full_name, s.email, s.company_name, s.message, s.created_at]
+            if self._upsert:
+                params.append(s.key)
+        query = query.format(values=", ".join([row] * len(batch)))
+        try:
+            rows = await self.pool.fetch_all(query, params)
+        except Exception as e:
+            if self._upsert and _missing_idempotency_index(e):
+                print(
+                    "[GTM] WARNING: contact_submissions has no idempotency_key unique index "
+                    "(apply agent/migrations/001). Falling back to plain inserts; a retried "
+                    f"batch may be saved twice. ({e})",
+                    file=sys.stderr,
+                )
+                self._upsert = False
+                return await self._insert(batch)
+            self._count("error")
+            raise
+        self._count("ok")
+        return len(rows)
+
+    # -- spool file (worker threads) --
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "ab")
+
+    def _append(self, records: list[dict]) -> None:
+        if self._file is None:
+            self._open()
+        self._file.write(b"".join(json.dumps(r).encode() + b"\n" for r in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _dead_letter(self, dead: list[tuple[Submission, str]]) -> None:
+        os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+        failed_at = datetime.now(timezone.utc).isoformat()
+        with open(self.dead_letter_path, "ab") as f:
+            f.write(b"".join(
+                json.dumps({**asdict(s), "error": error, "failed_at": failed_at}).encode() + b"\n"
+                for s, error in dead
+            ))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay(self) -> int:
+        records: "OrderedDict[str, dict]" = OrderedDict()
+        acked = set()
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn final write
+                    if "ack" in record:
+                        acked.add(record["ack"])
+                    else:
+                        records.setdefault(record["key"], record)
+        except FileNotFoundError:
+            pass
+        replayed = 0
+        for key, record in records.items():
+            if key not in acked and key not in self._pending:
+                self._pending[key] = Submission(**record)
+                replayed += 1
+        self._compact()
+        return replayed
+
+    def _compact(self) -> None:
+        """Rewrite the spool with just the pending records."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"".join(json.dumps(asdict(s)).encode() + b"\n" for s in self._pending.values()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        directory = os.open(os.path.dirname(self.path) or ".", os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self._acks = 0
+        self._open()
+
+    # -- metrics --
+
+    def _count(self, outcome: str) -> None:
+        if METRICS_ENABLED:
+            CONTACT_WRITES.inc(1, outcome)
+
+    def _gauge(self) -> None:
+        if METRICS_ENABLED:
+            CONTACT_QUEUE_DEPTH.set(len(self._pending))
+
+
+contact_queue = ContactQueue(
+    db,
+    CONTACT_SPOOL_PATH,
+    batch_size=CONTACT_BATCH_SIZE,
+    flush_interval=CONTACT_FLUSH_INTERVAL,
+    max_backoff=CONTACT_RETRY_MAX_SECONDS,
+    drain_timeout=CONTACT_DRAIN_TIMEOUT,
+    max_attempts=CONTACT_MAX_ATTEMPTS,
+    dead_letter_path=CONTACT_DEAD_LETTER_PATH,
+)
@@ -0,0 +1,266 @@
+"""
+Shared PostgreSQL connection pool for the agent tools.
+
+psycopg2 is a blocking driver, so every query runs on a dedicated thread pool
+sized to the connection pool. The event loop only ever awaits the result, and
+connections (with their TLS + auth handshake) are reused across tool calls.
+psycopg2 itself is imported when the pool opens, on that thread pool.
+
+Queries that run over and over (the catalog's loads and refreshes) go
+through `fetch_prepared`. With DB_PREPARED_STATEMENTS=true each pooled
+connection PREPAREs the statement once and afterwards only sends EXECUTE,
+so Postgres skips parsing and planning. That needs a direct connection:
+behind a transaction-mode pooler (PgBouncer, Neon's `-pooler` endpoints)
+an EXECUTE can reach a server connection that never saw the PREPARE. It
+is off by default, and ignored when DATABASE_URL points at a pooler.
+"""
+import asyncio
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Optional, Sequence
+
+from .metrics import (
+    DB_POOL_IN_USE,
+    DB_POOL_MAX,
+    DB_POOL_WAIT_SECONDS,
+    DB_POOL_WAITING,
+    DB_QUERY_SECONDS,
+    METRICS_ENABLED,
+)
+
+if TYPE_CHECKING:
+    from psycopg2.pool import ThreadedConnectionPool
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Connections idle for longer than this are pinged before being handed out.
+DB_POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "false").lower() not in ("0", "false", "no", "off")
+
+_PLACEHOLDER_RE = re.compile(r"\$\d+")
+# Neon pooler hosts, PgBouncer's default port, or an explicit hint.
+_POOLER_RE = re.compile(r"-pooler\.|[:=]6432\b|pgbouncer=true", re.IGNORECASE)
+
+
+def uses_transaction_pooler(dsn: Optional[str]) -> bool:
+    """Whether `dsn` looks like it goes through a transaction-mode pooler."""
+    return bool(dsn and _POOLER_RE.search(dsn))
+
+
+class DatabasePool:
+    """Bounded, health-checked psycopg2 pool with an async interface."""
+
+    def __init__(
+        self,
+        dsn: Optional[str],
+        min_size: int = 2,
+        max_size: int = 10,
+        check_after: float = 30.0,
+        prepared_statements: bool = False,
+    ):
+        self.dsn = dsn
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.check_after = check_after
+        if prepared_statements and uses_transaction_pooler(dsn):
+            print("[DB] DATABASE_URL goes through a pooler; not using prepared statements", file=sys.stderr)
+            prepared_statements = False
+        self.prepared_statements = prepared_statements
+        self._pool: Optional["ThreadedConnectionPool"] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._last_used: dict[int, float] = {}
+        # Statement names PREPAREd on each pooled connection.
+        self._prepared: dict[int, set[str]] = {}
+        self._open_lock = asyncio.Lock()
+        # Saturation, read by the metrics endpoint.
+        self.in_use = 0
+        self.waiting = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._pool is not None
+
+    async def open(self) -> None:
+        """Create the pool and eagerly open `min_size` connections."""
+        async with self._open_lock:
+            if self._pool is not None:
+                return
+            if not self.dsn:
+                raise RuntimeError("DATABASE_URL is not set")
+
+            executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix="gtm-db")
+            loop = asyncio.get_running_loop()
+            try:
+                pool = await loop.run_in_executor(executor, self._connect)
+            except Exception:
+                executor.shutdown(wait=False)
+                raise
+
+            self._executor = executor
+            self._slots = asyncio.Semaphore(self.max_size)
+            self._pool = pool
+            print(f"[DB] Pool ready ({self.min_size}-{self.max_size} connections)", file=sys.stderr)
+
+    async def close(self) -> None:
+        """Close every pooled connection and stop the worker threads."""
+        async with self._open_lock:
+            pool, executor = self._pool, self._executor
+            self._pool = self._executor = self._slots = None
+            self._last_used.clear()
+            self._prepared.clear()
+            if pool is None:
+                return
+            await asyncio.get_running_loop().run_in_executor(executor, pool.closeall)
+            executor.shutdown(wait=False)
+            print("[DB] Pool closed", file=sys.stderr)
+
+    async def fetch_all(self, query: str, params: Optional[Sequence[Any]] = None) -> list[dict]:
+        """Run a query and return every row as a dict."""
+        def work(conn):
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+
+        return await self.run(work)
+
+    async def fetch_one(self, query: str, params: Optional[Sequence[Any]] = None) -> Optional[dict]:
+        """Run a query and return the first row (or None)."""
+        def work(conn):
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchone()
+
+        return await self.run(work)
+
+    async def fetch_prepared(self, name: str, query: str, params: Optional[Sequence[Any]] = None) -> list[dict]:
+        """Run `query` (with $1, $2... placeholders) as the prepared statement `name`."""
+        return await self.run(lambda conn: self._execute_prepared(conn, name, query, params or []))
+
+    async def run(self, work: Callable[[Any], Any]) -> Any:
+        """Run `work(conn)` with a pooled connection on the DB thread pool."""
+        if self._pool is None:
+            await self.open()
+        slots = self._slots
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+        if METRICS_ENABLED:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+        self.in_use += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._with_connection, work)
+        finally:
+            self.in_use -= 1
+            slots.release()
+
+    # -- worker-thread side --
+
+    def _connect(self):
+        from psycopg2.extras import RealDictCursor
+        from psycopg2.pool import ThreadedConnectionPool
+
+        return ThreadedConnectionPool(self.min_size, self.max_size, self.dsn, cursor_factory=RealDictCursor)
+
+    def _with_connection(self, work: Callable[[Any], Any]) -> Any:
+        import psycopg2
+
+        conn = self._acquire()
+        start = time.perf_counter()
+        try:
+            result = work(conn)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self._release(conn, discard=True)
+            raise
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            self._release(conn)
+            raise
+        finally:
+            if METRICS_ENABLED:
+                DB_QUERY_SECONDS.observe(time.perf_counter() - start)
+        self._release(conn)
+        return result
+
+    def _execute_prepared(self, conn, name: str, query: str, params: Sequence[Any]) -> list[dict]:
+        import psycopg2.errors
+
+        with conn.cursor() as cursor:
+            if not self.prepared_statements:
+                cursor.execute(_PLACEHOLDER_RE.sub("%s", query), params)
+                return cursor.fetchall()
+            prepared = self._prepared.setdefault(id(conn), set())
+            execute = f"EXECUTE {name}" + (f" ({', '.join(['%s'] * len(params))})" if params else "")
+            for attempt in range(2):
+                if name not in prepared:
+                    try:
+                        cursor.execute(f"PREPARE {name} AS {query}")
+                    except psycopg2.errors.DuplicatePreparedStatement:
+                        pass
+                    prepared.add(name)
+                try:
+                    cursor.execute(execute, params)
+                    return cursor.fetchall()
+                except psycopg2.errors.InvalidSqlStatementName:
+                    # The server side was reset (DISCARD ALL, failover); prepare again.
+                    prepared.discard(name)
+                    if attempt:
+                        raise
+
+    def _acquire(self):
+        conn = self._pool.getconn()
+        last_used = self._last_used.get(id(conn))
+        stale = last_used is not None and time.monotonic() - last_used > self.check_after
+        if conn.closed or (stale and not self._ping(conn)):
+            self._release(conn, discard=True)
+            conn = self._pool.getconn()
+        if not conn.autocommit:
+            # Single-statement tools: avoids BEGIN/COMMIT round-trips and
+            # never leaves a pooled connection idle in transaction.
+            conn.autocommit = True
+        return conn
+
+    def _release(self, conn, discard: bool = False) -> None:
+        if discard or conn.closed:
+            self._last_used.pop(id(conn), None)
+            self._prepared.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+            self._pool.putconn(conn)
+            if conn.closed:
+                # Above min_size the pool closes returned connections.
+                self._last_used.pop(id(conn), None)
+                self._prepared.pop(id(conn), None)
+
+    @staticmethod
+    def _ping(conn) -> bool:
+        import psycopg2
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+
+db = DatabasePool(
+    DATABASE_URL,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    check_after=DB_POOL_CHECK_AFTER,
+    prepared_statements=DB_PREPARED_STATEMENTS,
+)
+DB_POOL_IN_USE.set_function(lambda: db.in_use)
+DB_POOL_WAITING.set_function(lambda: db.waiting)
+DB_POOL_MAX.set_function(lambda: db.max_size)
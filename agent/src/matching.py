@@ -0,0 +1,330 @@
+"""
+Relevance ranking of catalog agencies against the conversation state.
+
+Per-agency features are packed into NumPy arrays once per catalog
+generation: a specialization multi-hot matrix, a hashed bag of words over
+description / overview / key services, min budget, Bayesian-smoothed rating
+and global rank. A query (the tool's filters plus what `AppState` knows
+about the company) then scores every published agency in one vectorized
+pass.
+
+Each signal is scaled to [0, 1] and the score is their weighted mean over
+the signals the query actually has, so a 0.8 means "strong fit on what we
+know" whether or not the user has shared a budget yet.
+
+Scoring a few thousand agencies, and rebuilding the arrays after a catalog
+change, is too much to do on the event loop while other requests stream.
+`rank_in_thread` snapshots what it needs from the catalog on the loop and
+does the rest on a worker thread.
+
+A match's `key` is the keyset for the next page: score and position only
+mean something for the same query over the same catalog generation, so
+the key carries both and `rank` rejects it with InvalidCursor otherwise.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from .catalog import AgencyCatalog, InvalidCursor, normalize
+from .roi import normalize_stage, normalize_strategy
+
+# Hashed vocabulary size for the description bag of words.
+TEXT_DIM = 4096
+
+WEIGHTS = {
+    "specialization": 0.30,
+    "context": 0.20,
+    "location": 0.15,
+    "budget": 0.15,
+    "rating": 0.10,
+    "rank": 0.10,
+}
+
+# Ratings are shrunk towards the catalog mean as if each agency had this
+# many extra average reviews.
+RATING_PRIOR_REVIEWS = 10
+
+# Specializations that suit each GTM motion.
+STRATEGY_SPECIALIZATIONS = {
+    "plg": ["PLG", "Product Marketing", "Lifecycle Marketing", "Content Marketing", "SEO"],
+    "sales_led": ["ABM", "Sales Development", "RevOps", "Demand Generation"],
+    "hybrid": ["Demand Generation", "ABM", "PLG", "Content Marketing", "RevOps"],
+}
+
+# Words agencies use to describe the companies they work with at each stage.
+STAGE_TERMS = {
+    "pre_seed": ["startup", "startups", "early", "founders", "seed"],
+    "seed": ["startup", "startups", "early", "seed"],
+    "series_a": ["startup", "startups", "scaleup", "scaleups", "growth", "series"],
+    "series_b": ["scaleup", "scaleups", "growth", "scale", "series"],
+    "growth": ["scaleup", "scaleups", "growth", "scale", "enterprise"],
+    "enterprise": ["enterprise", "enterprises", "global", "fortune"],
+}
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#-]{2,}")
+_STOPWORDS = frozenset(
+    "and the for with our their from that this into your you are who can all its "
+    "company companies business businesses market markets marketing agency agencies".split()
+)
+
+
+def pricing_tier(min_budget: Optional[float]) -> str:
+    """'budget' / 'mid' / 'premium' from an agency's minimum engagement."""
+    if not min_budget:
+        return "mid"
+    if min_budget < 5000:
+        return "budget"
+    if min_budget > 15000:
+        return "premium"
+    return "mid"
+
+
+def words(text: str) -> list[str]:
+    return [w for w in _WORD_RE.findall(text.casefold()) if w not in _STOPWORDS]
+
+
+def _hash(word: str) -> int:
+    return zlib.crc32(word.encode()) % TEXT_DIM
+
+
+def query_digest(query: dict) -> str:
+    """Short, stable hash of a rank() query's filters and profile."""
+    return hashlib.sha256(json.dumps(query, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+# Element types of a Match.key, for decode_cursor.
+MATCH_KEY_TYPES = (int, str, (int, float), int)
+
+
+@dataclass
+class Match:
+    row: dict
+    score: float
+    signals: dict[str, float] = field(default_factory=dict)
+    # (catalog generation, query digest, unrounded score, catalog position):
+    # the keyset a next page starts after.
+    key: tuple = ()
+
+
+class _Features:
+    """Column-oriented snapshot of one catalog generation (rows in rank order)."""
+
+    def __init__(self, generation: int, rows: list[dict]):
+        self.generation = generation
+        self.slugs = [row["slug"] for row in rows]
+        self.index = {slug: i for i, slug in enumerate(self.slugs)}
+        n = len(rows)
+
+        self.spec_vocab: dict[str, int] = {}
+        spec_pairs = []
+        for i, row in enumerate(rows):
+            for spec in row.get("specializations") or []:
+                j = self.spec_vocab.setdefault(normalize(spec), len(self.spec_vocab))
+                spec_pairs.append((i, j))
+        self.specs = np.zeros((n, max(len(self.spec_vocab), 1)), dtype=np.float32)
+        if spec_pairs:
+            self.specs[tuple(np.array(spec_pairs).T)] = 1.0
+
+        self.text = np.zeros((n, TEXT_DIM), dtype=np.float32)
+        for i, row in enumerate(rows):
+            parts = [row.get("description") or "", row.get("overview") or ""]
+            parts += row.get("key_services") or []
+            parts += row.get("specializations") or []
+            hashed = {_hash(w) for w in words(" ".join(parts))}
+            self.text[i, list(hashed)] = 1.0
+
+        self.min_budget = np.array(
+            # Missing or non-positive minimums are unknown (and can't be logged).
+            [float(r["min_budget"]) if (r.get("min_budget") or 0) > 0 else np.nan for r in rows], dtype=np.float64
+        )
+
+        ratings = np.array([float(r["avg_rating"]) if r.get("avg_rating") else np.nan for r in rows])
+        reviews = np.array([float(r.get("review_count") or 0) for r in rows])
+        rated = ~np.isnan(ratings)
+        prior = float(np.average(ratings[rated], weights=reviews[rated] + 1)) if rated.any() else 4.0
+        ratings = np.where(rated, ratings, prior)
+        reviews = np.where(rated, reviews, 0.0)
+        smoothed = (ratings * reviews + prior * RATING_PRIOR_REVIEWS) / (reviews + RATING_PRIOR_REVIEWS)
+        self.rating = np.clip((smoothed - 3.0) / 2.0, 0.0, 1.0)
+
+        ranks = np.array([r["global_rank"] if r.get("global_rank") is not None else np.nan for r in rows], dtype=float)
+        worst = np.nanmax(ranks) if (~np.isnan(ranks)).any() else 1.0
+        self.rank = np.where(np.isnan(ranks), 0.0, 1.0 - np.log(np.nan_to_num(ranks, nan=1.0)) / np.log(worst + 1.0))
+
+        self.rows = rows
+
+
+class AgencyMatcher:
+    """Scores the whole catalog for a company profile; rebuilds lazily."""
+
+    def __init__(self, catalog: AgencyCatalog):
+        self.catalog = catalog
+        self._features: Optional[_Features] = None
+
+    def _snapshot(self) -> tuple[int, list[dict]]:
+        # Rows are replaced, never mutated, so the list is a stable snapshot.
+        return self.catalog.generation, [self.catalog.rows[s] for s in self.catalog.ranked]
+
+    def features(self) -> _Features:
+        if self._features is None or self._features.generation != self.catalog.generation:
+            self._features = _Features(*self._snapshot())
+        return self._features
+
+    async def rank_in_thread(self, **query) -> tuple[list[Match], bool]:
+        """`rank` with the scoring (and any feature rebuild) on a worker thread.
+
+        The catalog is only read on the loop: rows for a rebuild and the
+        location filter are resolved before handing off.
+        """
+        features = self._features
+        if features is None or features.generation != self.catalog.generation:
+            generation, rows = self._snapshot()
+            features = await asyncio.to_thread(_Features, generation, rows)
+            if generation == self.catalog.generation:
+                self._features = features
+        location = query.get("location")
+        located = self.catalog.match_location(location) if location else None
+        return await asyncio.to_thread(self._rank, features, located, **query)
+
+    def rank(
+        self,
+        location: Optional[str] = None,
+        specialization: Optional[str] = None,
+        industry: Optional[str] = None,
+        stage: Optional[str] = None,
+        target_market: Optional[str] = None,
+        budget: Optional[float] = None,
+        strategy_type: Optional[str] = None,
+        limit: int = 5,
+        after: Optional[tuple] = None,
+    ) -> tuple[list[Match], bool]:
+        """Top `limit` matches, best first.
+
+        An explicit location or specialization restricts the candidates;
+        when nothing satisfies it, the closest matches from the whole
+        catalog are returned instead and the flag is False. `after` is the
+        `key` of the last match of the previous page; it raises
+        InvalidCursor if the catalog or the query has changed since.
+        """
+        located = self.catalog.match_location(location) if location else None
+        return self._rank(
+            self.features(), located, location, specialization, industry, stage,
+            target_market, budget, strategy_type, limit, after,
+        )
+
+    def _rank(
+        self,
+        f: _Features,
+        located: Optional[set[str]],
+        location: Optional[str] = None,
+        specialization: Optional[str] = None,
+        industry: Optional[str] = None,
+        stage: Optional[str] = None,
+        target_market: Optional[str] = None,
+        budget: Optional[float] = None,
+        strategy_type: Optional[str] = None,
+        limit: int = 5,
+        after: Optional[tuple] = None,
+    ) -> tuple[list[Match], bool]:
+        # Pure: reads only `f` and `located` (the slugs matching `location`),
+        # so it can run off the event loop.
+        digest = query_digest({
+            "location": location,
+            "specialization": specialization,
+            "industry": industry,
+            "stage": stage,
+            "target_market": target_market,
+            "budget": budget,
+            "strategy_type": strategy_type,
+        })
+        if after is not None:
+            if len(after) != 4 or tuple(after[:2]) != (f.generation, digest):
+                raise InvalidCursor("Stale cursor: the agency list or the search has changed since that page")
+            after = tuple(after[2:])
+        n = len(f.slugs)
+        if n == 0 or limit <= 0:
+            return [], True
+
+        signals: dict[str, np.ndarray] = {
+            "rating": f.rating,
+            "rank": f.rank,
+        }
+
+        # Specialization: the one asked for counts most; the motion's usual
+        # specializations (saturating at two) fill in around it.
+        spec_parts = []
+        if specialization:
+            column = f.spec_vocab.get(normalize(specialization))
+            spec_parts.append((0.6, f.specs[:, column] if column is not None else np.zeros(n, dtype=np.float32)))
+        strategy_key = normalize_strategy(strategy_type)
+        if strategy_key:
+            hints = sorted({f.spec_vocab[c] for c in map(normalize, STRATEGY_SPECIALIZATIONS[strategy_key]) if c in f.spec_vocab})
+            covered = f.specs[:, hints].sum(axis=1) if hints else np.zeros(n, dtype=np.float32)
+            spec_parts.append((0.4, np.minimum(covered / 2.0, 1.0)))
+        if spec_parts:
+            total = sum(w for w, _ in spec_parts)
+            signals["specialization"] = sum(w * v for w, v in spec_parts) / total
+
+        query_words = words(" ".join(filter(None, [industry, target_market])))
+        stage_key = normalize_stage(stage)
+        if stage_key:
+            query_words += STAGE_TERMS[stage_key]
+        if query_words:
+            hashed = sorted({_hash(w) for w in query_words})
+            # Saturates once an agency covers half of the query terms.
+            signals["context"] = np.minimum(f.text[:, hashed].sum(axis=1) / max(len(hashed) / 2, 1), 1.0)
+
+        location_mask = None
+        if location:
+            location_mask = np.zeros(n, dtype=bool)
+            location_mask[[f.index[s] for s in located if s in f.index]] = True
+            signals["location"] = location_mask.astype(np.float32)
+
+        if budget is not None and 0 < budget < np.inf:
+            # 1 when the budget covers the minimum comfortably, falling off
+            # smoothly as the minimum exceeds it; unknown minimums are neutral.
+            # A zero, negative or infinite budget says nothing, so it's skipped.
+            ratio = np.log(budget / f.min_budget)
+            signals["budget"] = np.where(np.isnan(f.min_budget), 0.5, 1.0 / (1.0 + np.exp(-3.0 * (ratio + 0.2))))
+
+        names = list(signals)
+        weights = np.array([WEIGHTS[k] for k in names])
+        matrix = np.stack([signals[k] for k in names])
+        scores = weights @ matrix / weights.sum()
+
+        eligible = np.ones(n, dtype=bool)
+        if location_mask is not None:
+            eligible &= location_mask
+        if specialization:
+            column = f.spec_vocab.get(normalize(specialization))
+            if column is None:
+                eligible[:] = False
+            else:
+                eligible &= f.specs[:, column] > 0
+        exact = bool(eligible.any())
+        pool = np.flatnonzero(eligible) if exact else np.arange(n)
+        if after is not None:
+            score, position = after
+            pool = pool[(scores[pool] < score) | ((scores[pool] == score) & (pool > position))]
+            if pool.size == 0:
+                return [], exact
+
+        k = min(limit, pool.size)
+        top = pool[np.argpartition(-scores[pool], k - 1)[:k]] if k < pool.size else pool
+        # Best score first; catalog order (global rank) breaks ties.
+        top = top[np.lexsort((top, -scores[top]))]
+        return [
+            Match(
+                row=f.rows[i],
+                score=round(float(scores[i]), 3),
+                signals={name: round(float(matrix[j, i]), 3) for j, name in enumerate(names)},
+                key=(f.generation, digest, float(scores[i]), int(i)),
+            )
+            for i in top
+        ], exact
@@ -0,0 +1,273 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms live in one module-level registry and are
+served by `GET /metrics`. Instrumentation goes through the helpers at the
+bottom (`instrument_tool`, `timed_model`, `count_sse_bytes`); with
+METRICS_ENABLED=false they hand back the undecorated function, model or
+stream, so a disabled build pays nothing beyond one flag check at import.
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from typing import AsyncIterable, AsyncIterator, Callable, Optional, Sequence
+
+from pydantic_ai.models.wrapper import WrapperModel
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no", "off")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans sub-millisecond catalog lookups through multi-second LLM turns.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        self._series: dict[tuple, object] = {}
+        _registry.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            series = list(self._series.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in series]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """A gauge set directly or read from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._series[labels] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def _samples(self) -> list[str]:
+        if self._function is not None:
+            return [f"{self.name} {_number(self._function())}"]
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket (non-cumulative) counts with +Inf last, then the sum.
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            series = [(k, list(counts), total) for k, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text format."""
+    lines: list[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# =====
+# Metrics
+# =====
+
+TOOL_SECONDS = Histogram(
+    "gtm_tool_duration_seconds", "Agent tool execution time.", ["tool", "outcome"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "gtm_db_query_seconds", "Time holding a pooled connection to run one query.",
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "gtm_db_pool_wait_seconds", "Time waiting for a free pooled connection.",
+)
+DB_POOL_IN_USE = Gauge("gtm_db_pool_connections_in_use", "Pooled connections currently running a query.")
+DB_POOL_WAITING = Gauge("gtm_db_pool_waiting", "Queries waiting for a free pooled connection.")
+DB_POOL_MAX = Gauge("gtm_db_pool_connections_max", "Configured pool size.")
+LLM_TTFT_SECONDS = Histogram(
+    "gtm_llm_time_to_first_token_seconds", "Time from sending an LLM request to its first token.", ["path"],
+)
+LLM_SECONDS = Histogram(
+    "gtm_llm_request_seconds", "Time from sending an LLM request to the end of its response.", ["path"],
+)
+CACHE_REQUESTS = Counter(
+    "gtm_cache_requests_total", "Result cache lookups by outcome (hit, miss, coalesced).", ["cache", "result"],
+)
+CACHE_ENTRIES = Gauge("gtm_cache_entries", "Entries held in a result cache.", ["cache"])
+HISTORY_TOKENS_SAVED = Counter(
+    "gtm_history_tokens_saved_total",
+    "Estimated prompt tokens removed by history compaction, counted once per user turn.",
+    ["path"],
+)
+HISTORY_SUMMARIES = Counter(
+    "gtm_history_summaries_total", "Background history summaries written, by outcome.", ["path", "outcome"],
+)
+CONTACT_QUEUE_DEPTH = Gauge("gtm_contact_queue_depth", "Contact submissions spooled but not yet in the database.")
+CONTACT_WRITES = Counter(
+    "gtm_contact_writes_total", "Contact submission batch inserts, by outcome.", ["outcome"],
+)
+ADMISSION_IN_FLIGHT = Gauge("gtm_admission_in_flight", "Upstream calls holding an admission slot.", ["upstream"])
+ADMISSION_QUEUE_DEPTH = Gauge("gtm_admission_queue_depth", "Calls waiting for an admission slot.", ["upstream"])
+ADMISSION_WAIT_SECONDS = Histogram(
+    "gtm_admission_wait_seconds", "Time from arrival to admission.", ["upstream", "priority"],
+)
+ADMISSION_REJECTED = Counter(
+    "gtm_admission_rejected_total", "Calls turned away by admission control.", ["upstream", "priority", "reason"],
+)
+ACTIVE_SESSIONS = Gauge("gtm_active_sessions", "AG-UI threads held in memory.")
+SSE_BYTES = Counter("gtm_sse_bytes_total", "Bytes streamed to clients over SSE.", ["path"])
+SSE_WRITES = Counter("gtm_sse_writes_total", "Response body writes on SSE streams (after coalescing).", ["path"])
+
+
+# =====
+# Instrumentation
+# =====
+
+def instrument_tool(func):
+    """Record an agent tool's duration, labelled by name and outcome.
+
+    The outcome is "ok", "failed" for a `{"success": False}` result, or
+    "error" if the tool raised.
+    """
+    if not METRICS_ENABLED:
+        return func
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await func(*args, **kwargs)
+            payload = getattr(result, "return_value", result)
+            outcome = "failed" if isinstance(payload, dict) and payload.get("success") is False else "ok"
+            return result
+        finally:
+            TOOL_SECONDS.observe(time.perf_counter() - start, name, outcome)
+
+    return wrapper
+
+
+class _TimedModel(WrapperModel):
+    """Times each model request; streamed models yield once the first chunk is in."""
+
+    def __init__(self, wrapped, path: str):
+        super().__init__(wrapped)
+        self.path = path
+
+    async def request(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await self.wrapped.request(*args, **kwargs)
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - start, self.path)
+
+    @asynccontextmanager
+    async def request_stream(self, *args, **kwargs):
+        start = time.perf_counter()
+        async with self.wrapped.request_stream(*args, **kwargs) as stream:
+            LLM_TTFT_SECONDS.observe(time.perf_counter() - start, self.path)
+            try:
+                yield stream
+            finally:
+                LLM_SECONDS.observe(time.perf_counter() - start, self.path)
+
+
+def timed_model(model, path: str):
+    """Wrap a pydantic-ai model so its requests feed the LLM histograms."""
+    return _TimedModel(model, path) if METRICS_ENABLED else model
+
+
+async def _timed_tokens(tokens: AsyncIterable[str], path: str, start: float) -> AsyncIterator[str]:
+    first = True
+    try:
+        async for token in tokens:
+            if first:
+                LLM_TTFT_SECONDS.observe(time.perf_counter() - start, path)
+                first = False
+            yield token
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - start, path)
+
+
+def timed_tokens(tokens: AsyncIterable[str], path: str) -> AsyncIterable[str]:
+    """Time an LLM token stream from now until its first and last token."""
+    return _timed_tokens(tokens, path, time.perf_counter()) if METRICS_ENABLED else tokens
+
+
+async def _counted(chunks: AsyncIterable, path: str) -> AsyncIterator:
+    async for chunk in chunks:
+        SSE_BYTES.inc(len(chunk.encode() if isinstance(chunk, str) else chunk), path)
+        SSE_WRITES.inc(1, path)
+        yield chunk
+
+
+def count_sse_bytes(chunks: AsyncIterable, path: str) -> AsyncIterable:
+    """Count the bytes and writes of an SSE body as it is sent."""
+    return _counted(chunks, path) if METRICS_ENABLED else chunks
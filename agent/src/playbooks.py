@@ -0,0 +1,221 @@
+"""
+Precomputed GTM playbooks for strategy and timeline generation.
+
+There are only three GTM motions and a handful of stages, so instead of
+having the model write action items and phases from scratch on every
+generate_strategy / generate_timeline call, the tools can start from a
+playbook: a templated strategy and phase timeline. The library is a
+versioned JSON file (PLAYBOOK_PATH, `version` inside it) read once at
+import.
+
+Playbooks are indexed by (strategy type, stage, industry). A playbook may
+be limited to some stages and industries; the closest one prefers an
+industry match, then a stage match, then stage-agnostic entries, in file
+order. Every combination is resolved when the library loads, so a lookup
+is a dict get. Industry notes (an extra action item, audience and
+first-phase activity) are merged into playbooks that aren't already
+written for that industry.
+
+Rendering fills {company}, {market} and {industry} from what the user has
+shared, with neutral wording for anything still unknown.
+"""
+import json
+import os
+import sys
+from dataclasses import dataclass
+from itertools import product
+from typing import Optional
+
+from .roi import (
+    INDUSTRY_FACTORS,
+    STAGE_BENCHMARKS,
+    STRATEGY_FACTORS,
+    normalize_industry,
+    normalize_stage,
+    normalize_strategy,
+)
+
+PLAYBOOK_PATH = os.getenv("PLAYBOOK_PATH", os.path.join(os.path.dirname(__file__), "playbooks.json"))
+
+
+@dataclass(frozen=True)
+class Playbook:
+    """A templated strategy and timeline, with its industry notes merged in."""
+    id: str
+    strategy_type: str
+    name: str
+    summary: str
+    recommended_for: tuple[str, ...]
+    action_items: tuple[str, ...]
+    phases: tuple[dict, ...]  # {"name", "duration", "activities", "milestones"}
+    stages: frozenset[str] = frozenset()  # empty = any stage
+    industries: frozenset[str] = frozenset()  # empty = any industry
+
+
+@dataclass(frozen=True)
+class RenderedPlaybook:
+    """A playbook filled in for one company."""
+    id: str
+    version: str
+    strategy_type: str
+    name: str
+    summary: str
+    recommended_for: list[str]
+    action_items: list[str]
+    phases: list[dict]
+
+    @property
+    def ref(self) -> str:
+        return f"{self.id}@{self.version}"
+
+
+class _Params(dict):
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
+
+def _with_industry(playbook: Playbook, industry: str, notes: dict) -> Playbook:
+    phases = list(playbook.phases)
+    if phases and notes.get("activities"):
+        first = phases[0]
+        phases[0] = {**first, "activities": list(first["activities"]) + list(notes["activities"])}
+    return Playbook(
+        id=f"{playbook.id}+{industry}",
+        strategy_type=playbook.strategy_type,
+        name=playbook.name,
+        summary=playbook.summary,
+        recommended_for=playbook.recommended_for + tuple(notes.get("recommended_for", ())),
+        action_items=playbook.action_items + tuple(notes.get("action_items", ())),
+        phases=tuple(phases),
+        stages=playbook.stages,
+        industries=playbook.industries,
+    )
+
+
+class PlaybookLibrary:
+    """Playbooks resolved for every (strategy type, stage, industry) up front."""
+
+    def __init__(self, version: str, playbooks: list[Playbook], industry_notes: Optional[dict] = None):
+        self.version = version
+        self.playbooks = playbooks
+        self.industry_notes = industry_notes or {}
+        self._index: dict[tuple, Playbook] = {}
+
+        stages = [None, *STAGE_BENCHMARKS]
+        industries = [None, *(i for i in INDUSTRY_FACTORS if i != "default")]
+        for key in product(STRATEGY_FACTORS, stages, industries):
+            playbook = self._closest(*key)
+            if playbook is None:
+                continue
+            industry = key[2]
+            if industry and industry not in playbook.industries and industry in self.industry_notes:
+                playbook = _with_industry(playbook, industry, self.industry_notes[industry])
+            self._index[key] = playbook
+
+        missing = [s for s in STRATEGY_FACTORS if (s, None, None) not in self._index]
+        if missing:
+            raise ValueError(f"Playbook library {version} has no playbook for {', '.join(missing)}")
+
+    @classmethod
+    def load(cls, path: str) -> "PlaybookLibrary":
+        with open(path) as f:
+            data = json.load(f)
+        playbooks = [
+            Playbook(
+                id=p["id"],
+                strategy_type=p["strategy"],
+                name=p["name"],
+                summary=p["summary"],
+                recommended_for=tuple(p.get("recommended_for", ())),
+                action_items=tuple(p.get("action_items", ())),
+                phases=tuple(p.get("phases", ())),
+                stages=frozenset(p.get("stages", ())),
+                industries=frozenset(p.get("industries", ())),
+            )
+            for p in data["playbooks"]
+        ]
+        library = cls(str(data["version"]), playbooks, data.get("industries"))
+        print(
+            f"[GTM] Loaded {len(playbooks)} playbooks (v{library.version}, {len(library._index)} combinations)",
+            file=sys.stderr,
+        )
+        return library
+
+    def _closest(self, strategy_type: str, stage: Optional[str], industry: Optional[str]) -> Optional[Playbook]:
+        best, best_score = None, None
+        for playbook in self.playbooks:
+            if playbook.strategy_type != strategy_type:
+                continue
+            if playbook.industries:
+                if industry not in playbook.industries:
+                    continue
+                industry_score = 1
+            else:
+                industry_score = 0
+            if not playbook.stages:
+                stage_score = 1
+            elif stage is None:
+                stage_score = 0
+            elif stage in playbook.stages:
+                stage_score = 2
+            else:
+                continue
+            score = (industry_score, stage_score)
+            if best_score is None or score > best_score:
+                best, best_score = playbook, score
+        return best
+
+    def closest(
+        self,
+        strategy_type: Optional[str],
+        stage: Optional[str] = None,
+        industry: Optional[str] = None,
+    ) -> Optional[Playbook]:
+        """The best playbook for the (free-text) strategy type, stage and industry."""
+        strategy_type = normalize_strategy(strategy_type)
+        if strategy_type is None:
+            return None
+        return self._index.get((strategy_type, normalize_stage(stage), normalize_industry(industry)))
+
+    def render(
+        self,
+        strategy_type: Optional[str],
+        stage: Optional[str] = None,
+        industry: Optional[str] = None,
+        company_name: Optional[str] = None,
+        target_market: Optional[str] = None,
+    ) -> Optional[RenderedPlaybook]:
+        """The closest playbook, filled in for this company. None for unknown strategy types."""
+        playbook = self.closest(strategy_type, stage, industry)
+        if playbook is None:
+            return None
+        params = _Params(
+            company=company_name or "The company",
+            market=target_market or "target customers",
+            industry=industry or "the industry",
+        )
+
+        def fill(text: str) -> str:
+            return text.format_map(params)
+
+        return RenderedPlaybook(
+            id=playbook.id,
+            version=self.version,
+            strategy_type=playbook.strategy_type,
+            name=playbook.name,
+            summary=fill(playbook.summary),
+            recommended_for=[fill(r) for r in playbook.recommended_for],
+            action_items=[fill(a) for a in playbook.action_items],
+            phases=[
+                {
+                    "name": phase["name"],
+                    "duration": phase["duration"],
+                    "activities": [fill(a) for a in phase.get("activities", ())],
+                    "milestones": [fill(m) for m in phase.get("milestones", ())],
+                }
+                for phase in playbook.phases
+            ],
+        )
+
+
+playbooks = PlaybookLibrary.load(PLAYBOOK_PATH)
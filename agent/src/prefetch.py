@@ -0,0 +1,159 @@
+"""
+Speculative agency ranking per conversation.
+
+Recording a company's industry, target market or budget is almost always
+followed by an agency search a turn or two later. `update_company_info`
+hands the new profile to the AgencyPrefetcher, which ranks the catalog in
+the background while the model is still writing its reply; the search tool
+then takes the prefetched candidates instead of ranking on the critical
+path.
+
+One prefetch per session: a newer profile cancels the previous one, and
+the same profile twice is a no-op. Results are only served for exactly the
+profile and catalog generation they were computed from.
+"""
+import asyncio
+import os
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from .catalog import AgencyCatalog
+from .matching import AgencyMatcher, Match
+from .metrics import CACHE_ENTRIES, CACHE_REQUESTS, METRICS_ENABLED
+
+# Candidates ranked ahead of time; searches asking for more rank live.
+PREFETCH_CANDIDATES = int(os.getenv("PREFETCH_CANDIDATES", "20"))
+PREFETCH_MAX_SESSIONS = int(os.getenv("PREFETCH_MAX_SESSIONS", "1000"))
+
+
+@dataclass(frozen=True)
+class Profile:
+    """The AppState fields agency ranking depends on."""
+    industry: Optional[str] = None
+    stage: Optional[str] = None
+    target_market: Optional[str] = None
+    budget: Optional[float] = None
+    strategy_type: Optional[str] = None
+
+    def rank_args(self) -> dict:
+        return {
+            "industry": self.industry,
+            "stage": self.stage,
+            "target_market": self.target_market,
+            "budget": self.budget,
+            "strategy_type": self.strategy_type,
+        }
+
+
+@dataclass
+class _Prefetch:
+    profile: Profile
+    task: asyncio.Task  # -> (catalog generation, matches)
+
+
+class AgencyPrefetcher:
+    """Background, per-session ranking of the catalog for the latest profile."""
+
+    def __init__(
+        self,
+        catalog: AgencyCatalog,
+        matcher: AgencyMatcher,
+        candidates: int = 20,
+        max_sessions: int = 1000,
+    ):
+        self.catalog = catalog
+        self.matcher = matcher
+        self.candidates = candidates
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, _Prefetch]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def schedule(self, session_id: Optional[str], profile: Profile) -> None:
+        """Start ranking for `profile` unless it is already prefetched or in flight."""
+        if not session_id:
+            return
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            if entry.profile == profile and not entry.task.cancelled():
+                self._entries.move_to_end(session_id)
+                return
+            entry.task.cancel()
+        task = asyncio.create_task(self._rank(profile), name=f"prefetch-{session_id}")
+        self._entries[session_id] = _Prefetch(profile=profile, task=task)
+        task.add_done_callback(_log_failure)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_sessions:
+            _, evicted = self._entries.popitem(last=False)
+            evicted.task.cancel()
+        self._gauge()
+
+    async def get(self, session_id: Optional[str], profile: Profile, limit: int) -> Optional[list[Match]]:
+        """Prefetched top `limit` for `profile`, waiting on an in-flight prefetch.
+
+        None when there is nothing usable (other profile, catalog changed,
+        cancelled or failed); the caller ranks live.
+        """
+        entry = self._entries.get(session_id) if session_id else None
+        if entry is None or entry.profile != profile or limit > self.candidates:
+            self._count("miss")
+            return None
+        if not entry.task.done():
+            self._count("wait")
+            try:
+                # Shielded: a cancelled tool call shouldn't kill the prefetch.
+                await asyncio.shield(entry.task)
+            except asyncio.CancelledError:
+                if entry.task.cancelled():
+                    return None
+                raise
+            except Exception:
+                return None
+        elif entry.task.cancelled() or entry.task.exception() is not None:
+            self._count("miss")
+            return None
+        else:
+            self._count("hit")
+        generation, matches = entry.task.result()
+        if generation != self.catalog.generation:
+            return None
+        return matches[:limit]
+
+    def cancel(self, session_id: str) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            entry.task.cancel()
+            self._gauge()
+
+    async def close(self) -> None:
+        tasks = [entry.task for entry in self._entries.values()]
+        self._entries.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._gauge()
+
+    async def _rank(self, profile: Profile) -> tuple[int, list[Match]]:
+        await self.catalog.ensure_loaded()
+        # Yield once so the tool result goes back to the model first.
+        await asyncio.sleep(0)
+        generation = self.catalog.generation
+        # Scored on a worker thread: this runs alongside streaming requests.
+        matches, _ = await self.matcher.rank_in_thread(limit=self.candidates, **profile.rank_args())
+        return generation, matches
+
+    def _count(self, result: str) -> None:
+        if METRICS_ENABLED:
+            CACHE_REQUESTS.inc(1, "prefetch", result)
+
+    def _gauge(self) -> None:
+        if METRICS_ENABLED:
+            CACHE_ENTRIES.set(len(self._entries), "prefetch")
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[GTM] Agency prefetch failed: {task.exception()}", file=sys.stderr)
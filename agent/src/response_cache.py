@@ -0,0 +1,185 @@
+"""
+Reply cache for the opening turns of Hume voice conversations.
+
+Much of /chat/completions traffic is the same handful of openers and
+clarifying exchanges ("Hello", "what is PLG?"), each of which used to cost
+a full Gemini call. A ReplyCache keeps the complete reply to such a turn,
+keyed on:
+
+- the last user turn, normalized (case, punctuation and spacing ignored),
+- a hash of the effective system prompt (Hume's, which carries the user's
+  context, plus the voice instruction),
+- the turns before it, normalized the same way.
+
+Only conversations whose earlier turns fit in CLM_CACHE_CONTEXT_TURNS are
+cached, so the key always covers the whole transcript and a cached reply
+can't be served into a conversation it doesn't fit. A hit is streamed
+through the same phrase-chunked SSE path as a live reply; a miss records
+the reply as it streams and stores it only if it finished cleanly.
+
+Entries expire after CLM_CACHE_TTL seconds and the least recently used go
+first past CLM_CACHE_MAX_ENTRIES (0 disables the cache). Each entry counts
+its own hits; `stats()` lists the hottest ones.
+"""
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from .metrics import CACHE_ENTRIES, CACHE_REQUESTS, METRICS_ENABLED
+from .voice_sessions import voice_instruction
+
+CLM_CACHE_MAX_ENTRIES = int(os.getenv("CLM_CACHE_MAX_ENTRIES", "1000"))
+CLM_CACHE_TTL = float(os.getenv("CLM_CACHE_TTL", "3600"))
+# Turns before the current one; longer conversations aren't cached.
+CLM_CACHE_CONTEXT_TURNS = int(os.getenv("CLM_CACHE_CONTEXT_TURNS", "4"))
+# Longer user turns are effectively unique, so not worth an entry.
+CLM_CACHE_MAX_TURN_CHARS = int(os.getenv("CLM_CACHE_MAX_TURN_CHARS", "200"))
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s']+")
+
+
+def normalize_turn(text: str) -> str:
+    """'  Hello!! ' and 'hello' are the same turn."""
+    return " ".join(_PUNCTUATION_RE.sub(" ", text.casefold()).split())
+
+
+@dataclass
+class CachedReply:
+    turn: str  # the normalized user turn, for stats
+    text: str
+    created_at: float
+    expires_at: float
+    hits: int = 0
+    last_hit: Optional[float] = None
+
+
+class ReplyCache:
+    """LRU + TTL cache of complete voice replies, keyed on the whole (short) transcript."""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 3600.0,
+        context_turns: int = 4,
+        max_turn_chars: int = 200,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.context_turns = context_turns
+        self.max_turn_chars = max_turn_chars
+        self._entries: "OrderedDict[str, CachedReply]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, system_prompt: str, turns: list[dict]) -> Optional[str]:
+        """Cache key for replying to `turns` (Gemini chat format), or None if uncacheable."""
+        if self.max_entries <= 0:
+            return None
+        if not turns or turns[-1]["role"] != "user":
+            # stream_turn answers these as a "Hello".
+            turns = turns + [{"role": "user", "parts": ["Hello"]}]
+        if len(turns) - 1 > self.context_turns:
+            return None
+        turn = normalize_turn(" ".join(map(str, turns[-1]["parts"])))
+        if not turn or len(turn) > self.max_turn_chars:
+            return None
+        digest = hashlib.sha256(voice_instruction(system_prompt).encode())
+        for t in turns:
+            digest.update(b"\x00" + t["role"].encode() + b"\x00")
+            digest.update(normalize_turn(" ".join(map(str, t["parts"]))).encode())
+        return digest.hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        """The cached reply for `key`, counting the hit."""
+        if key is None:
+            return None
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or entry.expires_at <= now:
+            if entry is not None:
+                del self._entries[key]
+                self._gauge()
+            self.misses += 1
+            self._count("miss")
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        entry.last_hit = now
+        self.hits += 1
+        self._count("hit")
+        return entry.text
+
+    async def record(self, key: str, user_turn: str, tokens: AsyncIterable[str]) -> AsyncIterator[str]:
+        """Pass `tokens` through, caching the reply to `user_turn` if the stream completes."""
+        parts = []
+        async for token in tokens:
+            parts.append(token)
+            yield token
+        # Failed or cut-off streams raise (or stop) before getting here.
+        text = "".join(parts).strip()
+        if text:
+            self._store(key, CachedReply(
+                turn=normalize_turn(user_turn),
+                text=text,
+                created_at=time.time(),
+                expires_at=time.monotonic() + self.ttl,
+            ))
+
+    def stats(self, top: int = 10) -> dict:
+        hottest = sorted(self._entries.values(), key=lambda e: -e.hits)[:top]
+        now = time.monotonic()
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "evictions": self.evictions,
+            "top": [
+                {
+                    "turn": entry.turn,
+                    "hits": entry.hits,
+                    "age_s": round(time.time() - entry.created_at, 1),
+                    "last_hit_s": round(now - entry.last_hit, 1) if entry.last_hit is not None else None,
+                    "reply_chars": len(entry.text),
+                }
+                for entry in hottest
+            ],
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._gauge()
+
+    def _store(self, key: str, entry: CachedReply) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self.stored += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._gauge()
+
+    def _count(self, result: str) -> None:
+        if METRICS_ENABLED:
+            CACHE_REQUESTS.inc(1, "clm_reply", result)
+
+    def _gauge(self) -> None:
+        if METRICS_ENABLED:
+            CACHE_ENTRIES.set(len(self._entries), "clm_reply")
+
+
+reply_cache = ReplyCache(
+    max_entries=CLM_CACHE_MAX_ENTRIES,
+    ttl=CLM_CACHE_TTL,
+    context_turns=CLM_CACHE_CONTEXT_TURNS,
+    max_turn_chars=CLM_CACHE_MAX_TURN_CHARS,
+)
@@ -0,0 +1,217 @@
+"""
+Deterministic ROI projection engine.
+
+CAC, LTV and payback come from built-in benchmark tables keyed by company
+stage, industry and GTM motion, and are perturbed in one batched NumPy
+Monte Carlo pass. The random seed is derived from the inputs, so the same
+profile always gets the same projection.
+"""
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+DEFAULT_SCENARIOS = 5000
+
+# Per stage: blended CAC ($), monthly revenue per account ($), gross margin,
+# monthly logo churn, and the monthly GTM spend the CAC benchmark assumes.
+STAGE_BENCHMARKS = {
+    "pre_seed":   {"cac": 1_300,   "arpa": 150,   "margin": 0.70, "churn": 0.050, "spend": 5_000},
+    "seed":       {"cac": 2_600,   "arpa": 300,   "margin": 0.72, "churn": 0.035, "spend": 15_000},
+    "series_a":   {"cac": 8_500,   "arpa": 800,   "margin": 0.75, "churn": 0.022, "spend": 50_000},
+    "series_b":   {"cac": 18_000,  "arpa": 1_500, "margin": 0.77, "churn": 0.016, "spend": 150_000},
+    "growth":     {"cac": 40_000,  "arpa": 3_000, "margin": 0.78, "churn": 0.012, "spend": 400_000},
+    "enterprise": {"cac": 120_000, "arpa": 8_000, "margin": 0.80, "churn": 0.010, "spend": 1_000_000},
+}
+
+# Multipliers on CAC, ARPA and churn for the GTM motion.
+STRATEGY_FACTORS = {
+    "plg":       {"cac": 0.55, "arpa": 0.60, "churn": 1.30},
+    "sales_led": {"cac": 1.60, "arpa": 1.80, "churn": 0.70},
+    "hybrid":    {"cac": 1.00, "arpa": 1.00, "churn": 1.00},
+}
+
+# Multipliers on CAC, ARPA and churn by vertical.
+INDUSTRY_FACTORS = {
+    "saas":          {"cac": 1.00, "arpa": 1.00, "churn": 1.00},
+    "fintech":       {"cac": 1.35, "arpa": 1.30, "churn": 0.80},
+    "healthcare":    {"cac": 1.50, "arpa": 1.40, "churn": 0.70},
+    "cybersecurity": {"cac": 1.45, "arpa": 1.50, "churn": 0.75},
+    "devtools":      {"cac": 0.80, "arpa": 0.85, "churn": 1.10},
+    "ecommerce":     {"cac": 0.70, "arpa": 0.55, "churn": 1.40},
+    "marketplace":   {"cac": 0.85, "arpa": 0.60, "churn": 1.30},
+    "edtech":        {"cac": 0.90, "arpa": 0.70, "churn": 1.25},
+    "default":       {"cac": 1.00, "arpa": 1.00, "churn": 1.00},
+}
+
+_STAGE_ALIASES = {
+    "pre-seed": "pre_seed", "preseed": "pre_seed", "pre seed": "pre_seed",
+    "series a": "series_a", "series-a": "series_a", "seriesa": "series_a",
+    "series b": "series_b", "series-b": "series_b", "seriesb": "series_b",
+    "series c": "growth", "series_c": "growth", "scale-up": "growth", "scaleup": "growth",
+}
+
+_INDUSTRY_KEYWORDS = [
+    ("fintech", ("fintech", "finance", "payments", "banking", "insurtech")),
+    ("healthcare", ("health", "medtech", "biotech", "pharma")),
+    ("cybersecurity", ("security", "cyber")),
+    ("devtools", ("devtool", "developer", "api", "infrastructure")),
+    ("ecommerce", ("ecommerce", "e-commerce", "retail", "d2c", "dtc", "consumer")),
+    ("marketplace", ("marketplace",)),
+    ("edtech", ("edtech", "education", "learning")),
+    ("saas", ("saas", "software", "b2b")),
+]
+
+# Relative spread (lognormal sigma) of each driver across scenarios.
+CAC_SIGMA = 0.35
+ARPA_SIGMA = 0.25
+CHURN_SIGMA = 0.30
+MARGIN_SD = 0.04
+# CAC rises as spend outgrows the stage benchmark (diminishing returns).
+SPEND_ELASTICITY = 0.15
+
+
+@dataclass(frozen=True)
+class ROIEstimate:
+    """Percentile summary of a Monte Carlo ROI run."""
+    cac: tuple[float, float, float]  # P10, P50, P90
+    ltv: tuple[float, float, float]
+    payback_months: tuple[float, float, float]
+    ltv_cac_ratio: float  # median
+    monthly_new_customers: Optional[float]
+    confidence: str
+    stage: str
+    industry: str
+    strategy_type: str
+    scenarios: int
+
+    @property
+    def notes(self) -> str:
+        lines = [
+            f"Benchmarks for a {self.stage.replace('_', ' ')} {self.industry} company "
+            f"with a {self.strategy_type.replace('_', '-')} motion ({self.scenarios:,} scenarios).",
+            f"CAC ${self.cac[0]:,.0f}-${self.cac[2]:,.0f}, "
+            f"LTV ${self.ltv[0]:,.0f}-${self.ltv[2]:,.0f}, "
+            f"payback {self.payback_months[0]:.0f}-{self.payback_months[2]:.0f} months (P10-P90).",
+            f"Median LTV:CAC {self.ltv_cac_ratio:.1f}x.",
+        ]
+        if self.monthly_new_customers is not None:
+            lines.append(f"About {self.monthly_new_customers:,.0f} new customers/month at the stated budget.")
+        return " ".join(lines)
+
+
+def normalize_stage(stage: Optional[str]) -> Optional[str]:
+    if not stage:
+        return None
+    key = stage.strip().lower()
+    key = _STAGE_ALIASES.get(key, key.replace(" ", "_").replace("-", "_"))
+    return key if key in STAGE_BENCHMARKS else None
+
+
+def normalize_industry(industry: Optional[str]) -> Optional[str]:
+    if not industry:
+        return None
+    text = industry.lower()
+    for key, keywords in _INDUSTRY_KEYWORDS:
+        if any(k in text for k in keywords):
+            return key
+    return None
+
+
+def normalize_strategy(strategy_type: Optional[str]) -> Optional[str]:
+    if not strategy_type:
+        return None
+    key = strategy_type.strip().lower().replace("-", "_").replace(" ", "_")
+    if key in ("product_led", "product_led_growth"):
+        key = "plg"
+    elif key in ("sales", "saleslead", "sales_lead"):
+        key = "sales_led"
+    return key if key in STRATEGY_FACTORS else None
+
+
+def project_roi(
+    stage: Optional[str],
+    industry: Optional[str],
+    strategy_type: Optional[str],
+    budget: Optional[float],
+    scenarios: int = DEFAULT_SCENARIOS,
+) -> ROIEstimate:
+    """Project CAC, LTV and payback for a company profile.
+
+    Unknown inputs fall back to neutral benchmarks (seed / generic SaaS /
+    hybrid) and lower the reported confidence.
+    """
+    return _project(
+        normalize_stage(stage),
+        normalize_industry(industry),
+        normalize_strategy(strategy_type),
+        round(float(budget), 2) if budget else None,
+        scenarios,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _project(
+    stage: Optional[str],
+    industry: Optional[str],
+    strategy_type: Optional[str],
+    budget: Optional[float],
+    scenarios: int,
+) -> ROIEstimate:
+    known = sum(x is not None for x in (stage, industry, strategy_type, budget))
+    stage_key = stage or "seed"
+    industry_key = industry or "default"
+    strategy_key = strategy_type or "hybrid"
+
+    base = STAGE_BENCHMARKS[stage_key]
+    strat = STRATEGY_FACTORS[strategy_key]
+    ind = INDUSTRY_FACTORS[industry_key]
+
+    cac = base["cac"] * strat["cac"] * ind["cac"]
+    if budget:
+        cac *= max(budget / base["spend"], 0.25) ** SPEND_ELASTICITY
+    arpa = base["arpa"] * strat["arpa"] * ind["arpa"]
+    churn = base["churn"] * strat["churn"] * ind["churn"]
+
+    seed = zlib.crc32(f"{stage_key}|{industry_key}|{strategy_key}|{budget}|{scenarios}".encode())
+    rng = np.random.default_rng(seed)
+    draws = rng.standard_normal((4, scenarios))
+
+    # Wider spread when we had to guess inputs.
+    widen = 1.0 + 0.15 * (4 - known)
+    cac_s = cac * np.exp(CAC_SIGMA * widen * draws[0])
+    arpa_s = arpa * np.exp(ARPA_SIGMA * widen * draws[1])
+    churn_s = np.clip(churn * np.exp(CHURN_SIGMA * widen * draws[2]), 0.003, 0.25)
+    margin_s = np.clip(base["margin"] + MARGIN_SD * draws[3], 0.3, 0.95)
+
+    monthly_gross_profit = arpa_s * margin_s
+    ltv_s = monthly_gross_profit / churn_s
+    payback_s = cac_s / monthly_gross_profit
+    ratio_s = ltv_s / cac_s
+
+    pct = np.percentile(np.stack([cac_s, ltv_s, payback_s, ratio_s]), [10, 50, 90], axis=1)
+    cac_p, ltv_p, payback_p, ratio_p = (tuple(float(v) for v in pct[:, i]) for i in range(4))
+
+    # Confidence from input coverage and how wide the LTV:CAC band is.
+    spread = (ratio_p[2] - ratio_p[0]) / ratio_p[1]
+    if known == 4 and spread < 1.6:
+        confidence = "high"
+    elif known >= 2 and spread < 2.2:
+        confidence = "medium"
+    else:
+        confidence = "low"
+
+    return ROIEstimate(
+        cac=cac_p,
+        ltv=ltv_p,
+        payback_months=payback_p,
+        ltv_cac_ratio=ratio_p[1],
+        monthly_new_customers=budget / cac_p[1] if budget else None,
+        confidence=confidence,
+        stage=stage_key,
+        industry=industry_key if industry else "generic",
+        strategy_type=strategy_key,
+        scenarios=scenarios,
+    )
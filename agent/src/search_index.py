@@ -0,0 +1,423 @@
+"""
+In-process full-text index over agencies and articles.
+
+Documents are agency profiles from the catalog (description, overview, key
+services, specializations) and the site's published `articles`. Each is
+turned into a hashed TF-IDF vector over unigrams and bigrams, so there is
+no vocabulary to store and nothing is sent over the network.
+
+The matrix is sparse and term-major: CSR rows are hash buckets, columns are
+documents. When `SEARCH_INDEX_DIR` is set, each build is written as
+data/indices/indptr .npy files that are memory-mapped on startup, so a
+restart can serve queries from the previous build before the fresh one is
+ready; without it the index lives in memory only. A query only reads the
+rows for its own terms, so top-k over ~1k documents takes well under a
+millisecond.
+
+Several workers can share the directory: each build is written to a private
+temp directory and renamed into place, `meta.json` is replaced atomically,
+and old builds are only pruned once they are older than
+`SEARCH_INDEX_KEEP_SECONDS`.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from .catalog import AgencyCatalog, catalog
+from .db import DatabasePool, db
+
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR") or None
+SEARCH_INDEX_REFRESH_SECONDS = float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "900"))
+# Superseded builds stay on disk this long, so workers that just read
+# meta.json can still map the files it names.
+SEARCH_INDEX_KEEP_SECONDS = float(os.getenv("SEARCH_INDEX_KEEP_SECONDS", "3600"))
+
+# Hash buckets; bump INDEX_VERSION when the tokenization or weighting changes.
+INDEX_DIM = 1 << 14
+INDEX_VERSION = 2
+
+SNIPPET_CHARS = 240
+
+ARTICLES_QUERY = """
+    SELECT id, slug, title, excerpt, meta_description, content, guide_type, category
+    FROM articles
+    WHERE app = 'gtm' AND status = 'published'
+"""
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+_MARKUP_RE = re.compile(r"<[^>]+>|!\[[^\]]*\]\([^)]*\)|\[([^\]]*)\]\([^)]*\)|[#*_`>|]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have how if in into is it its of on or our "
+    "so than that the their them then there these they this to was we what when which who why "
+    "will with you your".split()
+)
+
+
+def _clean(text: str) -> str:
+    """Strip HTML / markdown markup, keeping link text."""
+    return _MARKUP_RE.sub(lambda m: m.group(1) or " ", text or "")
+
+
+def terms(text: str) -> list[str]:
+    """Lower-cased unigrams plus adjacent-word bigrams, stopwords dropped."""
+    words = [w for w in _WORD_RE.findall(text.casefold()) if w not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _bucket(term: str) -> int:
+    return zlib.crc32(term.encode()) & (INDEX_DIM - 1)
+
+
+def _snippet(text: str) -> str:
+    text = " ".join(_clean(text).split())
+    if len(text) <= SNIPPET_CHARS:
+        return text
+    cut = text.rfind(" ", 0, SNIPPET_CHARS)
+    return text[:cut if cut > 0 else SNIPPET_CHARS] + "…"
+
+
+@dataclass
+class Hit:
+    kind: str  # 'agency' or 'article'
+    slug: str
+    title: str
+    snippet: str
+    url: str
+    score: float
+
+
+@dataclass
+class Matrix:
+    """Term-major CSR weights: bucket b's entries are data/indices[indptr[b]:indptr[b + 1]]."""
+    data: np.ndarray     # float16 weights
+    indices: np.ndarray  # int32 document numbers
+    indptr: np.ndarray   # int64, INDEX_DIM + 1 offsets
+
+    PARTS = ("data", "indices", "indptr")
+
+
+class _Built:
+    """One immutable build: term-major weights, IDF and document metadata."""
+
+    def __init__(self, fingerprint: str, matrix: Matrix, idf: np.ndarray, docs: list[dict]):
+        self.fingerprint = fingerprint
+        self.matrix = matrix
+        self.idf = idf
+        self.docs = docs
+        self.is_article = np.array([d["kind"] == "article" for d in docs], dtype=bool)
+
+
+def agency_documents(cat: AgencyCatalog) -> list[dict]:
+    docs = []
+    for slug in cat.ranked:
+        row = cat.rows[slug]
+        specs = row.get("specializations") or []
+        services = row.get("key_services") or []
+        docs.append({
+            "kind": "agency",
+            "slug": slug,
+            "title": row.get("name") or slug,
+            "snippet": _snippet(row.get("description") or row.get("overview") or ""),
+            "url": f"/agency/{slug}",
+            "text": " ".join(filter(None, [
+                row.get("name"), row.get("name"),
+                row.get("description"), row.get("overview"),
+                " ".join(services), " ".join(specs), " ".join(specs),
+                row.get("headquarters"),
+            ])),
+        })
+    return docs
+
+
+def article_documents(rows: list[dict]) -> list[dict]:
+    docs = []
+    for row in rows:
+        summary = row.get("excerpt") or row.get("meta_description") or row.get("content") or ""
+        docs.append({
+            "kind": "article",
+            "slug": row["slug"],
+            "title": row.get("title") or row["slug"],
+            "snippet": _snippet(summary),
+            "url": f"/articles/{row['slug']}",
+            "text": " ".join(filter(None, [
+                row.get("title"), row.get("title"), summary,
+                row.get("guide_type"), row.get("category"),
+                _clean(row.get("content") or ""),
+            ])),
+        })
+    return docs
+
+
+def fingerprint(docs: list[dict]) -> str:
+    digest = hashlib.sha1(f"{INDEX_VERSION}:{INDEX_DIM}".encode())
+    for doc in docs:
+        digest.update(f"\0{doc['kind']}\0{doc['slug']}\0{doc['title']}\0{doc['text']}".encode())
+    return digest.hexdigest()
+
+
+def build_matrix(docs: list[dict]) -> tuple[Matrix, np.ndarray]:
+    """Sublinear-TF x smoothed-IDF weights, L2-normalized per document."""
+    doc_ids, buckets, counts = [], [], []
+    for i, doc in enumerate(docs):
+        tf = Counter(_bucket(t) for t in terms(doc["text"]))
+        doc_ids.extend([i] * len(tf))
+        buckets.extend(tf.keys())
+        counts.extend(tf.values())
+    doc_ids = np.array(doc_ids, dtype=np.int64)
+    buckets = np.array(buckets, dtype=np.int64)
+    counts = np.array(counts, dtype=np.float64)
+
+    n = len(docs)
+    df = np.bincount(buckets, minlength=INDEX_DIM)
+    idf = np.log((1 + n) / (1 + df)) + 1.0
+    weights = (1.0 + np.log(counts)) * idf[buckets]
+    norms = np.sqrt(np.bincount(doc_ids, weights=weights ** 2, minlength=n))
+    weights /= np.where(norms > 0, norms, 1.0)[doc_ids]
+
+    order = np.lexsort((doc_ids, buckets))
+    indptr = np.zeros(INDEX_DIM + 1, dtype=np.int64)
+    np.cumsum(df, out=indptr[1:])
+    matrix = Matrix(
+        data=weights[order].astype(np.float16),
+        indices=doc_ids[order].astype(np.int32),
+        indptr=indptr,
+    )
+    return matrix, idf.astype(np.float32)
+
+
+class SearchIndex:
+    """Builds, persists and queries the index; swaps builds atomically."""
+
+    def __init__(
+        self,
+        catalog: AgencyCatalog,
+        pool: DatabasePool,
+        directory: Optional[str],
+        refresh_interval: float = 900.0,
+        keep_seconds: float = 3600.0,
+    ):
+        self.catalog = catalog
+        self.pool = pool
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.keep_seconds = keep_seconds
+        self._built: Optional[_Built] = None
+        self._task: Optional[asyncio.Task] = None
+        self._build_lock = asyncio.Lock()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._built is not None
+
+    def __len__(self) -> int:
+        return len(self._built.docs) if self._built else 0
+
+    # -- lifecycle --
+
+    def start(self) -> None:
+        """Serve the last saved build right away, then rebuild in the background."""
+        if self._built is None:
+            self._built = self._load_saved()
+            if self._built is not None:
+                print(f"[Search] Loaded saved index ({len(self._built.docs)} documents)", file=sys.stderr)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop(), name="search-index-refresh")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def refresh(self) -> bool:
+        """Rebuild if agencies or articles changed. Returns True if it rebuilt."""
+        async with self._build_lock:
+            await self.catalog.ensure_loaded()
+            docs = agency_documents(self.catalog)
+            try:
+                docs += article_documents(await self.pool.fetch_all(ARTICLES_QUERY))
+            except Exception as e:
+                # Still useful for agencies alone.
+                print(f"[Search] Articles unavailable: {e}", file=sys.stderr)
+
+            digest = fingerprint(docs)
+            if self._built is not None and self._built.fingerprint == digest:
+                return False
+
+            start = time.perf_counter()
+            built = await asyncio.to_thread(self._build_and_save, digest, docs)
+            self._built = built
+            print(
+                f"[Search] Indexed {len(docs)} documents in {(time.perf_counter() - start) * 1000:.0f}ms",
+                file=sys.stderr,
+            )
+            return True
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[Search] Index refresh failed: {e}", file=sys.stderr)
+            await asyncio.sleep(self.refresh_interval)
+
+    # -- persistence --
+
+    def _build_dir(self, digest: str) -> str:
+        return os.path.join(self.directory, f"build-{digest[:16]}")
+
+    def _build_and_save(self, digest: str, docs: list[dict]) -> _Built:
+        matrix, idf = build_matrix(docs)
+        meta = [{k: d[k] for k in ("kind", "slug", "title", "snippet", "url")} for d in docs]
+        if not self.directory:
+            return _Built(digest, matrix, idf, meta)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._save_build(digest, matrix, idf)
+            self._mark_superseded(digest)
+            # The metadata file names the build, so write it last and atomically.
+            fd, tmp = tempfile.mkstemp(prefix="meta-", suffix=".tmp", dir=self.directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"fingerprint": digest, "docs": meta}, f)
+                os.replace(tmp, os.path.join(self.directory, "meta.json"))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            self._prune(keep=digest)
+            matrix, idf = self._map_build(digest)
+        except (OSError, ValueError) as e:
+            print(f"[Search] Could not save index: {e}", file=sys.stderr)
+        return _Built(digest, matrix, idf, meta)
+
+    def _save_build(self, digest: str, matrix: Matrix, idf: np.ndarray) -> None:
+        """Write the build to a private directory, then rename it into place."""
+        target = self._build_dir(digest)
+        if os.path.isdir(target):
+            return
+        staging = tempfile.mkdtemp(prefix="staging-", dir=self.directory)
+        try:
+            for part in Matrix.PARTS:
+                np.save(os.path.join(staging, f"{part}.npy"), getattr(matrix, part))
+            np.save(os.path.join(staging, "idf.npy"), idf)
+            try:
+                os.rename(staging, target)
+            except OSError:
+                if not os.path.isdir(target):
+                    raise
+                # Another worker saved the same build first.
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _map_build(self, digest: str) -> tuple[Matrix, np.ndarray]:
+        build = self._build_dir(digest)
+        matrix = Matrix(**{
+            part: np.load(os.path.join(build, f"{part}.npy"), mmap_mode="r") for part in Matrix.PARTS
+        })
+        if matrix.indptr.shape != (INDEX_DIM + 1,) or not (
+            matrix.data.shape == matrix.indices.shape == (int(matrix.indptr[-1]),)
+        ):
+            raise ValueError(f"corrupt index build {digest[:16]}")
+        return matrix, np.load(os.path.join(build, "idf.npy"))
+
+    def _load_saved(self) -> Optional[_Built]:
+        if not self.directory:
+            return None
+        try:
+            with open(os.path.join(self.directory, "meta.json")) as f:
+                meta = json.load(f)
+            matrix, idf = self._map_build(meta["fingerprint"])
+        except (OSError, ValueError, KeyError):
+            return None
+        return _Built(meta["fingerprint"], matrix, idf, meta["docs"])
+
+    def _mark_superseded(self, digest: str) -> None:
+        """Touch the build meta.json names now, starting its grace period."""
+        try:
+            with open(os.path.join(self.directory, "meta.json")) as f:
+                previous = json.load(f)["fingerprint"]
+            if previous != digest:
+                os.utime(self._build_dir(previous))
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _prune(self, keep: str) -> None:
+        """Remove superseded builds and abandoned temp files past the grace period.
+
+        Maps already open stay valid after the files are unlinked on POSIX; the
+        grace period covers workers between reading meta.json and mapping.
+        """
+        cutoff = time.time() - self.keep_seconds
+        for name in os.listdir(self.directory):
+            if name == "meta.json" or name == os.path.basename(self._build_dir(keep)):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    # -- queries --
+
+    def search(self, query: str, kind: Optional[str] = None, limit: int = 5) -> list[Hit]:
+        """Top `limit` documents by cosine similarity, optionally one kind only."""
+        built = self._built
+        if built is None or not built.docs or limit <= 0:
+            return []
+        tf = Counter(_bucket(t) for t in terms(query))
+        if not tf:
+            return []
+        buckets = np.fromiter(tf.keys(), dtype=np.int64, count=len(tf))
+        weights = (1.0 + np.log(np.fromiter(tf.values(), dtype=np.float32, count=len(tf)))) * built.idf[buckets]
+        weights /= math.sqrt(float(weights @ weights))
+        m = built.matrix
+        starts, ends = m.indptr[buckets], m.indptr[buckets + 1]
+        docs = np.concatenate([m.indices[a:b] for a, b in zip(starts, ends)])
+        contributions = np.concatenate([
+            m.data[a:b].astype(np.float32) * w for a, b, w in zip(starts, ends, weights)
+        ])
+        scores = np.bincount(docs, weights=contributions, minlength=len(built.docs))
+
+        if kind == "article":
+            scores = np.where(built.is_article, scores, 0.0)
+        elif kind == "agency":
+            scores = np.where(built.is_article, 0.0, scores)
+
+        k = min(limit, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k] if k < scores.size else np.arange(scores.size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            Hit(score=round(float(scores[i]), 3), **built.docs[i])
+            for i in top
+            if scores[i] > 0
+        ]
+
+
+search_index = SearchIndex(
+    catalog,
+    db,
+    SEARCH_INDEX_DIR,
+    refresh_interval=SEARCH_INDEX_REFRESH_SECONDS,
+    keep_seconds=SEARCH_INDEX_KEEP_SECONDS,
+)
@@ -0,0 +1,290 @@
+"""
+Per-thread AG-UI session state.
+
+Each CopilotKit conversation (AG-UI `thread_id`) gets its own `AppState`.
+States live in an in-memory LRU bounded by count, idle TTL and serialized
+size. When `SESSION_SQLITE_PATH` is set, every save is also written through
+to a local SQLite file, which lets evicted sessions come back and lets
+several uvicorn workers on the same host serve the same thread.
+
+Saves are compare-and-set against the version the request loaded. If another
+request saved the thread in the meantime, the fields this request changed are
+merged onto the newer state instead of overwriting it; the client then gets a
+full snapshot on its next run because its copy no longer matches.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Generic, Optional, TypeVar
+
+from pydantic import BaseModel
+from pydantic_ai.ag_ui import StateDeps
+
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH") or None
+# Spilled sessions are purged after this long without a save.
+SESSION_SQLITE_TTL = float(os.getenv("SESSION_SQLITE_TTL", str(7 * 24 * 3600)))
+SESSION_SWEEP_SECONDS = float(os.getenv("SESSION_SWEEP_SECONDS", "60"))
+
+StateT = TypeVar("StateT", bound=BaseModel)
+
+
+@dataclass
+class SessionDeps(StateDeps[StateT], Generic[StateT]):
+    """StateDeps bound to an AG-UI thread.
+
+    `run_ag_ui` swaps in a freshly validated state via `dataclasses.replace`,
+    which re-runs `__post_init__`; `live` is shared across those copies, so it
+    always points at the state object the tools are mutating.
+    """
+    thread_id: str = ""
+    live: dict = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self.live["state"] = self.state
+
+    @property
+    def live_state(self) -> StateT:
+        return self.live["state"]
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """The version a request loaded and its serialized state (the merge base)."""
+    version: int
+    payload: str
+
+    @classmethod
+    def of(cls, state: BaseModel, version: int = 0) -> "Snapshot":
+        return cls(version, state.model_dump_json())
+
+
+@dataclass
+class _Entry:
+    state: BaseModel
+    size: int
+    version: int
+    touched: float
+
+
+class SessionStore(Generic[StateT]):
+    """LRU + idle-TTL store of per-thread state with optional SQLite spill."""
+
+    def __init__(
+        self,
+        model: type[StateT],
+        max_sessions: int = 1000,
+        idle_ttl: float = 3600.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        sqlite_path: Optional[str] = None,
+        sqlite_ttl: float = 7 * 24 * 3600.0,
+        sweep_interval: float = 60.0,
+    ):
+        self.model = model
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.sqlite_path = sqlite_path
+        self.sqlite_ttl = sqlite_ttl
+        self.sweep_interval = sweep_interval
+        self.total_bytes = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._sqlite: Optional[sqlite3.Connection] = None
+        self._sqlite_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # -- lifecycle --
+
+    async def open(self) -> None:
+        if self.sqlite_path and self._sqlite is None:
+            self._sqlite = await asyncio.to_thread(self._open_sqlite)
+
+    def start(self) -> None:
+        """Start the background idle sweeper."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sweep_loop(), name="session-sweep")
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        conn, self._sqlite = self._sqlite, None
+        if conn is not None:
+            conn.close()
+
+    # -- access --
+
+    async def load(self, thread_id: str) -> tuple[Optional[StateT], Optional[Snapshot]]:
+        """Return the stored state for a thread and the snapshot to save against.
+
+        Both are None if the thread is new.
+        """
+        if not thread_id:
+            return None, None
+        entry = self._entries.get(thread_id)
+        if self._sqlite is not None:
+            # Another worker may have saved a newer version.
+            row = await asyncio.to_thread(self._read_sqlite, thread_id, entry.version if entry else 0)
+            if row is not None:
+                version, payload = row
+                state = self.model.model_validate_json(payload)
+                entry = self._put(thread_id, state, len(payload), version)
+        if entry is None:
+            return None, None
+        entry.touched = time.monotonic()
+        self._entries.move_to_end(thread_id)
+        return entry.state, Snapshot.of(entry.state, entry.version)
+
+    async def save(self, thread_id: str, state: StateT, base: Snapshot) -> Optional[StateT]:
+        """Store the state for a thread if it is still at `base.version`.
+
+        On a conflict the newer state is reloaded, this request's changes since
+        `base` are merged onto it, and the save is retried. Returns the state
+        that was stored.
+        """
+        if not thread_id:
+            return None
+        payload = state.model_dump_json()
+        previous = self._entries.get(thread_id)
+        if self._sqlite is None:
+            if previous is not None and previous.version != base.version:
+                state = self._merge(base, state, previous.state)
+                payload = state.model_dump_json()
+            version = (previous.version if previous else 0) + 1
+        else:
+            expected = base.version
+            while True:
+                current = await asyncio.to_thread(self._write_sqlite, thread_id, payload, expected)
+                if current is None:
+                    version = expected + 1
+                    break
+                expected, newer = current
+                state = self._merge(base, state, self.model.model_validate_json(newer))
+                payload = state.model_dump_json()
+        self._put(thread_id, state, len(payload), version)
+        return state
+
+    def _merge(self, base: Snapshot, mine: StateT, theirs: StateT) -> StateT:
+        """Apply the top-level fields `mine` changed since `base` onto `theirs`."""
+        print("[Sessions] Merging concurrent update", file=sys.stderr)
+        before = json.loads(base.payload)
+        merged = theirs.model_dump(mode="json")
+        for key, value in mine.model_dump(mode="json").items():
+            if key not in before or before[key] != value:
+                merged[key] = value
+        return self.model.model_validate(merged)
+
+    def _put(self, thread_id: str, state: StateT, size: int, version: int) -> _Entry:
+        previous = self._entries.pop(thread_id, None)
+        if previous is not None:
+            self.total_bytes -= previous.size
+        entry = _Entry(state=state, size=size, version=version, touched=time.monotonic())
+        self._entries[thread_id] = entry
+        self.total_bytes += size
+        self._evict(keep=thread_id)
+        return entry
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Drop least-recently-used sessions until within count and byte caps."""
+        while len(self._entries) > self.max_sessions or (
+            self.total_bytes > self.max_bytes and len(self._entries) > 1
+        ):
+            thread_id = next(iter(self._entries))
+            if thread_id == keep:
+                break
+            self.total_bytes -= self._entries.pop(thread_id).size
+
+    def sweep(self) -> int:
+        """Drop sessions idle longer than the TTL. Returns how many were dropped."""
+        cutoff = time.monotonic() - self.idle_ttl
+        expired = [tid for tid, e in self._entries.items() if e.touched < cutoff]
+        for thread_id in expired:
+            self.total_bytes -= self._entries.pop(thread_id).size
+        return len(expired)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                dropped = self.sweep()
+                if self._sqlite is not None:
+                    await asyncio.to_thread(self._purge_sqlite)
+                if dropped:
+                    print(f"[Sessions] Evicted {dropped} idle sessions", file=sys.stderr)
+            except Exception as e:
+                print(f"[Sessions] Sweep failed: {e}", file=sys.stderr)
+
+    # -- SQLite spill (runs in worker threads) --
+
+    def _open_sqlite(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.sqlite_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                thread_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        return conn
+
+    def _read_sqlite(self, thread_id: str, newer_than: int) -> Optional[tuple[int, str]]:
+        with self._sqlite_lock:
+            return self._sqlite.execute(
+                "SELECT version, state FROM sessions WHERE thread_id = ? AND version > ?",
+                (thread_id, newer_than),
+            ).fetchone()
+
+    def _write_sqlite(self, thread_id: str, payload: str, expected: int) -> Optional[tuple[int, str]]:
+        """Write `payload` as version `expected + 1` if the row is still at `expected`.
+
+        Returns None on success, else the (version, state) row that got there first.
+        """
+        insert = (
+            "INSERT INTO sessions (thread_id, version, state, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (thread_id) DO NOTHING"
+        )
+        with self._sqlite_lock:
+            now = time.time()
+            if expected:
+                written = self._sqlite.execute(
+                    "UPDATE sessions SET version = ?, state = ?, updated_at = ? "
+                    "WHERE thread_id = ? AND version = ?",
+                    (expected + 1, payload, now, thread_id, expected),
+                ).rowcount
+            else:
+                written = self._sqlite.execute(insert, (thread_id, 1, payload, now)).rowcount
+            if written:
+                return None
+            select = "SELECT version, state FROM sessions WHERE thread_id = ?"
+            row = self._sqlite.execute(select, (thread_id,)).fetchone()
+            if row is None:
+                # Purged since it was read; nothing newer to merge with.
+                if self._sqlite.execute(insert, (thread_id, expected + 1, payload, now)).rowcount:
+                    return None
+                row = self._sqlite.execute(select, (thread_id,)).fetchone()
+            return row
+
+    def _purge_sqlite(self) -> None:
+        with self._sqlite_lock:
+            self._sqlite.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.sqlite_ttl,)
+            )
@@ -0,0 +1,149 @@
+"""
+Server-sent event framing and write coalescing for the CLM and AG-UI streams.
+
+CLM frames are built from a pre-serialized template: everything around the
+delta text is rendered once per message, so each frame costs one JSON
+string escape and two concatenations instead of building and dumping a
+nested dict. orjson does the escaping when it is installed, the stdlib's C
+encoder otherwise.
+
+`coalesce` sits between a frame stream and the response. It sends the first
+frame at once and afterwards flushes whatever has arrived at most every
+SSE_FLUSH_INTERVAL seconds (or every SSE_FLUSH_BYTES), so a burst of small
+frames becomes one write instead of one ASGI message and socket send each.
+A producer that gets SSE_FLUSH_BYTES ahead of the client waits for the
+next write. SSE_FLUSH_INTERVAL=0 writes every frame as it comes.
+"""
+import asyncio
+import json
+import os
+from json.encoder import encode_basestring_ascii
+from typing import Any, AsyncIterable, AsyncIterator, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_INTERVAL", "0.005"))
+SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES", "16384"))
+
+if orjson is not None:
+    def json_string(value: str) -> str:
+        return orjson.dumps(value).decode()
+
+    def dumps(value: Any) -> str:
+        return orjson.dumps(value).decode()
+else:
+    json_string = encode_basestring_ascii
+
+    def dumps(value: Any) -> str:
+        return json.dumps(value, separators=(",", ":"))
+
+FINISH_FRAME = f'data: {dumps({"choices": [{"delta": {}, "finish_reason": "stop"}]})}\n\ndata: [DONE]\n\n'
+_CHUNK_TAIL = '},"finish_reason":null}]}\n\n'
+
+
+class ChunkFrames:
+    """OpenAI `chat.completion.chunk` content frames for one message id."""
+
+    __slots__ = ("_head",)
+
+    def __init__(self, msg_id: str):
+        self._head = (
+            f'data: {{"id":{json_string(msg_id)},"object":"chat.completion.chunk",'
+            f'"choices":[{{"index":0,"delta":{{"content":'
+        )
+
+    def content(self, text: str) -> str:
+        return self._head + json_string(text) + _CHUNK_TAIL
+
+
+class _Pending:
+    """Frames the producer has buffered and the writer hasn't taken yet."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.frames: list[bytes] = []
+        self.size = 0
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.ready = asyncio.Event()    # something to write
+        self.urgent = asyncio.Event()   # write now: full, or the stream ended
+        self.drained = asyncio.Event()  # room for more
+        self.drained.set()
+
+    def take(self) -> bytes:
+        data = b"".join(self.frames)
+        self.frames.clear()
+        self.size = 0
+        self.ready.clear()
+        self.urgent.clear()
+        self.drained.set()
+        return data
+
+
+async def _pump(frames: AsyncIterable[Union[str, bytes]], pending: _Pending) -> None:
+    # One task drives the producer start to finish, so context variables it
+    # sets (pydantic-ai runs, tracing) stay in a single context.
+    iterator = aiter(frames)
+    try:
+        async for frame in iterator:
+            data = frame.encode() if isinstance(frame, str) else frame
+            pending.frames.append(data)
+            pending.size += len(data)
+            pending.ready.set()
+            if pending.size >= pending.max_bytes:
+                # Let the writer catch up before producing more.
+                pending.urgent.set()
+                pending.drained.clear()
+                await pending.drained.wait()
+    except Exception as e:
+        pending.error = e
+    finally:
+        pending.done = True
+        pending.ready.set()
+        pending.urgent.set()
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def coalesce(
+    frames: AsyncIterable[Union[str, bytes]],
+    flush_interval: float = SSE_FLUSH_INTERVAL,
+    max_bytes: int = SSE_FLUSH_BYTES,
+) -> AsyncIterator[bytes]:
+    """Merge SSE frames into fewer, larger writes (leading edge, then every `flush_interval`)."""
+    if flush_interval <= 0:
+        async for frame in frames:
+            yield frame.encode() if isinstance(frame, str) else frame
+        return
+
+    loop = asyncio.get_running_loop()
+    pending = _Pending(max_bytes)
+    pump = asyncio.create_task(_pump(frames, pending), name="sse-pump")
+    last_flush = float("-inf")
+    try:
+        while True:
+            await pending.ready.wait()
+            wait = last_flush + flush_interval - loop.time()
+            if wait > 0 and not pending.urgent.is_set():
+                try:
+                    async with asyncio.timeout(wait):
+                        await pending.urgent.wait()
+                except TimeoutError:
+                    pass
+            if pending.frames:
+                yield pending.take()
+                last_flush = loop.time()
+            else:
+                pending.ready.clear()
+            if pending.done and not pending.frames:
+                break
+        if pending.error is not None:
+            raise pending.error
+    finally:
+        if not pump.done():
+            pump.cancel()
+        await asyncio.gather(pump, return_exceptions=True)
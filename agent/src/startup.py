@@ -0,0 +1,139 @@
+"""
+Lazily built LLM clients and the startup warm-up.
+
+The Gemini SDKs are the most expensive imports in the service, so nothing
+imports them at module load: `generativeai()` imports and configures
+google.generativeai on first call, and `lazy_google_model` hands the agent
+a pydantic-ai model that only builds its GoogleModel on the first request.
+
+On startup, `WarmUp` runs the DB pool, catalog and LLM client setup
+concurrently and records how each step went; `/ready` answers 503 until
+every step has succeeded. Failed steps are retried with backoff, so an
+instance that booted while the database was unreachable becomes ready
+once it is back.
+"""
+import asyncio
+import functools
+import os
+import sys
+import time
+from typing import Awaitable, Callable, Optional
+
+from pydantic_ai.models import Model
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.profiles.google import google_model_profile
+
+
+@functools.cache
+def generativeai():
+    """google.generativeai, imported and configured on first use."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return genai
+
+
+class _LazyModel(WrapperModel):
+    """A model built on first use; name and profile are known up front."""
+
+    def __init__(self, factory: Callable[[], Model], model_name: str, system: str, profile):
+        # Skips WrapperModel.__init__, which would build the model now.
+        Model.__init__(self, profile=profile)
+        self._factory = factory
+        self._model: Optional[Model] = None
+        self._model_name = model_name
+        self._system = system
+
+    @property
+    def wrapped(self) -> Model:
+        if self._model is None:
+            self._model = self._factory()
+        return self._model
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    @property
+    def system(self) -> str:
+        return self._system
+
+    @functools.cached_property
+    def profile(self):
+        # Model's own resolution, not the wrapped model's.
+        return Model.profile.func(self)
+
+
+def lazy_google_model(model_name: str) -> Model:
+    """GoogleModel(model_name), imported and constructed on first use."""
+    def build() -> Model:
+        from pydantic_ai.models.google import GoogleModel
+
+        return GoogleModel(model_name)
+
+    return _LazyModel(build, model_name, "google-gla", google_model_profile)
+
+
+class WarmUp:
+    """Runs named startup steps concurrently; ready once all have succeeded."""
+
+    def __init__(self, retry_max: float = 30.0):
+        self.steps: dict[str, str] = {}  # name -> "pending", "ok" or "failed"
+        self.retry_max = retry_max
+        self.done = False  # every step has run at least once
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.steps) and all(status == "ok" for status in self.steps.values())
+
+    def start(self, steps: dict[str, Callable[[], Awaitable]]) -> None:
+        for name in steps:
+            self.steps[name] = "pending"
+        self._task = asyncio.create_task(self._run(steps), name="warm-up")
+
+    async def wait(self) -> None:
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def report(self) -> dict:
+        """Public readiness: step statuses only, never error details."""
+        return {"ready": self.ready, "steps": dict(self.steps)}
+
+    async def _run(self, steps: dict[str, Callable[[], Awaitable]]) -> None:
+        start = time.perf_counter()
+        await asyncio.gather(*(self._step(name, step) for name, step in steps.items()))
+        self.done = True
+        failed = [name for name, status in self.steps.items() if status != "ok"]
+        print(
+            f"[GTM] Warm-up finished in {(time.perf_counter() - start) * 1000:.0f}ms"
+            + (f" ({', '.join(failed)} failed; not ready, retrying)" if failed else ""),
+            file=sys.stderr,
+        )
+        await asyncio.gather(*(self._retry(name, steps[name]) for name in failed))
+
+    async def _retry(self, name: str, step: Callable[[], Awaitable]) -> None:
+        delay = min(1.0, self.retry_max)
+        while self.steps[name] != "ok":
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.retry_max)
+            if await self._step(name, step):
+                print(f"[GTM] Warm-up of {name} succeeded on retry", file=sys.stderr)
+
+    async def _step(self, name: str, step: Callable[[], Awaitable]) -> bool:
+        start = time.perf_counter()
+        try:
+            await step()
+        except Exception as e:
+            ms = (time.perf_counter() - start) * 1000
+            print(f"[GTM] Warm-up of {name} failed after {ms:.0f}ms: {e}", file=sys.stderr)
+            self.steps[name] = "failed"
+            return False
+        self.steps[name] = "ok"
+        return True
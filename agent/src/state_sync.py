@@ -0,0 +1,99 @@
+"""
+Incremental AG-UI state sync.
+
+Tools declare the `AppState` fields they write with `@syncs_state(...)`.
+After each call only those fields are diffed into RFC 6902 JSON Patch
+operations and attached to the tool result as a STATE_DELTA event, so the
+SSE payload tracks what changed rather than the size of the conversation.
+A full STATE_SNAPSHOT goes out only when a thread connects or resyncs.
+"""
+import functools
+from typing import Any, Optional
+
+from ag_ui.core import EventType, StateDeltaEvent, StateSnapshotEvent
+from pydantic import BaseModel
+from pydantic_ai.messages import ToolReturn
+
+
+def _pointer(path: str, key: Any) -> str:
+    token = str(key).replace("~", "~0").replace("/", "~1")
+    return f"{path}/{token}"
+
+
+def json_patch(before: Any, after: Any, path: str = "") -> list[dict]:
+    """Minimal JSON Patch turning `before` into `after` (JSON-mode values)."""
+    if before == after:
+        return []
+
+    if isinstance(before, dict) and isinstance(after, dict):
+        ops = []
+        for key in before.keys() - after.keys():
+            ops.append({"op": "remove", "path": _pointer(path, key)})
+        for key, value in after.items():
+            if key not in before:
+                # `add` on an object member also overwrites, which keeps the
+                # patch valid even if the client never saw the key.
+                ops.append({"op": "add", "path": _pointer(path, key), "value": value})
+            else:
+                ops.extend(json_patch(before[key], value, _pointer(path, key)))
+        return ops
+
+    if isinstance(before, list) and isinstance(after, list):
+        shared = min(len(before), len(after))
+        if before[:shared] == after[:shared]:
+            # Pure append or truncate, the common case for report lists.
+            if len(after) > len(before):
+                return [
+                    {"op": "add", "path": _pointer(path, i), "value": after[i]}
+                    for i in range(shared, len(after))
+                ]
+            return [
+                {"op": "remove", "path": _pointer(path, i)}
+                for i in range(len(before) - 1, shared - 1, -1)
+            ]
+        if len(before) == len(after):
+            ops = []
+            for i, (old, new) in enumerate(zip(before, after)):
+                ops.extend(json_patch(old, new, _pointer(path, i)))
+            return ops
+
+    if path == "":
+        raise ValueError("json_patch needs object roots")
+    return [{"op": "replace", "path": path, "value": after}]
+
+
+def state_delta(before: dict, after: dict) -> Optional[StateDeltaEvent]:
+    """STATE_DELTA event for two field dumps, or None if nothing changed."""
+    ops = json_patch(before, after)
+    if not ops:
+        return None
+    return StateDeltaEvent(type=EventType.STATE_DELTA, delta=ops)
+
+
+def state_snapshot(state: BaseModel) -> StateSnapshotEvent:
+    return StateSnapshotEvent(type=EventType.STATE_SNAPSHOT, snapshot=state.model_dump(mode="json"))
+
+
+def syncs_state(*fields: str):
+    """Decorate an agent tool that writes the given `AppState` fields.
+
+    The tool's return value is wrapped in a `ToolReturn` carrying a
+    STATE_DELTA event for whatever changed in those fields; AG-UI forwards it
+    to the frontend right after the tool result.
+    """
+    include = set(fields)
+
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(ctx, *args, **kwargs):
+            state = ctx.deps.state
+            before = state.model_dump(include=include, mode="json")
+            result = await func(ctx, *args, **kwargs)
+            delta = state_delta(before, state.model_dump(include=include, mode="json"))
+            if delta is None:
+                return result
+            return ToolReturn(return_value=result, metadata=delta)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,92 @@
+"""
+Streaming helpers for the Hume EVI CLM endpoint (/chat/completions).
+
+Gemini tokens are re-cut at phrase/sentence boundaries and sent as
+OpenAI-style `chat.completion.chunk` SSE frames (see sse.py) as soon as
+each phrase is complete, so TTS can start speaking while generation
+continues.
+"""
+import re
+import sys
+from typing import AsyncIterable, AsyncIterator
+
+from .sse import FINISH_FRAME, ChunkFrames
+
+FALLBACK_REPLY = "I'm having trouble responding right now. Could you try again?"
+
+# Don't send phrases shorter than this unless the reply ends.
+PHRASE_MIN_CHARS = 12
+# Force a cut (at the last space) when no boundary shows up for this long.
+PHRASE_MAX_CHARS = 120
+
+# Sentence or clause punctuation followed by whitespace; the lookahead keeps
+# "3.5x" or "e.g." mid-token intact until we know what follows.
+_BOUNDARY_RE = re.compile(r"[.!?;:,—](?=\s)|\n")
+
+
+def _find_cut(buffer: str, min_chars: int, max_chars: int) -> int:
+    """Index to cut `buffer` at, or 0 if the phrase isn't complete yet."""
+    for match in _BOUNDARY_RE.finditer(buffer, min_chars - 1 if min_chars > 0 else 0):
+        cut = match.end()
+        # Keep the separating whitespace with the phrase it ends.
+        while cut < len(buffer) and buffer[cut] in " \t":
+            cut += 1
+        return cut
+    if len(buffer) >= max_chars:
+        space = buffer.rfind(" ", 0, max_chars)
+        return space + 1 if space > 0 else max_chars
+    return 0
+
+
+async def phrase_chunks(
+    tokens: AsyncIterable[str],
+    min_chars: int = PHRASE_MIN_CHARS,
+    max_chars: int = PHRASE_MAX_CHARS,
+) -> AsyncIterator[str]:
+    """Re-chunk a token stream into speakable phrases."""
+    buffer = ""
+    async for token in tokens:
+        buffer += token
+        while cut := _find_cut(buffer, min_chars, max_chars):
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    if buffer.strip():
+        yield buffer.rstrip()
+
+
+async def gemini_text_stream(chat, prompt: str) -> AsyncIterator[str]:
+    """Yield text deltas from a streaming Gemini chat turn."""
+    response = await chat.send_message_async(prompt, stream=True)
+    async for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. a bare finish reason).
+            continue
+        if text:
+            yield text
+
+
+async def single_reply(text: str) -> AsyncIterator[str]:
+    """Wrap a canned reply so it goes through the same SSE path."""
+    yield text
+
+
+async def stream_sse_response(tokens: AsyncIterable[str], msg_id: str, log_label: str = ""):
+    """Stream OpenAI-compatible SSE chunks for Hume EVI as phrases complete."""
+    frames = ChunkFrames(msg_id)
+    spoken = []
+    try:
+        async for phrase in phrase_chunks(tokens):
+            spoken.append(phrase)
+            yield frames.content(phrase)
+    except Exception as e:
+        print(f"[CLM] Error: {e}", file=sys.stderr)
+        if not spoken:
+            spoken.append(FALLBACK_REPLY)
+            yield frames.content(FALLBACK_REPLY)
+
+    if log_label:
+        print(f"[CLM] User: {log_label[:50]}... -> Response: {''.join(spoken)[:50]}...", file=sys.stderr)
+
+    yield FINISH_FRAME
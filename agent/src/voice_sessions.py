@@ -0,0 +1,254 @@
+"""
+Per-conversation Gemini chats for the Hume EVI CLM endpoint.
+
+Hume re-sends the whole transcript on every turn. Keyed by the session's
+`custom_session_id`, a VoiceSessionStore keeps the Gemini chat from the
+previous turn, so when the transcript only grew by the assistant reply we
+produced and one new user message, only that message is sent. The system
+prompt goes in once as the model's system instruction instead of being
+prepended to each message.
+
+The session remembers a digest of the last turn it synced, so a transcript
+that grew by the right amount but no longer contains that turn where the chat
+left off (an edited or different conversation) is not mistaken for a
+continuation.
+
+Anything unexpected (a transcript that doesn't line up, an overlapping
+request after a barge-in, a turn that didn't finish streaming) rebuilds the
+chat from the transcript, which is what every request used to do.
+
+With a HistoryCompactor, long transcripts are rebuilt from its rolling
+summary plus the recent turns instead, whenever a newer summary is ready.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Optional
+
+from .compaction import Compacted, HistoryCompactor
+
+VOICE_SESSION_IDLE_TTL = float(os.getenv("VOICE_SESSION_IDLE_TTL", "900"))
+VOICE_MAX_SESSIONS = int(os.getenv("VOICE_MAX_SESSIONS", "500"))
+# Distinct system prompts (they embed per-user context) with a cached model.
+VOICE_MAX_MODELS = int(os.getenv("VOICE_MAX_MODELS", "64"))
+
+VOICE_REPLY_INSTRUCTION = "Respond naturally and concisely (1-2 sentences for voice)."
+
+
+def voice_instruction(system_prompt: str) -> str:
+    """The system instruction a voice chat actually runs with."""
+    return f"{system_prompt}\n\n{VOICE_REPLY_INSTRUCTION}"
+
+
+def transcript(messages: list[dict]) -> list[dict]:
+    """The user/assistant turns of a Hume request, in Gemini chat format."""
+    turns = []
+    for msg in messages:
+        role = msg.get("role", "")
+        if role == "user":
+            turns.append({"role": "user", "parts": [msg.get("content", "")]})
+        elif role == "assistant":
+            turns.append({"role": "model", "parts": [msg.get("content", "")]})
+    return turns
+
+
+def group_turns(history: list[dict]) -> list[list[dict]]:
+    """Split chat history into exchanges, each starting at a user message."""
+    groups: list[list[dict]] = []
+    for turn in history:
+        if turn["role"] == "user" or not groups:
+            groups.append([])
+        groups[-1].append(turn)
+    return groups
+
+
+def render_exchange(group: list[dict]) -> str:
+    return "\n".join(
+        f"{'User' if t['role'] == 'user' else 'Assistant'}: {' '.join(map(str, t['parts']))}" for t in group
+    )
+
+
+def compacted_history(plan: Compacted, groups: list[list[dict]]) -> list[dict]:
+    head = [
+        {"role": "user", "parts": [plan.block]},
+        {"role": "model", "parts": ["Understood."]},
+    ]
+    return head + [turn for group in groups[plan.cut:] for turn in group]
+
+
+@dataclass
+class _Session:
+    prompt_key: str
+    chat: Any = None
+    # Transcript turns already reflected in `chat` (including the last user turn).
+    synced: int = 0
+    # Digest of turns[synced - 1], the last of those turns.
+    last: str = ""
+    # Exchanges replaced by the compaction summary the chat was built with.
+    cut: int = 0
+    busy: bool = False
+    touched: float = 0.0
+
+
+class VoiceSessionStore:
+    """LRU of live voice chats with idle expiry and a size cap."""
+
+    def __init__(
+        self,
+        model_factory: Callable[[str], Any],
+        max_sessions: int = 500,
+        idle_ttl: float = 900.0,
+        max_models: int = 64,
+        compactor: Optional[HistoryCompactor] = None,
+    ):
+        self.model_factory = model_factory
+        self.compactor = compactor
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_models = max_models
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self.reused = 0
+        self.rebuilt = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def model(self, system_prompt: str) -> Any:
+        """A cached model whose system instruction is `system_prompt`."""
+        model = self._models.get(_prompt_key(system_prompt))
+        if model is None:
+            return self.add_model(system_prompt, self.build_model(system_prompt))
+        self._models.move_to_end(_prompt_key(system_prompt))
+        return model
+
+    def build_model(self, system_prompt: str) -> Any:
+        """Construct (but don't cache) the model for `system_prompt`; safe off the event loop."""
+        return self.model_factory(voice_instruction(system_prompt))
+
+    def add_model(self, system_prompt: str, model: Any) -> Any:
+        """Cache a model from `build_model`, unless one was cached meanwhile. Event loop only."""
+        key = _prompt_key(system_prompt)
+        if key in self._models:
+            self._models.move_to_end(key)
+            return self._models[key]
+        self._models[key] = model
+        while len(self._models) > self.max_models:
+            self._models.popitem(last=False)
+        return model
+
+    def stream_turn(
+        self,
+        session_id: Optional[str],
+        system_prompt: str,
+        turns: list[dict],
+        send: Callable[[Any, str], AsyncIterable[str]],
+    ) -> AsyncIterator[str]:
+        """Stream the reply to the last user turn in `turns`.
+
+        `send(chat, message)` streams one chat turn (gemini_text_stream).
+        """
+        if not turns or turns[-1]["role"] != "user":
+            turns = turns + [{"role": "user", "parts": ["Hello"]}]
+        message = turns[-1]["parts"][0]
+
+        self._expire()
+        session = self._sessions.get(session_id) if session_id else None
+        prompt_key = _prompt_key(system_prompt)
+
+        history = turns[:-1]
+        plan = None
+        if self.compactor is not None and session_id:
+            groups = group_turns(history)
+            plan = self.compactor.plan(session_id, [render_exchange(g) for g in groups], path="clm")
+
+        # Reusable when idle, on the same prompt, the transcript only grew
+        # by our reply plus this user turn (or just this turn) after the turn
+        # the chat last saw, and no newer summary is waiting to be swapped in.
+        if (
+            session is not None
+            and session.chat is not None
+            and not session.busy
+            and session.prompt_key == prompt_key
+            and len(turns) - session.synced in (1, 2)
+            and _turn_digest(turns[session.synced - 1]) == session.last
+            and (plan is None or plan.cut <= session.cut)
+        ):
+            chat = session.chat
+            self._sessions.move_to_end(session_id)
+            self.reused += 1
+        else:
+            if plan is not None:
+                history = compacted_history(plan, groups)
+            chat = self.model(system_prompt).start_chat(history=history)
+            self.rebuilt += 1
+            if session_id:
+                # Replaces any entry; an overlapping turn (barge-in) keeps
+                # streaming on the old chat, which is then simply dropped.
+                session = self._put(
+                    session_id,
+                    _Session(prompt_key=prompt_key, chat=chat, cut=plan.cut if plan else 0),
+                )
+
+        if session is not None:
+            session.busy = True
+        synced = (len(turns), _turn_digest(turns[-1]))
+        return self._run(session_id, session, chat, synced, send(chat, message))
+
+    async def _run(
+        self,
+        session_id: Optional[str],
+        session: Optional[_Session],
+        chat: Any,
+        synced: tuple[int, str],
+        tokens: AsyncIterable[str],
+    ) -> AsyncIterator[str]:
+        if session is None:
+            async for token in tokens:
+                yield token
+            return
+
+        finished = False
+        try:
+            async for token in tokens:
+                yield token
+            finished = True
+        finally:
+            session.busy = False
+            session.touched = time.monotonic()
+            if self._sessions.get(session_id) is session:
+                self._sessions.move_to_end(session_id)
+            if session.chat is chat:
+                if finished:
+                    session.synced, session.last = synced
+                else:
+                    # Cut off or failed: the chat's history is unreliable.
+                    session.chat = None
+
+    def _put(self, session_id: str, session: _Session) -> _Session:
+        session.touched = time.monotonic()
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def _expire(self) -> None:
+        """Drop sessions idle past the TTL (oldest-touched first)."""
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.touched >= cutoff:
+                break
+            del self._sessions[session_id]
+
+
+def _prompt_key(system_prompt: str) -> str:
+    return hashlib.sha1(system_prompt.encode()).hexdigest()
+
+
+def _turn_digest(turn: dict) -> str:
+    parts = "\0".join(map(str, turn["parts"]))
+    return hashlib.sha1(f"{turn['role']}\0{parts}".encode()).hexdigest()
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# src.agent builds its Gemini models lazily, but reads the key at import.
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.catalog import AgencyCatalog  # noqa: E402
+
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def agency(id: int, **fields) -> dict:
+    """A `companies` row as the catalog queries return it."""
+    row = {
+        "id": id,
+        "slug": f"agency-{id}",
+        "name": f"Agency {id}",
+        "description": "B2B demand generation agency.",
+        "overview": "",
+        "headquarters": "London, UK",
+        "logo_url": None,
+        "website": f"https://agency-{id}.example.com",
+        "specializations": ["Demand Generation"],
+        "service_areas": ["UK"],
+        "key_services": [],
+        "global_rank": id,
+        "founded_year": 2015,
+        "employee_count": "11-50",
+        "pricing_model": "retainer",
+        "min_budget": 5000,
+        "avg_rating": 4.5,
+        "review_count": 10,
+        "status": "published",
+        "updated_at": EPOCH + timedelta(minutes=id),
+    }
+    row.update(fields)
+    return row
+
+
+class RowsPool:
+    """Answers the catalog's prepared queries from a list of rows."""
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.calls: list[tuple[str, list]] = []
+
+    async def fetch_prepared(self, name, query, params=None):
+        params = list(params or [])
+        self.calls.append((name, params))
+        published = sorted((r for r in self.rows if r["status"] == "published"), key=lambda r: r["id"])
+        if name == "gtm_catalog_first_page":
+            return [dict(r) for r in published[:params[0]]]
+        if name == "gtm_catalog_next_page":
+            after, limit = params
+            return [dict(r) for r in published if r["id"] > after][:limit]
+        if name == "gtm_catalog_changed":
+            return [dict(r) for r in self.rows if r["updated_at"] > params[0]]
+        raise AssertionError(f"unexpected query {name}")
+
+
+def loaded_catalog(rows: list[dict], page_size: int = 1000) -> AgencyCatalog:
+    catalog = AgencyCatalog(RowsPool(rows), page_size=page_size)
+    asyncio.run(catalog.load())
+    return catalog
+
+
+@pytest.fixture
+def agencies() -> list[dict]:
+    return [
+        agency(1, name="Pipeline Partners", specializations=["Demand Generation", "ABM"],
+               description="ABM and demand generation for enterprise SaaS.", min_budget=15000),
+        agency(2, name="Growth Loop", headquarters="San Francisco, CA", service_areas=["US"],
+               specializations=["PLG", "Product Marketing"], description="Product-led growth for startups.",
+               min_budget=3000),
+        agency(3, name="Signal Room", headquarters="New York, NY", service_areas=["US", "EMEA"],
+               specializations=["Sales Development", "RevOps"], description="Outbound SDR teams for fintech.",
+               min_budget=8000),
+        agency(4, name="Content Forge", specializations=["Content Marketing", "SEO"],
+               description="SEO and content for developer tools.", global_rank=None, min_budget=None),
+        agency(5, name="Draft Agency", status="draft"),
+    ]
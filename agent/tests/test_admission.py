@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from src.admission import AdmissionController, Overloaded
+
+
+async def _waiter(controller, priority, order, timeout=None):
+    await controller.acquire(priority, timeout)
+    order.append(priority)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_admits_up_to_the_limit():
+    async def scenario():
+        controller = AdmissionController("test", limit=2, max_queue=2)
+        await controller.acquire()
+        await controller.acquire()
+        assert controller.in_flight == 2
+        controller.release()
+        controller.release()
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiters_are_granted_in_priority_order():
+    async def scenario():
+        controller = AdmissionController("test", limit=1, max_queue=4)
+        await controller.acquire("chat")
+        order = []
+        tasks = [
+            asyncio.create_task(_waiter(controller, priority, order))
+            for priority in ["background", "chat", "voice"]
+        ]
+        await _settle()
+        assert controller.queued == 3
+        for _ in tasks:
+            controller.release()
+            await _settle()
+        await asyncio.gather(*tasks)
+        assert order == ["voice", "chat", "background"]
+        assert controller.in_flight == 1 and controller.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_displaces_the_newest_lowest_priority_waiter():
+    async def scenario():
+        controller = AdmissionController("test", limit=1, max_queue=2)
+        await controller.acquire("chat")
+        order = []
+        first = asyncio.create_task(_waiter(controller, "background", order))
+        await _settle()
+        second = asyncio.create_task(_waiter(controller, "background", order))
+        await _settle()
+        voice = asyncio.create_task(_waiter(controller, "voice", order))
+        await _settle()
+
+        with pytest.raises(Overloaded) as excinfo:
+            await second
+        assert excinfo.value.reason == "displaced"
+        assert controller.queued == 2
+
+        controller.release()
+        await _settle()
+        controller.release()
+        await asyncio.gather(voice, first)
+        assert order == ["voice", "background"]
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_a_call_that_does_not_outrank():
+    async def scenario():
+        controller = AdmissionController("test", limit=1, max_queue=1)
+        await controller.acquire("chat")
+        waiter = asyncio.create_task(controller.acquire("voice"))
+        await _settle()
+        assert controller.saturated
+        with pytest.raises(Overloaded) as excinfo:
+            await controller.acquire("chat")
+        assert excinfo.value.reason == "queue_full"
+        controller.release()
+        await waiter
+        controller.release()
+        assert controller.in_flight == 0 and controller.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_timeout_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController("test", limit=1, max_queue=2)
+        await controller.acquire()
+        with pytest.raises(Overloaded) as excinfo:
+            await controller.acquire("chat", timeout=0.01)
+        assert excinfo.value.reason == "timeout"
+        assert controller.queued == 0
+        controller.release()
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_releases_on_error():
+    async def scenario():
+        controller = AdmissionController("test", limit=1, max_queue=1)
+        with pytest.raises(RuntimeError):
+            async with controller.slot("chat"):
+                raise RuntimeError("boom")
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
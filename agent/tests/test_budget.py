@@ -0,0 +1,80 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.budget import CHANNELS, STRATEGY_SCALES, STRATEGY_WEIGHTS, allocate_budget, solve_allocation
+
+
+@pytest.mark.parametrize("strategy_type", ["plg", "sales_led", "hybrid", None, "something else"])
+@pytest.mark.parametrize("stage", ["pre_seed", "seed", "series_a", "growth", "enterprise", None])
+@pytest.mark.parametrize("total", [0.01, 99.99, 1_000, 5_000, 12_345.67, 250_000])
+def test_amounts_and_percentages_sum_exactly(strategy_type, stage, total):
+    allocation = allocate_budget(total, strategy_type, stage)
+    assert allocation.total == round(total, 2)
+    cents = sum(round(c["amount"] * 100) for c in allocation.categories)
+    tenths = sum(round(c["percentage"] * 10) for c in allocation.categories)
+    assert cents == round(total * 100)
+    assert tenths == 1000
+    assert all(c["amount"] > 0 for c in allocation.categories)
+    assert {c["name"] for c in allocation.categories} <= set(CHANNELS)
+
+
+def test_categories_are_sorted_by_amount():
+    amounts = [c["amount"] for c in allocate_budget(50_000, "hybrid", "series_b").categories]
+    assert amounts == sorted(amounts, reverse=True)
+
+
+def test_small_channels_are_dropped():
+    allocation = allocate_budget(5_000, "sales_led", "seed")
+    assert all(c["percentage"] >= 2.0 for c in allocation.categories)
+    assert allocation.categories[0]["name"] == "Outbound & SDRs"
+
+
+def test_motion_decides_the_lead_channel():
+    plg = allocate_budget(5_000, "plg", "seed").categories[0]["name"]
+    sales = allocate_budget(5_000, "sales_led", "seed").categories[0]["name"]
+    assert plg != sales
+    assert sales == "Outbound & SDRs"
+
+
+def test_defaults_for_unknown_inputs():
+    allocation = allocate_budget(10_000, "unknown", "unknown")
+    assert (allocation.strategy_type, allocation.stage) == ("hybrid", "seed")
+
+
+@pytest.mark.parametrize("total", [0, -100, 0.004, float("nan"), float("inf"), float("-inf")])
+def test_unusable_budget_is_rejected(total):
+    with pytest.raises(ValueError, match="must be positive"):
+        allocate_budget(total)
+
+
+def test_one_cent_is_split():
+    allocation = allocate_budget(0.006, "plg")
+    assert allocation.total == 0.01
+    assert [c["amount"] for c in allocation.categories] == [0.01]
+
+
+@pytest.mark.parametrize("total", [0.004, float("nan"), float("inf")])
+def test_breakdown_tool_refuses_unusable_budgets(total):
+    from types import SimpleNamespace
+
+    from src import agent
+
+    state = agent.AppState()
+    ctx = SimpleNamespace(deps=SimpleNamespace(state=state, thread_id=None))
+    result = asyncio.run(agent.generate_budget_breakdown(ctx, total_budget=total))
+    assert result["success"] is False
+    assert state.budget is None and state.budget_breakdown is None
+
+
+def test_solver_matches_the_budget_and_equalizes_marginals():
+    weights, scales = STRATEGY_WEIGHTS["hybrid"], STRATEGY_SCALES["hybrid"]
+    spend = solve_allocation(weights, scales, 20_000)
+    assert spend.sum() == pytest.approx(20_000)
+    assert (spend >= 0).all()
+    funded = spend > 0
+    marginals = weights[funded] / (scales[funded] + spend[funded])
+    assert np.allclose(marginals, marginals[0])
+    # Unfunded channels don't pay off even at zero spend.
+    assert (weights[~funded] / scales[~funded] <= marginals[0] + 1e-12).all()
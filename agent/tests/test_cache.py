@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+
+from src.cache import ResultCache
+
+
+class Source:
+    def __init__(self):
+        self.version = 1
+        self.loads = 0
+
+    async def load(self, value="value", delay: float = 0.0):
+        self.loads += 1
+        await asyncio.sleep(delay)
+        return f"{value}-{self.version}"
+
+
+def test_hit_after_miss():
+    source = Source()
+
+    async def scenario():
+        cache = ResultCache("test")
+        first = await cache.get_or_load("k", lambda: source.version, source.load)
+        second = await cache.get_or_load("k", lambda: source.version, source.load)
+        return first, second, cache.stats()
+
+    first, second, stats = asyncio.run(scenario())
+    assert first == second == "value-1"
+    assert source.loads == 1
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_new_version_invalidates():
+    source = Source()
+
+    async def scenario():
+        cache = ResultCache("test")
+        await cache.get_or_load("k", lambda: source.version, source.load)
+        source.version = 2
+        return await cache.get_or_load("k", lambda: source.version, source.load)
+
+    assert asyncio.run(scenario()) == "value-2"
+    assert source.loads == 2
+
+
+def test_ttl_expires(monkeypatch):
+    source = Source()
+    now = [100.0]
+    monkeypatch.setattr("src.cache.time.monotonic", lambda: now[0])
+
+    async def scenario():
+        cache = ResultCache("test", ttl=10)
+        await cache.get_or_load("k", lambda: source.version, source.load)
+        now[0] += 5
+        await cache.get_or_load("k", lambda: source.version, source.load)
+        now[0] += 10
+        await cache.get_or_load("k", lambda: source.version, source.load)
+
+    asyncio.run(scenario())
+    assert source.loads == 2
+
+
+def test_lru_eviction():
+    source = Source()
+
+    async def scenario():
+        cache = ResultCache("test", max_entries=2)
+        for key in ["a", "b", "a", "c"]:
+            await cache.get_or_load(key, lambda: source.version, lambda key=key: source.load(key))
+        return cache
+
+    cache = asyncio.run(scenario())
+    assert len(cache) == 2 and cache.evictions == 1
+    # "b" was least recently used.
+    assert set(cache._entries) == {"a", "c"}
+
+
+def test_concurrent_misses_share_one_load():
+    source = Source()
+
+    async def scenario():
+        cache = ResultCache("test")
+        results = await asyncio.gather(*(
+            cache.get_or_load("k", lambda: source.version, lambda: source.load(delay=0.01)) for _ in range(5)
+        ))
+        return results, cache
+
+    results, cache = asyncio.run(scenario())
+    assert results == ["value-1"] * 5
+    assert source.loads == 1 and cache.coalesced == 4
+
+
+def test_cancelling_the_first_caller_does_not_fail_the_rest():
+    source = Source()
+
+    async def scenario():
+        cache = ResultCache("test")
+        load = lambda: source.load(delay=0.02)  # noqa: E731
+        first = asyncio.create_task(cache.get_or_load("k", lambda: source.version, load))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_load("k", lambda: source.version, load))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(scenario()) == ("value-1", True)
+    assert source.loads == 1
+
+
+def test_not_stored_if_the_source_changed_during_the_load():
+    source = Source()
+
+    async def load():
+        source.version = 2
+        return "built-from-1"
+
+    async def scenario():
+        cache = ResultCache("test")
+        value = await cache.get_or_load("k", lambda: source.version, load)
+        return value, len(cache)
+
+    assert asyncio.run(scenario()) == ("built-from-1", 0)
+
+
+def test_errors_are_not_cached():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    async def scenario():
+        cache = ResultCache("test")
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load("k", lambda: 1, load)
+        return await cache.get_or_load("k", lambda: 1, load)
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_search_rankings_are_cached_per_catalog_generation(monkeypatch, agencies):
+    from conftest import agency, loaded_catalog
+    from src import agent
+    from src.matching import AgencyMatcher
+    from src.prefetch import Profile
+
+    catalog = loaded_catalog(agencies)
+    matcher = AgencyMatcher(catalog)
+    ranks = []
+    original = matcher.rank_in_thread
+
+    async def counted(**query):
+        ranks.append(query)
+        return await original(**query)
+
+    monkeypatch.setattr(matcher, "rank_in_thread", counted)
+    monkeypatch.setattr(agent, "catalog", catalog)
+    monkeypatch.setattr(agent, "matcher", matcher)
+    monkeypatch.setattr(agent, "search_cache", ResultCache("agency_search"))
+    profile = Profile(industry="fintech", strategy_type="sales_led")
+
+    async def scenario():
+        first, _ = await agent.rank_agencies(profile, None, None, 3, None)
+        again, _ = await agent.rank_agencies(profile, None, None, 3, None)
+        assert again is first and len(ranks) == 1
+        await agent.rank_agencies(profile, "London", None, 3, None)
+        assert len(ranks) == 2
+        catalog._apply([agency(6, name="New Shop")])
+        fresh, _ = await agent.rank_agencies(profile, None, None, 3, None)
+        assert len(ranks) == 3
+        return first, fresh
+
+    first, fresh = asyncio.run(scenario())
+    assert first[0].key[0] + 1 == fresh[0].key[0]
@@ -0,0 +1,144 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import RowsPool, agency, loaded_catalog
+from src.catalog import RANK_KEY_TYPES, InvalidCursor, decode_cursor, encode_cursor, rank_key
+from src.matching import MATCH_KEY_TYPES
+
+
+def test_cursor_round_trip():
+    key = (False, 3, "Signal Room", "agency-3")
+    assert decode_cursor(encode_cursor(key), RANK_KEY_TYPES) == key
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64 !!",
+    encode_cursor([]),
+    encode_cursor([False, 3, "Signal Room"]),
+    # Well-formed JSON, wrong element types for a rank key.
+    encode_cursor([False, "3", "Signal Room", "agency-3"]),
+    encode_cursor([[1], 3, "Signal Room", "agency-3"]),
+    encode_cursor([None, 3, "Signal Room", "agency-3"]),
+    # A search cursor handed to the listing.
+    encode_cursor([4, "abcdef0123456789", 0.75, 12]),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, RANK_KEY_TYPES)
+
+
+def test_match_key_cursor_shape():
+    assert decode_cursor(encode_cursor([4, "abcdef0123456789", 0.75, 12]), MATCH_KEY_TYPES)[2] == 0.75
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor([4, "abcdef0123456789", "0.75", 12]), MATCH_KEY_TYPES)
+
+
+def test_top_pages_by_keyset(agencies):
+    catalog = loaded_catalog(agencies)
+    first = catalog.top(2)
+    assert [r["slug"] for r in first] == ["agency-1", "agency-2"]
+    after = decode_cursor(encode_cursor(rank_key(first[-1])), RANK_KEY_TYPES)
+    # Unranked agencies (agency-4) are left out of the top listing.
+    assert [r["slug"] for r in catalog.top(2, after)] == ["agency-3"]
+
+
+def test_get_top_agencies_reports_a_bad_cursor(monkeypatch, agencies):
+    from src import agent
+
+    monkeypatch.setattr(agent, "catalog", loaded_catalog(agencies))
+    ctx = SimpleNamespace(deps=SimpleNamespace(state=agent.AppState(), thread_id=None))
+    # Used to reach bisect as a str/int comparison and come back as a database error.
+    bad = encode_cursor([False, "3", "Signal Room", "agency-3"])
+    result = asyncio.run(agent.get_top_agencies(ctx, limit=2, cursor=bad))
+    assert result["success"] is False
+    assert result["message"] == "That cursor isn't valid. Call again without a cursor."
+
+    page = asyncio.run(agent.get_top_agencies(ctx, limit=2))
+    assert [a["slug"] for a in page["agencies"]] == ["agency-1", "agency-2"]
+    rest = asyncio.run(agent.get_top_agencies(ctx, limit=2, cursor=page["next_cursor"]))
+    assert [a["slug"] for a in rest["agencies"]] == ["agency-3"] and rest["next_cursor"] is None
+
+
+def test_load_reads_keyset_pages(agencies):
+    catalog = loaded_catalog(agencies, page_size=2)
+    assert catalog.pool.calls == [
+        ("gtm_catalog_first_page", [2]),
+        ("gtm_catalog_next_page", [2, 2]),
+        ("gtm_catalog_next_page", [4, 2]),
+    ]
+    assert sorted(catalog.rows) == ["agency-1", "agency-2", "agency-3", "agency-4"]
+    assert catalog.ranked == ["agency-1", "agency-2", "agency-3", "agency-4"]
+    assert catalog.watermark == agencies[3]["updated_at"]
+    assert catalog.generation == 1
+
+
+def test_short_last_page_ends_the_load(agencies):
+    catalog = loaded_catalog(agencies[:3], page_size=2)
+    assert [name for name, _ in catalog.pool.calls] == ["gtm_catalog_first_page", "gtm_catalog_next_page"]
+    assert len(catalog) == 3
+
+
+def test_ratings_from_numeric_columns_become_floats():
+    from decimal import Decimal
+
+    catalog = loaded_catalog([agency(1, avg_rating=Decimal("4.7"))])
+    assert type(catalog.get("agency-1")["avg_rating"]) is float
+
+
+def test_refresh_applies_changes_since_the_watermark(agencies):
+    from src.catalog import WATERMARK_OVERLAP
+
+    catalog = loaded_catalog(agencies)
+    watermark = catalog.watermark
+    later = watermark + timedelta(minutes=1)
+    agencies[1].update(name="Growth Loop Studio", updated_at=later)
+    agencies[2].update(status="draft", updated_at=later)
+    agencies.append(agency(6, name="New Shop", updated_at=later))
+
+    # Plus the overlap window (agency-4) and the draft, which stays out.
+    assert asyncio.run(catalog.refresh()) == 5
+    assert catalog.pool.calls[-1] == ("gtm_catalog_changed", [watermark - WATERMARK_OVERLAP])
+    assert catalog.get("agency-2")["name"] == "Growth Loop Studio"
+    assert catalog.get("agency-3") is None
+    assert "agency-6" in catalog.ranked and "agency-3" not in catalog.ranked
+    assert catalog.match_location("New York") == set()
+    assert (catalog.watermark, catalog.generation) == (later, 2)
+
+
+def test_overlap_rereads_do_not_bump_the_generation(agencies):
+    catalog = loaded_catalog(agencies)
+    # The overlap window returns the newest row again, unchanged, and the draft.
+    assert asyncio.run(catalog.refresh()) == 2
+    assert catalog.generation == 1
+
+
+def test_refresh_before_load_does_a_full_load(agencies):
+    from src.catalog import AgencyCatalog
+
+    catalog = AgencyCatalog(RowsPool(agencies))
+    assert asyncio.run(catalog.refresh()) == 4
+    assert catalog.pool.calls[0][0] == "gtm_catalog_first_page"
+
+
+def test_concurrent_first_use_shares_one_load(agencies):
+    from src.catalog import AgencyCatalog
+
+    catalog = AgencyCatalog(RowsPool(agencies))
+
+    async def scenario():
+        await asyncio.gather(*(catalog.ensure_loaded() for _ in range(5)))
+
+    asyncio.run(scenario())
+    assert len(catalog.pool.calls) == 1
+
+
+def test_location_matches_headquarters_and_service_areas(agencies):
+    catalog = loaded_catalog(agencies)
+    assert catalog.match_location("new york") == {"agency-3"}
+    assert catalog.match_location("Lond") == {"agency-1", "agency-4"}
+    assert catalog.match_location("emea") == {"agency-3"}
+    assert catalog.match_location("Paris") == set()
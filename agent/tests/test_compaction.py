@@ -0,0 +1,119 @@
+import asyncio
+
+from src.compaction import HistoryCompactor, extractive_summary
+from src.metrics import HISTORY_TOKENS_SAVED
+
+LONG = "word " * 200  # ~250 estimated tokens per turn
+
+
+def turns(n: int) -> list[str]:
+    return [f"User: turn {i}\nAssistant: {LONG}" for i in range(n)]
+
+
+async def fake_summarize(previous, new_turns, max_words):
+    return f"summary of {len(new_turns)} turns" + (f" after [{previous}]" if previous else "")
+
+
+def compactor(**kwargs) -> HistoryCompactor:
+    options = {"keep_turns": 2, "trigger_tokens": 500, "summary_tokens": 50, "batch_turns": 2}
+    return HistoryCompactor(fake_summarize, **{**options, **kwargs})
+
+
+async def settle(c: HistoryCompactor):
+    await asyncio.gather(*c._tasks.values())
+
+
+def saved(path: str) -> float:
+    return HISTORY_TOKENS_SAVED._series.get((path,), 0)
+
+
+def test_short_histories_are_left_alone():
+    async def scenario():
+        c = compactor()
+        return c.plan("t", turns(2)), c.plan("t", ["short"] * 5), c.plan("", turns(10)), len(c._tasks)
+
+    assert asyncio.run(scenario()) == (None, None, None, 0)
+
+
+def test_summary_replaces_all_but_the_last_turns():
+    async def scenario():
+        c = compactor()
+        history = turns(6)
+        # Nothing ready yet: the history goes out as-is while a summary is written.
+        assert c.plan("t", history) is None
+        await settle(c)
+        return c.plan("t", history, facts="company: Acme")
+
+    plan = asyncio.run(scenario())
+    assert plan.cut == 4
+    assert plan.block == "Summary of the earlier conversation: summary of 4 turns\n\nKnown facts: company: Acme"
+    assert plan.tokens_saved > 900
+
+
+def test_summary_rolls_forward_in_batches():
+    async def scenario():
+        c = compactor()
+        c.plan("t", turns(6))
+        await settle(c)
+        c.plan("t", turns(7))
+        assert not c._tasks  # one turn aged out: below batch_turns
+        c.plan("t", turns(8))
+        await settle(c)
+        return c.plan("t", turns(8))
+
+    plan = asyncio.run(scenario())
+    assert plan.cut == 6
+    assert "summary of 2 turns after [summary of 4 turns]" in plan.block
+
+
+def test_edited_history_starts_over():
+    async def scenario():
+        c = compactor()
+        c.plan("t", turns(6))
+        await settle(c)
+        edited = turns(6)
+        edited[3] = "User: something else entirely\nAssistant: " + LONG
+        assert c.plan("t", edited) is None
+        await settle(c)
+        return c.plan("t", edited)
+
+    assert asyncio.run(scenario()).cut == 4
+
+
+def test_tokens_saved_is_counted_once_per_user_turn():
+    async def scenario():
+        c = compactor()
+        history = turns(6)
+        c.plan("t", history, path="test_once")
+        await settle(c)
+        before = saved("test_once")
+        # One run: the processor sees the same turns on every model request.
+        plans = [c.plan("t", history, path="test_once") for _ in range(4)]
+        after_run = saved("test_once")
+        c.plan("t", turns(7), path="test_once")
+        return before, plans[0].tokens_saved, after_run, saved("test_once")
+
+    before, per_turn, after_run, after_next = asyncio.run(scenario())
+    assert after_run - before == per_turn
+    assert after_next > after_run
+
+
+def test_failed_summaries_fall_back_to_extracts():
+    async def failing(previous, new_turns, max_words):
+        raise RuntimeError("model unavailable")
+
+    async def scenario():
+        c = compactor()
+        c.summarize = failing
+        c.plan("t", turns(6))
+        await settle(c)
+        return c.plan("t", turns(6))
+
+    assert asyncio.run(scenario()).block.startswith("Summary of the earlier conversation: User: turn")
+
+
+def test_extractive_summary_keeps_the_newest_within_budget():
+    text = extractive_summary("old summary", ["one two three", "four five"], max_words=4)
+    assert text == "four five"
+    assert extractive_summary(None, ["one two three four five six"], max_words=3) == "one two three"
+    assert extractive_summary(None, ["a b", "c d"], max_words=10) == "a b c d"
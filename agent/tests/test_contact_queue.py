@@ -0,0 +1,199 @@
+import asyncio
+import json
+
+from src.contact_queue import ContactQueue, Submission, idempotency_key
+
+
+class FakePool:
+    """Stands in for db: records inserted keys, optionally failing first."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.rows: dict[str, list] = {}
+
+    async def fetch_all(self, query, params):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        if any("\x00" in (p or "") for p in params if isinstance(p, str)):
+            # What psycopg2 raises for a NUL byte in a string parameter.
+            raise ValueError("A string literal cannot contain NUL (0x00) characters.")
+        inserted = []
+        for i in range(0, len(params), 6):
+            key = params[i + 5]
+            if key not in self.rows:
+                self.rows[key] = params[i:i + 5]
+                inserted.append({"idempotency_key": key})
+        return inserted
+
+
+def queue(pool, path) -> ContactQueue:
+    return ContactQueue(pool, str(path), batch_size=2, flush_interval=0.0, max_backoff=0.01, drain_timeout=1.0)
+
+
+def submission(n: int, session: str = "s1") -> Submission:
+    return Submission.create(session, f"Person {n}", f"person{n}@example.com", "Acme", f"Request {n}")
+
+
+def spool_lines(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+async def _wait_for(condition, timeout: float = 2.0):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.005)
+
+
+def test_idempotency_key_ignores_case_and_spacing():
+    assert idempotency_key("A@x.com ", "s", "Acme  Inc", "Call me") == idempotency_key("a@x.com", "s", "acme inc", "call  me")
+    assert idempotency_key("a@x.com", "s", "Acme", "Call me") != idempotency_key("a@x.com", "s", "Acme", "Pricing")
+    assert idempotency_key("a@x.com", None) != idempotency_key("a@x.com", None)
+
+
+def test_submissions_are_spooled_then_written(tmp_path):
+    spool = tmp_path / "contacts.jsonl"
+    pool = FakePool()
+
+    async def scenario():
+        q = queue(pool, spool)
+        statuses = [await q.submit(submission(n)) for n in range(3)]
+        statuses.append(await q.submit(submission(0)))
+        assert len(spool_lines(spool)) == 3
+        q.start()
+        await _wait_for(lambda: len(pool.rows) == 3 and not len(q))
+        await q.close()
+        return statuses
+
+    assert asyncio.run(scenario()) == ["queued"] * 3 + ["duplicate"]
+    assert len(pool.rows) == 3
+    # Compacted once everything was acknowledged.
+    assert spool.read_text() == ""
+
+
+def test_unacked_records_are_replayed_on_start(tmp_path):
+    spool = tmp_path / "contacts.jsonl"
+    first, second, third = submission(1), submission(2), submission(3)
+    with open(spool, "w") as f:
+        for s in (first, second, third):
+            f.write(json.dumps(s.__dict__) + "\n")
+        f.write(json.dumps({"ack": first.key}) + "\n")
+        f.write('{"key": "torn')
+    pool = FakePool()
+
+    async def scenario():
+        q = queue(pool, spool)
+        q.start()
+        await _wait_for(lambda: len(pool.rows) == 2 and not len(q))
+        await q.close()
+
+    asyncio.run(scenario())
+    assert set(pool.rows) == {second.key, third.key}
+    assert spool.read_text() == ""
+
+
+def test_failed_batches_stay_spooled_and_retry(tmp_path):
+    spool = tmp_path / "contacts.jsonl"
+    pool = FakePool(failures=2)
+
+    async def scenario():
+        q = queue(pool, spool)
+        q.start()
+        await q.submit(submission(1))
+        await _wait_for(lambda: pool.failures == 0)
+        await _wait_for(lambda: not len(q))
+        await q.close()
+
+    asyncio.run(scenario())
+    assert list(pool.rows) == [submission(1).key]
+
+
+def test_leftovers_survive_a_restart(tmp_path):
+    spool = tmp_path / "contacts.jsonl"
+    down = FakePool(failures=10**6)
+
+    async def first_run():
+        q = ContactQueue(down, str(spool), flush_interval=60.0, drain_timeout=0.05)
+        q.start()
+        assert await q.submit(submission(1)) == "queued"
+        assert await q.submit(submission(2)) == "queued"
+        await q.close()
+
+    asyncio.run(first_run())
+    assert [r["key"] for r in spool_lines(spool)] == [submission(1).key, submission(2).key]
+
+    up = FakePool()
+
+    async def second_run():
+        q = queue(up, spool)
+        q.start()
+        await _wait_for(lambda: len(up.rows) == 2 and not len(q))
+        await q.close()
+
+    asyncio.run(second_run())
+    assert set(up.rows) == {submission(1).key, submission(2).key}
+
+
+def test_without_a_spool_path_inserts_directly():
+    pool = FakePool()
+
+    async def scenario():
+        q = ContactQueue(pool, None)
+        q.start()
+        statuses = [await q.submit(submission(1)), await q.submit(submission(1))]
+        await q.close()
+        return statuses
+
+    assert asyncio.run(scenario()) == ["saved", "duplicate"]
+    assert len(pool.rows) == 1
+
+
+def test_a_poison_record_is_dead_lettered_without_blocking_the_rest(tmp_path):
+    spool = tmp_path / "contacts.jsonl"
+    pool = FakePool()
+    poison = Submission.create("s1", "Bad", "bad@example.com", "Acme", "nul\x00byte")
+
+    async def scenario():
+        q = ContactQueue(pool, str(spool), batch_size=10, flush_interval=0.0, max_backoff=0.01, max_attempts=3)
+        for s in (submission(1), poison, submission(2)):
+            await q.submit(s)
+        q.start()
+        await _wait_for(lambda: not len(q))
+        await q.close()
+
+    asyncio.run(scenario())
+    assert set(pool.rows) == {submission(1).key, submission(2).key}
+    dead = spool_lines(tmp_path / "contacts.jsonl.dead")
+    assert [r["key"] for r in dead] == [poison.key]
+    assert "NUL" in dead[0]["error"]
+    # Acked, so a restart doesn't replay it.
+    assert spool.read_text() == ""
+
+
+def test_database_outages_are_not_dead_lettered(tmp_path):
+    spool = tmp_path / "contacts.jsonl"
+    pool = FakePool(failures=6)
+
+    async def scenario():
+        q = ContactQueue(pool, str(spool), batch_size=10, flush_interval=0.0, max_backoff=0.01, max_attempts=2)
+        for n in range(3):
+            await q.submit(submission(n))
+        q.start()
+        await _wait_for(lambda: not len(q))
+        await q.close()
+
+    asyncio.run(scenario())
+    assert len(pool.rows) == 3
+    assert not (tmp_path / "contacts.jsonl.dead").exists()
+
+
+def test_unusable_spool_falls_back_to_a_direct_insert(tmp_path):
+    pool = FakePool()
+
+    async def scenario():
+        # A directory can't be opened for appending.
+        q = ContactQueue(pool, str(tmp_path))
+        return [await q.submit(submission(1)), await q.submit(submission(1))]
+
+    assert asyncio.run(scenario()) == ["saved", "duplicate"]
+    assert len(pool.rows) == 1
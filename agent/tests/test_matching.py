@@ -0,0 +1,142 @@
+import asyncio
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import agency, loaded_catalog
+from src.catalog import InvalidCursor, encode_cursor
+from src.matching import AgencyMatcher, pricing_tier, words
+
+
+def slugs(matches):
+    return [m.row["slug"] for m in matches]
+
+
+@pytest.mark.parametrize("min_budget, tier", [
+    (None, "mid"), (0, "mid"), (3000, "budget"), (5000, "mid"), (20000, "premium"),
+])
+def test_pricing_tier(min_budget, tier):
+    assert pricing_tier(min_budget) == tier
+
+
+def test_words_drop_stopwords_and_short_tokens():
+    assert words("B2B SaaS marketing for the AI-first companies") == ["b2b", "saas", "ai-first"]
+
+
+def test_scores_are_normalized_and_sorted(agencies):
+    matches, exact = AgencyMatcher(loaded_catalog(agencies)).rank(limit=10)
+    assert exact
+    assert slugs(matches) == ["agency-1", "agency-2", "agency-3", "agency-4"]  # drafts are not in the catalog
+    scores = [m.score for m in matches]
+    assert scores == sorted(scores, reverse=True)
+    assert all(0.0 <= s <= 1.0 for s in scores)
+    assert set(matches[0].signals) == {"rating", "rank"}
+
+
+def test_specialization_and_location_filter(agencies):
+    matcher = AgencyMatcher(loaded_catalog(agencies))
+    matches, exact = matcher.rank(specialization="abm")
+    assert (slugs(matches), exact) == (["agency-1"], True)
+    matches, exact = matcher.rank(location="New York")
+    assert (slugs(matches), exact) == (["agency-3"], True)
+    # Service areas count as locations too.
+    assert set(slugs(matcher.rank(location="US")[0])) == {"agency-2", "agency-3"}
+
+
+def test_no_exact_match_falls_back_to_the_closest(agencies):
+    matcher = AgencyMatcher(loaded_catalog(agencies))
+    matches, exact = matcher.rank(location="Berlin", specialization="PLG", limit=2)
+    assert not exact
+    assert slugs(matches)[0] == "agency-2"  # still the PLG agency
+    assert matches[0].signals["location"] == 0.0
+
+
+def test_profile_signals_pick_the_fitting_agency(agencies):
+    matcher = AgencyMatcher(loaded_catalog(agencies))
+    plg, _ = matcher.rank(stage="seed", industry="startups", strategy_type="plg", limit=1)
+    sales, _ = matcher.rank(industry="fintech", strategy_type="sales_led", budget=9000, limit=1)
+    assert slugs(plg) == ["agency-2"]
+    assert slugs(sales) == ["agency-3"]
+    assert set(sales[0].signals) == {"rating", "rank", "specialization", "context", "budget"}
+
+
+def test_budget_below_the_minimum_scores_lower(agencies):
+    matcher = AgencyMatcher(loaded_catalog(agencies))
+    matches, _ = matcher.rank(budget=5000, limit=10)
+    budget = {m.row["slug"]: m.signals["budget"] for m in matches}
+    assert budget["agency-2"] > budget["agency-3"] > budget["agency-1"]
+    assert budget["agency-4"] == 0.5  # no stated minimum
+
+
+@pytest.mark.parametrize("budget", [0, -100, math.inf, math.nan])
+def test_meaningless_budgets_are_ignored(agencies, budget):
+    matches, _ = AgencyMatcher(loaded_catalog(agencies)).rank(budget=budget)
+    assert "budget" not in matches[0].signals
+
+
+def test_keyset_pages_cover_every_agency_once():
+    catalog = loaded_catalog([agency(i, global_rank=i % 3 or None) for i in range(1, 12)])
+    matcher = AgencyMatcher(catalog)
+    seen, after = [], None
+    while True:
+        page, _ = matcher.rank(strategy_type="plg", limit=3, after=after)
+        if not page:
+            break
+        seen += slugs(page)
+        after = page[-1].key
+    assert sorted(seen) == sorted(catalog.rows)
+
+
+def test_cursor_is_bound_to_the_query_and_generation(agencies):
+    catalog = loaded_catalog(agencies)
+    matcher = AgencyMatcher(catalog)
+    page, _ = matcher.rank(specialization="ABM", limit=1)
+    key = page[0].key
+    with pytest.raises(InvalidCursor):
+        matcher.rank(specialization="PLG", after=key)
+    with pytest.raises(InvalidCursor):
+        matcher.rank(specialization="ABM", after=key[:3])
+
+    catalog.pool.rows[1]["min_budget"] = 2500
+    catalog.pool.rows[1]["updated_at"] = catalog.watermark.replace(year=2027)
+    asyncio.run(catalog.refresh())
+    with pytest.raises(InvalidCursor):
+        matcher.rank(specialization="ABM", after=key)
+
+
+def test_features_are_rebuilt_per_generation(agencies):
+    catalog = loaded_catalog(agencies)
+    matcher = AgencyMatcher(catalog)
+    first = matcher.features()
+    assert matcher.features() is first
+    catalog._apply([agency(6, name="New Agency")])
+    assert matcher.features() is not first
+    assert "agency-6" in matcher.features().index
+
+
+def test_search_tool_reports_a_stale_cursor(monkeypatch, agencies):
+    from src import agent
+    from src.cache import ResultCache
+
+    catalog = loaded_catalog(agencies)
+    monkeypatch.setattr(agent, "catalog", catalog)
+    monkeypatch.setattr(agent, "matcher", AgencyMatcher(catalog))
+    monkeypatch.setattr(agent, "search_cache", ResultCache("agency_search"))
+    ctx = SimpleNamespace(deps=SimpleNamespace(state=agent.AppState(), thread_id=None))
+
+    def search(**kwargs):
+        # When the state changed, the dict comes back inside a ToolReturn.
+        result = asyncio.run(agent.search_agencies(ctx, **kwargs))
+        return getattr(result, "return_value", result)
+
+    first = search(location="UK", max_results=1)
+    assert first["success"] and first["count"] == 1 and first["next_cursor"]
+    second = search(location="UK", max_results=1, cursor=first["next_cursor"])
+    assert second["agencies"][0]["slug"] != first["agencies"][0]["slug"]
+
+    stale = search(location="Paris", max_results=1, cursor=first["next_cursor"])
+    assert stale["success"] is False
+    assert stale["message"] == "That page of results is out of date. Search again without a cursor."
+    bogus = search(cursor=encode_cursor([1, 2, 3, 4]))
+    assert bogus["success"] is False
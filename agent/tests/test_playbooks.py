@@ -0,0 +1,103 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.playbooks import Playbook, PlaybookLibrary, playbooks
+
+
+def playbook(id, strategy, **fields) -> Playbook:
+    return Playbook(
+        id=id, strategy_type=strategy, name=id, summary="{company} sells to {market} in {industry}.",
+        recommended_for=(), action_items=("Talk to {market}",),
+        phases=({"name": "Start", "duration": "Month 1", "activities": ["Plan"], "milestones": ["{unknown}"]},),
+        **fields,
+    )
+
+
+def library(extra=(), notes=None) -> PlaybookLibrary:
+    base = [playbook(f"{s}-any", s) for s in ("plg", "sales_led", "hybrid")]
+    return PlaybookLibrary("test", [*base, *extra], notes)
+
+
+def test_every_motion_resolves_without_stage_or_industry():
+    for strategy in ("plg", "sales_led", "hybrid"):
+        assert playbooks.closest(strategy).strategy_type == strategy
+
+
+@pytest.mark.parametrize("strategy, stage, industry, expected", [
+    ("plg", "Seed", None, "plg-early"),
+    ("Product-Led", "Series B", "SaaS", "plg-scale+saas"),
+    ("sales-led", "seed", "fintech payments", "sales_led-regulated"),
+    ("plg", "series a", "developer tools", "plg-devtools"),
+    ("plg", "growth", "developer tools", "plg-mature+devtools"),
+])
+def test_closest_prefers_industry_then_stage(strategy, stage, industry, expected):
+    assert playbooks.closest(strategy, stage, industry).id == expected
+
+
+def test_unknown_strategy_has_no_playbook():
+    assert playbooks.closest("community") is None
+    assert playbooks.render("community") is None
+
+
+def test_stage_specific_beats_stage_agnostic():
+    lib = library([playbook("plg-seed", "plg", stages=frozenset({"seed"}))])
+    assert lib.closest("plg", "seed").id == "plg-seed"
+    assert lib.closest("plg", "growth").id == "plg-any"
+    assert lib.closest("plg").id == "plg-any"
+
+
+def test_industry_notes_are_merged():
+    notes = {"devtools": {"recommended_for": ["Engineers"], "action_items": ["Write docs"],
+                          "activities": ["Publish quickstarts"]}}
+    merged = library(notes=notes).closest("plg", industry="devtools")
+    assert merged.id == "plg-any+devtools"
+    assert merged.action_items == ("Talk to {market}", "Write docs")
+    assert merged.recommended_for == ("Engineers",)
+    assert merged.phases[0]["activities"] == ["Plan", "Publish quickstarts"]
+
+
+def test_render_fills_placeholders():
+    lib = library()
+    rendered = lib.render("plg", company_name="Acme", target_market="CFOs", industry="fintech")
+    assert rendered.summary == "Acme sells to CFOs in fintech."
+    assert rendered.action_items == ["Talk to CFOs"]
+    # Unknown placeholders are left alone rather than raising.
+    assert rendered.phases[0]["milestones"] == ["{unknown}"]
+    assert rendered.ref == "plg-any@test"
+    assert lib.render("plg").summary == "The company sells to target customers in the industry."
+
+
+def test_library_must_cover_every_motion(tmp_path):
+    path = tmp_path / "playbooks.json"
+    path.write_text(json.dumps({"version": "1", "playbooks": [
+        {"id": "plg", "strategy": "plg", "name": "PLG", "summary": "s"},
+    ]}))
+    with pytest.raises(ValueError, match="sales_led, hybrid"):
+        PlaybookLibrary.load(str(path))
+
+
+def run(tool, state, **kwargs):
+    ctx = SimpleNamespace(deps=SimpleNamespace(state=state, thread_id=None))
+    result = asyncio.run(tool(ctx, **kwargs))
+    return getattr(result, "return_value", result)
+
+
+def test_strategy_and_timeline_tools_start_from_the_playbook():
+    from src.agent import AppState, generate_strategy, generate_timeline
+
+    state = AppState(company_name="Acme", stage="seed", industry="fintech")
+    assert run(generate_timeline, state)["success"] is False
+
+    result = run(generate_strategy, state, strategy_type="Sales-Led", summary="Our own summary.")
+    assert result["playbook"] == f"sales_led-regulated@{playbooks.version}"
+    assert state.strategy.type == "sales_led"
+    assert state.strategy.summary == "Our own summary."
+    assert state.strategy.action_items == playbooks.render("sales_led", "seed", "fintech", "Acme").action_items
+
+    result = run(generate_timeline, state)
+    assert result["success"] and len(state.timeline_phases) == len(result["phases"])
+
+    assert run(generate_strategy, state, strategy_type="community")["success"] is False
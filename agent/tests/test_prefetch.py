@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+from conftest import agency, loaded_catalog
+from src.matching import AgencyMatcher
+from src.prefetch import AgencyPrefetcher, Profile
+
+PROFILE = Profile(industry="fintech", stage="seed", strategy_type="sales_led", budget=8000)
+
+
+def setup(agencies, **kwargs):
+    catalog = loaded_catalog(agencies)
+    matcher = AgencyMatcher(catalog)
+    return catalog, matcher, AgencyPrefetcher(catalog, matcher, **kwargs)
+
+
+def slugs(matches):
+    return [m.row["slug"] for m in matches]
+
+
+def test_prefetched_matches_equal_a_live_ranking(agencies):
+    catalog, matcher, prefetcher = setup(agencies, candidates=3)
+
+    async def scenario():
+        prefetcher.schedule("s1", PROFILE)
+        prefetched = await prefetcher.get("s1", PROFILE, 2)
+        live, _ = matcher.rank(limit=2, **PROFILE.rank_args())
+        return prefetched, live
+
+    prefetched, live = asyncio.run(scenario())
+    assert slugs(prefetched) == slugs(live)
+    assert [m.score for m in prefetched] == [m.score for m in live]
+
+
+def test_scoring_runs_off_the_event_loop(agencies):
+    catalog, matcher, prefetcher = setup(agencies)
+    threads = []
+    rank = matcher._rank
+
+    def recording(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return rank(*args, **kwargs)
+
+    matcher._rank = recording
+
+    async def scenario():
+        prefetcher.schedule("s1", PROFILE)
+        await prefetcher.get("s1", PROFILE, 1)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert threads and loop_thread not in threads
+
+
+def test_misses(agencies):
+    catalog, matcher, prefetcher = setup(agencies, candidates=2)
+
+    async def scenario():
+        prefetcher.schedule("s1", PROFILE)
+        results = {
+            "other profile": await prefetcher.get("s1", Profile(industry="saas"), 1),
+            "over the candidates": await prefetcher.get("s1", PROFILE, 3),
+            "other session": await prefetcher.get("s2", PROFILE, 1),
+            "no session": await prefetcher.get(None, PROFILE, 1),
+            "hit": await prefetcher.get("s1", PROFILE, 1),
+        }
+        catalog._apply([agency(9, name="Newcomer")])
+        results["catalog changed"] = await prefetcher.get("s1", PROFILE, 1)
+        await prefetcher.close()
+        return results
+
+    results = asyncio.run(scenario())
+    assert results.pop("hit")
+    assert all(value is None for value in results.values()), results
+
+
+def test_new_profile_replaces_the_in_flight_prefetch(agencies):
+    catalog, matcher, prefetcher = setup(agencies)
+
+    async def scenario():
+        prefetcher.schedule("s1", PROFILE)
+        first = prefetcher._entries["s1"].task
+        prefetcher.schedule("s1", PROFILE)
+        assert prefetcher._entries["s1"].task is first
+        newer = Profile(industry="devtools", strategy_type="plg")
+        prefetcher.schedule("s1", newer)
+        await asyncio.sleep(0)
+        assert first.cancelled()
+        assert await prefetcher.get("s1", PROFILE, 1) is None
+        return await prefetcher.get("s1", newer, 1)
+
+    assert slugs(asyncio.run(scenario())) == ["agency-2"]
+
+
+def test_sessions_are_bounded(agencies):
+    catalog, matcher, prefetcher = setup(agencies, max_sessions=2)
+
+    async def scenario():
+        for session in ["a", "b", "c"]:
+            prefetcher.schedule(session, PROFILE)
+        prefetcher.schedule(None, PROFILE)
+        keys = list(prefetcher._entries)
+        await prefetcher.close()
+        return keys
+
+    assert asyncio.run(scenario()) == ["b", "c"]
+
+
+def test_rank_in_thread_matches_rank(agencies):
+    catalog, matcher, _ = setup(agencies)
+    queries = [
+        {"location": "London", "strategy_type": "hybrid"},
+        {"specialization": "PLG", "budget": 2500, "stage": "seed"},
+        {"industry": "fintech", "target_market": "mid-market banks"},
+    ]
+    for query in queries:
+        live, live_exact = matcher.rank(limit=3, **query)
+        threaded, threaded_exact = asyncio.run(matcher.rank_in_thread(limit=3, **query))
+        assert [m.key for m in threaded] == [m.key for m in live]
+        assert threaded_exact == live_exact
@@ -0,0 +1,52 @@
+from src.agent import Provider, upsert_provider
+
+
+def provider(slug: str, score) -> Provider:
+    return Provider(id=slug, name=slug.title(), slug=slug, type="agency", match_score=score)
+
+
+def test_adds_up_to_the_limit_in_order():
+    providers = {}
+    for slug, score in [("a", 0.2), ("b", 0.9), ("c", 0.5)]:
+        assert upsert_provider(providers, provider(slug, score), limit=3)
+    assert list(providers) == ["a", "b", "c"]
+
+
+def test_drops_the_weakest_past_the_limit():
+    providers = {}
+    for slug, score in [("a", 0.2), ("b", 0.9), ("c", 0.5)]:
+        upsert_provider(providers, provider(slug, score), limit=3)
+    assert upsert_provider(providers, provider("d", 0.7), limit=3)
+    assert list(providers) == ["b", "c", "d"]
+
+
+def test_rejects_a_provider_below_the_cut():
+    providers = {}
+    for slug, score in [("a", 0.6), ("b", 0.9)]:
+        upsert_provider(providers, provider(slug, score), limit=2)
+    assert not upsert_provider(providers, provider("c", 0.1), limit=2)
+    assert list(providers) == ["a", "b"]
+
+
+def test_oldest_gives_way_on_ties():
+    providers = {}
+    for slug in ["a", "b"]:
+        upsert_provider(providers, provider(slug, 0.5), limit=2)
+    assert upsert_provider(providers, provider("c", 0.5), limit=2)
+    assert list(providers) == ["b", "c"]
+
+
+def test_missing_score_counts_as_zero():
+    providers = {}
+    upsert_provider(providers, provider("a", None), limit=1)
+    assert upsert_provider(providers, provider("b", 0.1), limit=1)
+    assert list(providers) == ["b"]
+
+
+def test_replacing_keeps_position():
+    providers = {}
+    for slug, score in [("a", 0.2), ("b", 0.9), ("c", 0.5)]:
+        upsert_provider(providers, provider(slug, score), limit=3)
+    assert upsert_provider(providers, provider("a", 0.8), limit=3)
+    assert list(providers) == ["a", "b", "c"]
+    assert providers["a"].match_score == 0.8
@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src import agent
+from src.agent import AppState, Phase, ProviderRecommendation, UseCase
+
+
+def run(tool, state: AppState, **kwargs):
+    """Call a tool; returns its result dict and the STATE_DELTA ops it emitted (None if none)."""
+    ctx = SimpleNamespace(deps=SimpleNamespace(state=state, thread_id=None))
+    result = asyncio.run(tool(ctx, **kwargs))
+    if hasattr(result, "return_value"):
+        return result.return_value, result.metadata.delta
+    return result, None
+
+
+def recommendation(name: str, score: float) -> ProviderRecommendation:
+    return ProviderRecommendation(name=name, provider_type="tool", description=f"{name} CRM", match_score=score)
+
+
+def story(name: str) -> UseCase:
+    return UseCase(company_name=name, industry="SaaS", challenge="Slow pipeline", solution="ABM",
+                   results={"pipeline": "+40%"})
+
+
+@pytest.fixture
+def company() -> AppState:
+    return AppState(company_name="Acme", industry="fintech", stage="series_a", budget=50_000)
+
+
+def test_report_fills_every_section_from_the_playbook(company):
+    result, delta = run(agent.generate_report, company, strategy_type="Sales-Led")
+    assert result["success"]
+    assert company.strategy.type == "sales_led"
+    assert company.roi_projection.estimated_cac == result["estimated_cac"]
+    assert company.budget_breakdown.total == 50_000
+    assert sum(c.amount for c in company.budget_breakdown.categories) == pytest.approx(50_000)
+    assert company.timeline_phases and len(result["phases"]) == len(company.timeline_phases)
+    assert result["message"] == "Added strategy, ROI projection, budget breakdown and timeline to your report."
+    # One STATE_DELTA covering all four sections.
+    touched = {op["path"].split("/")[1] for op in delta}
+    assert {"strategy", "roi_projection", "budget_breakdown", "timeline_phases"} <= touched
+
+
+def test_report_roi_uses_the_new_strategy(company):
+    plg, _ = run(agent.generate_report, company.model_copy(), strategy_type="plg")
+    sales, _ = run(agent.generate_report, company.model_copy(), strategy_type="sales_led")
+    assert plg["estimated_cac"] < sales["estimated_cac"]
+
+
+def test_report_without_a_budget_skips_the_breakdown():
+    state = AppState(stage="seed", industry="SaaS")
+    result, _ = run(agent.generate_report, state, strategy_type="plg")
+    assert result["success"] and result["budget_categories"] == []
+    assert state.budget_breakdown is None and state.budget is None
+    assert result["message"].endswith("Share a monthly budget to add a budget breakdown.")
+
+
+def test_report_with_custom_strategy_and_phases():
+    state = AppState()
+    phases = [Phase(name="Launch", duration="Month 1", activities=["Ship"], milestones=["Live"])]
+    result, _ = run(
+        agent.generate_report, state, strategy_type="community",
+        strategy_name="Community-Led", summary="Grow through the user community.", phases=phases,
+        total_budget=10_000,
+    )
+    assert result["success"] and "playbook" not in result
+    assert (state.strategy.name, state.timeline_phases, state.budget) == ("Community-Led", phases, 10_000)
+
+
+def test_report_changes_nothing_when_a_section_is_missing(company):
+    before = company.model_copy(deep=True)
+    result, delta = run(
+        agent.generate_report, company, strategy_type="community",
+        strategy_name="Community-Led", summary="Grow through the user community.",
+    )
+    assert result["success"] is False
+    assert delta is None and company == before
+
+
+def test_batch_providers_apply_together_and_report_the_cut():
+    state = AppState()
+    limit = agent.MAX_RECOMMENDED_PROVIDERS
+    items = [recommendation(f"Tool {i}", 0.5 + i / 100) for i in range(limit)]
+    items.insert(1, recommendation("Clay", 0.1))
+    result, delta = run(agent.add_provider_recommendations, state, providers=items)
+    assert len(state.recommended_providers) == limit and "clay" not in state.recommended_providers
+    assert result["message"] == (
+        f"Added {limit} providers to your recommendations. "
+        f"Clay scored below the {limit} providers already recommended."
+    )
+    # One STATE_DELTA for the whole batch.
+    assert all(op["path"].startswith("/recommended_providers") for op in delta)
+
+
+def test_batch_providers_upsert_by_slug():
+    state = AppState()
+    run(agent.add_provider_recommendations, state, providers=[recommendation("HubSpot", 0.5)])
+    run(agent.add_provider_recommendations, state, providers=[recommendation("HubSpot", 0.8)])
+    assert [p.match_score for p in state.recommended_providers.values()] == [0.8]
+
+
+def test_batch_use_cases_append():
+    state = AppState(use_cases=[story("First")])
+    result, delta = run(agent.add_use_cases, state, use_cases=[story("Second"), story("Third")])
+    assert [u.company_name for u in state.use_cases] == ["First", "Second", "Third"]
+    assert result["message"] == "Added 2 case studies to your report."
+    assert delta is not None
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from src.response_cache import ReplyCache, normalize_turn
+
+PROMPT = "You are a GTM advisor."
+
+
+def user(text):
+    return {"role": "user", "parts": [text]}
+
+
+def model(text):
+    return {"role": "model", "parts": [text]}
+
+
+async def tokens(parts, fail=False):
+    for part in parts:
+        yield part
+    if fail:
+        raise RuntimeError("stream dropped")
+
+
+def record(cache, key, turn, parts, fail=False):
+    async def run():
+        out = []
+        try:
+            async for token in cache.record(key, turn, tokens(parts, fail)):
+                out.append(token)
+        except RuntimeError:
+            pass
+        return out
+
+    return asyncio.run(run())
+
+
+def test_normalize_turn():
+    assert normalize_turn("  Hello!!  ") == normalize_turn("hello") == "hello"
+    assert normalize_turn("What's PLG?") == "what's plg"
+
+
+def test_equivalent_transcripts_share_a_key():
+    cache = ReplyCache()
+    assert cache.key(PROMPT, [user("Hello!")]) == cache.key(PROMPT, [user("hello")])
+    # An empty transcript is answered as a "Hello".
+    assert cache.key(PROMPT, []) == cache.key(PROMPT, [user("Hello")])
+    assert cache.key(PROMPT, [user("Hello")]) != cache.key("Other context", [user("Hello")])
+    assert cache.key(PROMPT, [user("Hi"), model("Hey!"), user("What is PLG?")]) != cache.key(
+        PROMPT, [user("Hi"), model("Welcome."), user("What is PLG?")]
+    )
+
+
+def test_uncacheable_transcripts():
+    cache = ReplyCache(context_turns=2, max_turn_chars=20)
+    assert cache.key(PROMPT, [user("a"), model("b"), user("c"), model("d"), user("e")]) is None
+    assert cache.key(PROMPT, [user("x" * 21)]) is None
+    assert cache.key(PROMPT, [user("?!")]) is None
+    assert ReplyCache(max_entries=0).key(PROMPT, [user("Hello")]) is None
+    assert cache.get(None) is None
+
+
+def test_completed_reply_is_served_next_time():
+    cache = ReplyCache()
+    key = cache.key(PROMPT, [user("Hello")])
+    assert cache.get(key) is None
+    assert record(cache, key, "Hello", ["Hi! ", "What does ", "your company do? "]) == [
+        "Hi! ", "What does ", "your company do? ",
+    ]
+    assert cache.get(key) == "Hi! What does your company do?"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stored"]) == (1, 1, 1)
+    assert stats["top"][0]["turn"] == "hello" and stats["top"][0]["hits"] == 1
+
+
+@pytest.mark.parametrize("parts, fail", [(["Hi! ", "What"], True), ([" ", ""], False)])
+def test_failed_or_blank_replies_are_not_stored(parts, fail):
+    cache = ReplyCache()
+    key = cache.key(PROMPT, [user("Hello")])
+    record(cache, key, "Hello", parts, fail=fail)
+    assert len(cache) == 0
+
+
+def test_entries_expire():
+    cache = ReplyCache(ttl=-1)
+    key = cache.key(PROMPT, [user("Hello")])
+    record(cache, key, "Hello", ["Hi!"])
+    assert cache.get(key) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entries_go_first():
+    cache = ReplyCache(max_entries=2)
+    keys = [cache.key(PROMPT, [user(text)]) for text in ("one", "two", "three")]
+    record(cache, keys[0], "one", ["1"])
+    record(cache, keys[1], "two", ["2"])
+    cache.get(keys[0])
+    record(cache, keys[2], "three", ["3"])
+    assert [cache.get(k) for k in keys] == ["1", None, "3"]
+    assert cache.evictions == 1
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,79 @@
+import pytest
+
+from src.roi import normalize_industry, normalize_stage, normalize_strategy, project_roi
+
+
+@pytest.mark.parametrize("raw, key", [
+    ("Series A", "series_a"), ("pre-seed", "pre_seed"), ("Seed", "seed"),
+    ("scale-up", "growth"), ("Series C", "growth"), ("bootstrapped", None), (None, None),
+])
+def test_normalize_stage(raw, key):
+    assert normalize_stage(raw) == key
+
+
+@pytest.mark.parametrize("raw, key", [
+    ("B2B Payments", "fintech"), ("Developer API platform", "devtools"),
+    ("Enterprise software", "saas"), ("Farming", None), ("", None),
+])
+def test_normalize_industry(raw, key):
+    assert normalize_industry(raw) == key
+
+
+@pytest.mark.parametrize("raw, key", [
+    ("PLG", "plg"), ("product-led", "plg"), ("Sales Led", "sales_led"),
+    ("hybrid", "hybrid"), ("community", None), (None, None),
+])
+def test_normalize_strategy(raw, key):
+    assert normalize_strategy(raw) == key
+
+
+def test_same_profile_gets_the_same_projection():
+    a = project_roi("Series A", "fintech", "sales_led", 50_000)
+    b = project_roi("series-a", "Fintech payments", "sales-led", 50_000.001)
+    assert a == b
+
+
+def test_percentiles_are_ordered_and_consistent():
+    e = project_roi("seed", "saas", "plg", 15_000)
+    for band in (e.cac, e.ltv, e.payback_months):
+        assert band[0] < band[1] < band[2]
+    assert e.monthly_new_customers == pytest.approx(15_000 / e.cac[1])
+    assert e.scenarios == 5000
+
+
+def test_motion_and_stage_move_the_benchmarks():
+    plg = project_roi("series_a", "saas", "plg", None)
+    sales = project_roi("series_a", "saas", "sales_led", None)
+    assert plg.cac[1] < sales.cac[1]
+    assert project_roi("seed", "saas", "hybrid", None).cac[1] < project_roi("growth", "saas", "hybrid", None).cac[1]
+
+
+def test_spend_above_benchmark_raises_cac():
+    assert project_roi("seed", "saas", "hybrid", 150_000).cac[1] > project_roi("seed", "saas", "hybrid", 15_000).cac[1]
+
+
+def test_unknown_inputs_fall_back_and_lower_confidence():
+    guess = project_roi(None, "farming", None, None)
+    assert (guess.stage, guess.industry, guess.strategy_type) == ("seed", "generic", "hybrid")
+    assert guess.monthly_new_customers is None
+    assert guess.confidence == "low"
+    assert project_roi("series_b", "saas", "sales_led", 150_000).confidence in ("high", "medium")
+
+
+def test_notes_summarize_the_run():
+    notes = project_roi("series_a", "fintech", "sales_led", 50_000, scenarios=1000).notes
+    assert notes.startswith("Benchmarks for a series a fintech company with a sales-led motion (1,000 scenarios).")
+    assert "new customers/month" in notes
+    assert "new customers/month" not in project_roi("seed", None, None, None).notes
+
+
+def test_report_projection_uses_the_median():
+    from src.agent import AppState, build_roi_projection
+
+    state = AppState(stage="seed", industry="SaaS", budget=15_000)
+    projection, ratio = build_roi_projection(state, None, notes="Assumes a hybrid motion.")
+    estimate = project_roi("seed", "SaaS", None, 15_000)
+    assert projection.estimated_cac == round(estimate.cac[1], 2)
+    assert projection.payback_months >= 1
+    assert projection.notes.endswith("Assumes a hybrid motion.")
+    assert ratio == round(estimate.ltv_cac_ratio, 1)
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+from conftest import loaded_catalog
+
+from src.search_index import INDEX_DIM, SearchIndex, _bucket, build_matrix, terms
+
+ARTICLES = [
+    {"id": 1, "slug": "abm-guide", "title": "Account-based marketing guide",
+     "excerpt": "How to run ABM programs.", "meta_description": None,
+     "content": "<p>Account-based <b>marketing</b> for enterprise pipeline.</p>",
+     "guide_type": "guide", "category": "abm"},
+]
+
+
+class ArticlesPool:
+    def __init__(self, rows=None, error=None):
+        self.rows, self.error = rows or [], error
+
+    async def fetch_all(self, query, params=None):
+        if self.error:
+            raise self.error
+        return [dict(r) for r in self.rows]
+
+
+def index(agencies, directory=None, articles=ARTICLES, **kwargs) -> SearchIndex:
+    s = SearchIndex(loaded_catalog(agencies), ArticlesPool(articles), directory, **kwargs)
+    asyncio.run(s.refresh())
+    return s
+
+
+def dense(matrix) -> np.ndarray:
+    n = int(matrix.indices.max()) + 1
+    out = np.zeros((INDEX_DIM, n), dtype=np.float32)
+    for b in np.flatnonzero(np.diff(matrix.indptr)):
+        a, e = matrix.indptr[b], matrix.indptr[b + 1]
+        out[b, matrix.indices[a:e]] = matrix.data[a:e]
+    return out
+
+
+def test_terms_drop_stopwords_and_add_bigrams():
+    assert terms("The ABM and Demand-Gen agency") == [
+        "abm", "demand", "gen", "agency", "abm demand", "demand gen", "gen agency",
+    ]
+
+
+def test_matrix_is_csr_with_unit_documents():
+    docs = [{"text": "abm demand generation"}, {"text": "seo content seo"}]
+    matrix, idf = build_matrix(docs)
+    assert matrix.indptr.shape == (INDEX_DIM + 1,)
+    assert matrix.data.size == matrix.indices.size == matrix.indptr[-1]
+    weights = dense(matrix)
+    assert np.allclose(np.linalg.norm(weights, axis=0), 1.0, atol=1e-3)
+    assert weights[_bucket("seo"), 1] > weights[_bucket("content"), 1] > 0
+    assert weights[_bucket("seo"), 0] == 0
+    assert idf.dtype == np.float32
+
+
+def test_search_ranks_and_filters_by_kind(agencies):
+    s = index(agencies)
+    assert len(s) == 5  # four published agencies and one article
+    hits = s.search("product led growth startups")
+    assert hits[0].slug == "agency-2" and hits[0].url == "/agency/agency-2"
+    assert [h.kind for h in s.search("account based marketing", kind="article")] == ["article"]
+    assert all(h.kind == "agency" for h in s.search("abm", kind="agency"))
+    assert s.search("zzz unknown") == []
+    assert s.search("the and") == []
+    assert s.search("abm", limit=0) == []
+
+
+def test_articles_failure_still_indexes_agencies(agencies):
+    s = SearchIndex(loaded_catalog(agencies), ArticlesPool(error=RuntimeError("down")), None)
+    asyncio.run(s.refresh())
+    assert len(s) == 4
+
+
+def test_unchanged_documents_are_not_rebuilt(agencies):
+    s = index(agencies)
+    assert asyncio.run(s.refresh()) is False
+
+
+def test_without_a_directory_nothing_is_written(agencies, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    s = index(agencies)
+    assert s.is_ready and s._load_saved() is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_saved_build_is_mapped_on_start(agencies, tmp_path):
+    first = index(agencies, str(tmp_path))
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == 2 and names[1] == "meta.json" and names[0].startswith("build-")
+    assert sorted(os.listdir(tmp_path / names[0])) == ["data.npy", "idf.npy", "indices.npy", "indptr.npy"]
+
+    second = SearchIndex(first.catalog, ArticlesPool(), str(tmp_path))
+    second._built = second._load_saved()
+    assert isinstance(second._built.matrix.data, np.memmap)
+    assert [h.slug for h in second.search("fintech outbound")] == [h.slug for h in first.search("fintech outbound")]
+
+
+def test_corrupt_build_is_ignored(agencies, tmp_path):
+    s = index(agencies, str(tmp_path))
+    build = next(n for n in os.listdir(tmp_path) if n.startswith("build-"))
+    np.save(tmp_path / build / "indptr.npy", np.zeros(3, dtype=np.int64))
+    assert s._load_saved() is None
+
+
+def test_workers_saving_the_same_build_share_it(agencies, tmp_path):
+    index(agencies, str(tmp_path))
+    other = index(agencies, str(tmp_path))
+    assert other.search("abm")
+    assert len([n for n in os.listdir(tmp_path) if n.startswith("build-")]) == 1
+
+
+def test_prune_keeps_recent_builds_for_other_workers(agencies, tmp_path):
+    s = index(agencies, str(tmp_path), keep_seconds=60)
+    old = next(n for n in os.listdir(tmp_path) if n.startswith("build-"))
+    stale = tmp_path / "staging-abandoned"
+    stale.mkdir()
+    long_ago = time.time() - 3600
+    os.utime(tmp_path / old, (long_ago, long_ago))
+    os.utime(stale, (long_ago, long_ago))
+
+    s.catalog.rows["agency-1"]["description"] = "Now mostly events."
+    assert asyncio.run(s.refresh()) is True
+    # The superseded build was just touched, so it outlives this prune...
+    assert old in os.listdir(tmp_path)
+    assert not stale.exists()
+
+    # ...and goes once its grace period has passed.
+    os.utime(tmp_path / old, (long_ago, long_ago))
+    s._prune(keep=s._built.fingerprint)
+    assert old not in os.listdir(tmp_path)
+    assert len(s._load_saved().docs) == 5
@@ -0,0 +1,172 @@
+import asyncio
+import dataclasses
+from typing import Optional
+
+from pydantic import BaseModel
+
+from src.sessions import SessionDeps, SessionStore, Snapshot
+
+
+class State(BaseModel):
+    company_name: Optional[str] = None
+    budget: Optional[float] = None
+    notes: list[str] = []
+
+
+def store(**kwargs) -> SessionStore:
+    return SessionStore(State, **kwargs)
+
+
+def test_new_threads_load_as_none():
+    async def scenario():
+        s = store()
+        return await s.load("t"), await s.load("")
+
+    assert asyncio.run(scenario()) == ((None, None), (None, None))
+
+
+def test_save_then_load_bumps_the_version():
+    async def scenario():
+        s = store()
+        state = State(company_name="Acme")
+        await s.save("t", state, Snapshot.of(state))
+        loaded, base = await s.load("t")
+        loaded.budget = 5000
+        await s.save("t", loaded, base)
+        return await s.load("t")
+
+    state, base = asyncio.run(scenario())
+    assert (state.company_name, state.budget, base.version) == ("Acme", 5000, 2)
+
+
+def test_least_recently_used_sessions_are_evicted():
+    async def scenario():
+        s = store(max_sessions=2)
+        for tid in ("a", "b"):
+            await s.save(tid, State(), Snapshot.of(State()))
+        await s.load("a")
+        await s.save("c", State(), Snapshot.of(State()))
+        return [(await s.load(tid))[0] is not None for tid in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+
+
+def test_byte_cap_keeps_the_newest_session():
+    async def scenario():
+        s = store(max_bytes=200)
+        big = State(notes=["x" * 150])
+        await s.save("a", big, Snapshot.of(big))
+        await s.save("b", big, Snapshot.of(big))
+        return len(s), s.total_bytes, (await s.load("b"))[0] == big
+
+    count, total, kept = asyncio.run(scenario())
+    assert (count, kept) == (1, True)
+    assert total < 200
+
+
+def test_sweep_drops_idle_sessions():
+    async def scenario():
+        s = store(idle_ttl=0)
+        await s.save("t", State(), Snapshot.of(State()))
+        return s.sweep(), len(s), s.total_bytes
+
+    assert asyncio.run(scenario()) == (1, 0, 0)
+
+
+def test_deps_track_the_replaced_state():
+    deps = SessionDeps(state=State(), thread_id="t")
+    replaced = dataclasses.replace(deps, state=State(company_name="Acme"))
+    assert deps.live_state is replaced.state
+
+
+def test_concurrent_saves_in_one_worker_merge():
+    async def scenario():
+        s = store()
+        await s.save("t", State(), Snapshot.of(State()))
+        first, first_base = await s.load("t")
+        second, second_base = await s.load("t")
+        first = first.model_copy(update={"company_name": "Acme"})
+        second = second.model_copy(update={"budget": 9000})
+        await s.save("t", first, first_base)
+        await s.save("t", second, second_base)
+        return await s.load("t")
+
+    state, base = asyncio.run(scenario())
+    assert (state.company_name, state.budget, base.version) == ("Acme", 9000, 3)
+
+
+def test_workers_sharing_sqlite_merge_instead_of_overwriting(tmp_path):
+    path = str(tmp_path / "sessions.db")
+
+    async def scenario():
+        a, b = store(sqlite_path=path), store(sqlite_path=path)
+        await a.open()
+        await b.open()
+        seed = State(company_name="Acme")
+        await a.save("t", seed, Snapshot.of(seed))
+        mine, mine_base = await a.load("t")
+        theirs, theirs_base = await b.load("t")
+        await b.save("t", theirs.model_copy(update={"budget": 9000, "notes": ["b"]}), theirs_base)
+        stored = await a.save("t", mine.model_copy(update={"notes": ["a"]}), mine_base)
+        fresh = store(sqlite_path=path)
+        await fresh.open()
+        result = stored, await fresh.load("t")
+        for s in (a, b, fresh):
+            await s.close()
+        return result
+
+    stored, (reloaded, base) = asyncio.run(scenario())
+    # The fields each worker changed survive; on the same field the later save wins.
+    assert stored == reloaded == State(company_name="Acme", budget=9000, notes=["a"])
+    assert base.version == 3
+
+
+def test_new_thread_created_by_two_workers(tmp_path):
+    path = str(tmp_path / "sessions.db")
+
+    async def scenario():
+        a, b = store(sqlite_path=path), store(sqlite_path=path)
+        await a.open()
+        await b.open()
+        empty = State()
+        await a.save("t", State(company_name="Acme"), Snapshot.of(empty))
+        await b.save("t", State(budget=100), Snapshot.of(empty))
+        result = await a.load("t")
+        await a.close()
+        await b.close()
+        return result
+
+    state, base = asyncio.run(scenario())
+    assert (state.company_name, state.budget, base.version) == ("Acme", 100, 2)
+
+
+def test_evicted_sessions_come_back_from_sqlite(tmp_path):
+    async def scenario():
+        s = store(sqlite_path=str(tmp_path / "sessions.db"), max_sessions=1)
+        await s.open()
+        for tid in ("a", "b"):
+            state = State(company_name=tid)
+            await s.save(tid, state, Snapshot.of(state))
+        result = await s.load("a")
+        await s.close()
+        return result
+
+    state, base = asyncio.run(scenario())
+    assert (state.company_name, base.version) == ("a", 1)
+
+
+def test_save_after_purge_reinserts(tmp_path):
+    async def scenario():
+        s = store(sqlite_path=str(tmp_path / "sessions.db"), sqlite_ttl=-1)
+        await s.open()
+        await s.save("t", State(), Snapshot.of(State()))
+        state, base = await s.load("t")
+        s._purge_sqlite()
+        await s.save("t", state.model_copy(update={"budget": 1.0}), base)
+        result = s._read_sqlite("t", 0)
+        await s.close()
+        return result
+
+    version, payload = asyncio.run(scenario())
+    assert version == 2
+    assert State.model_validate_json(payload).budget == 1.0
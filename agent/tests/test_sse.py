@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+
+from src.sse import ChunkFrames, coalesce
+
+
+async def _burst(frames, delay=0.0, error=None):
+    for frame in frames:
+        yield frame
+        await asyncio.sleep(delay)
+    if error is not None:
+        raise error
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+FRAMES = [f"data: {i}\n\n" for i in range(20)]
+EXPECTED = "".join(FRAMES).encode()
+
+
+def test_zero_interval_passes_frames_through():
+    writes = asyncio.run(_collect(coalesce(_burst(FRAMES), flush_interval=0)))
+    assert writes == [frame.encode() for frame in FRAMES]
+
+
+def test_first_frame_goes_out_alone_then_bursts_merge():
+    writes = asyncio.run(_collect(coalesce(_burst(FRAMES), flush_interval=0.05, max_bytes=1 << 20)))
+    assert writes[0] == FRAMES[0].encode()
+    assert len(writes) < len(FRAMES)
+    assert b"".join(writes) == EXPECTED
+
+
+def test_bytes_frames_are_kept():
+    writes = asyncio.run(_collect(coalesce(_burst([b"a", "b", b"c"]), flush_interval=0.01)))
+    assert b"".join(writes) == b"abc"
+
+
+def test_max_bytes_flushes_early():
+    big = ["x" * 100] * 10
+    writes = asyncio.run(_collect(coalesce(_burst(big), flush_interval=10, max_bytes=250)))
+    assert b"".join(writes) == b"x" * 1000
+    assert all(len(w) <= 300 for w in writes)
+
+
+def test_error_is_raised_after_flushing():
+    async def scenario():
+        writes = []
+        with pytest.raises(RuntimeError, match="upstream"):
+            async for chunk in coalesce(
+                _burst(FRAMES[:3], error=RuntimeError("upstream")), flush_interval=0.05
+            ):
+                writes.append(chunk)
+        return writes
+
+    writes = asyncio.run(scenario())
+    assert b"".join(writes) == "".join(FRAMES[:3]).encode()
+
+
+def test_empty_stream_writes_nothing():
+    assert asyncio.run(_collect(coalesce(_burst([]), flush_interval=0.01))) == []
+
+
+def test_chunk_frames_are_valid_sse_json():
+    frame = ChunkFrames('id-"1"').content('He said "hi"\n')
+    assert frame.startswith("data: ") and frame.endswith("\n\n")
+    body = json.loads(frame[len("data: "):])
+    assert body["id"] == 'id-"1"'
+    assert body["choices"][0]["delta"]["content"] == 'He said "hi"\n'
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from src.startup import WarmUp
+
+
+def _failing(times: int):
+    calls = {"n": 0}
+
+    async def step():
+        calls["n"] += 1
+        if calls["n"] <= times:
+            raise ConnectionError("password=hunter2 host unreachable")
+
+    return step, calls
+
+
+async def _ok():
+    pass
+
+
+def test_ready_once_every_step_succeeded():
+    async def scenario():
+        warm_up = WarmUp()
+        assert not warm_up.ready
+        warm_up.start({"database": _ok, "catalog": _ok})
+        assert warm_up.report() == {"ready": False, "steps": {"database": "pending", "catalog": "pending"}}
+        await warm_up.wait()
+        return warm_up.report()
+
+    assert asyncio.run(scenario()) == {"ready": True, "steps": {"database": "ok", "catalog": "ok"}}
+
+
+def test_not_ready_while_a_step_is_failing_and_ready_after_retry():
+    step, calls = _failing(1)
+
+    async def scenario():
+        warm_up = WarmUp(retry_max=0.01)
+        warm_up.start({"database": step, "catalog": _ok})
+        while not warm_up.done:
+            await asyncio.sleep(0)
+        failed = warm_up.report()
+        await warm_up.wait()
+        return failed, warm_up.report()
+
+    failed, recovered = asyncio.run(scenario())
+    assert failed == {"ready": False, "steps": {"database": "failed", "catalog": "ok"}}
+    # No error text in the public report.
+    assert "hunter2" not in json.dumps(failed)
+    assert recovered["ready"] and calls["n"] == 2
+
+
+def test_stop_cancels_retries():
+    step, calls = _failing(10**6)
+
+    async def scenario():
+        warm_up = WarmUp()
+        warm_up.start({"database": step})
+        while not warm_up.done:
+            await asyncio.sleep(0)
+        await warm_up.stop()
+        return warm_up.ready
+
+    assert asyncio.run(scenario()) is False
+    assert calls["n"] == 1
+
+
+def test_ready_endpoint_fails_until_every_step_is_ok(monkeypatch):
+    from src import agent
+
+    monkeypatch.setattr(agent.warm_up, "steps", {"database": "failed", "catalog": "ok"})
+    response = asyncio.run(agent.readiness_check())
+    assert response.status_code == 503
+    assert json.loads(response.body)["steps"] == {"database": "failed", "catalog": "ok"}
+
+    monkeypatch.setattr(agent.warm_up, "steps", {"database": "ok", "catalog": "ok"})
+    assert asyncio.run(agent.readiness_check()).status_code == 200
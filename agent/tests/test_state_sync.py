@@ -0,0 +1,87 @@
+import copy
+
+import pytest
+
+from src.state_sync import json_patch
+
+
+def _parent(doc, path):
+    tokens = [t.replace("~1", "/").replace("~0", "~") for t in path.split("/")[1:]]
+    target = doc
+    for token in tokens[:-1]:
+        target = target[int(token)] if isinstance(target, list) else target[token]
+    return target, tokens[-1]
+
+
+def apply_patch(doc, ops):
+    """Minimal RFC 6902 add/remove/replace, as the frontend applies them."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        parent, key = _parent(doc, op["path"])
+        if isinstance(parent, list):
+            index = int(key)
+            if op["op"] == "add":
+                parent.insert(index, op["value"])
+            elif op["op"] == "remove":
+                del parent[index]
+            else:
+                parent[index] = op["value"]
+        elif op["op"] == "remove":
+            del parent[key]
+        else:
+            parent[key] = op["value"]
+    return doc
+
+
+STATE = {
+    "company_name": "Acme",
+    "budget": 10000.0,
+    "strategy": {"name": "PLG", "type": "plg", "action_items": ["a", "b"]},
+    "recommended_providers": [{"slug": "one", "match_score": 0.9}],
+    "timeline_phases": [],
+}
+
+
+@pytest.mark.parametrize("after", [
+    STATE,
+    {**STATE, "company_name": "Acme Inc"},
+    {**STATE, "budget": None},
+    {**STATE, "strategy": None},
+    {**STATE, "strategy": {**STATE["strategy"], "action_items": ["a", "b", "c"]}},
+    {**STATE, "strategy": {**STATE["strategy"], "action_items": ["a"]}},
+    {**STATE, "strategy": {**STATE["strategy"], "action_items": ["x", "b"]}},
+    {**STATE, "strategy": {**STATE["strategy"], "action_items": ["b"]}},
+    {**STATE, "recommended_providers": [{"slug": "one", "match_score": 0.5}, {"slug": "two"}]},
+    {**STATE, "timeline_phases": [{"name": "Foundation", "activities": []}]},
+    {k: v for k, v in STATE.items() if k != "budget"},
+    {**STATE, "new/field~": 1},
+])
+def test_patch_round_trips(after):
+    assert apply_patch(STATE, json_patch(STATE, after)) == after
+
+
+def test_no_change_is_empty():
+    assert json_patch(STATE, copy.deepcopy(STATE)) == []
+
+
+def test_append_only_adds_new_items():
+    after = {**STATE, "recommended_providers": STATE["recommended_providers"] + [{"slug": "two"}]}
+    assert json_patch(STATE, after) == [
+        {"op": "add", "path": "/recommended_providers/1", "value": {"slug": "two"}},
+    ]
+
+
+def test_truncate_removes_from_the_end():
+    before = {"items": [1, 2, 3, 4]}
+    ops = json_patch(before, {"items": [1, 2]})
+    assert ops == [{"op": "remove", "path": "/items/3"}, {"op": "remove", "path": "/items/2"}]
+    assert apply_patch(before, ops) == {"items": [1, 2]}
+
+
+def test_keys_are_escaped():
+    assert json_patch({}, {"a/b~c": 1}) == [{"op": "add", "path": "/a~1b~0c", "value": 1}]
+
+
+def test_root_must_be_an_object():
+    with pytest.raises(ValueError):
+        json_patch({"a": 1}, "a")
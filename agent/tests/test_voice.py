@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from src.voice import phrase_chunks
+
+
+async def _tokens(tokens):
+    for token in tokens:
+        yield token
+
+
+def chunks(tokens, **kwargs):
+    async def collect():
+        return [p async for p in phrase_chunks(_tokens(tokens), **kwargs)]
+    return asyncio.run(collect())
+
+
+def test_cuts_at_sentence_ends_and_keeps_the_space():
+    text = "Thanks for sharing that. What stage is the company at? Great!"
+    assert chunks(list(text)) == ["Thanks for sharing that. ", "What stage is the company at? ", "Great!"]
+
+
+def test_short_clauses_wait_for_min_chars():
+    assert chunks(["Yes, ", "that works well for us."]) == ["Yes, that works well for us."]
+
+
+def test_boundary_needs_following_whitespace():
+    # "3.5x" must not be split after "3."
+    assert chunks(["We expect 3.", "5x growth this year. ", "Next"]) == [
+        "We expect 3.5x growth this year. ",
+        "Next",
+    ]
+
+
+def test_newline_is_a_boundary():
+    assert chunks(["First line here\nSecond line"]) == ["First line here\n", "Second line"]
+
+
+def test_force_cut_at_last_space_before_max_chars():
+    words = "word " * 40
+    phrases = chunks([words], min_chars=12, max_chars=30)
+    assert all(len(p) <= 30 for p in phrases)
+    assert all(p.endswith(" ") for p in phrases[:-1])
+    assert "".join(phrases) == words.rstrip()
+
+
+def test_force_cut_without_spaces_at_max_chars():
+    assert chunks(["x" * 25], max_chars=10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+@pytest.mark.parametrize("tokens", [[], [""], ["   "], ["\n"]])
+def test_blank_output_yields_nothing(tokens):
+    assert chunks(tokens) == []
+
+
+def test_final_phrase_is_rstripped():
+    assert chunks(["No boundary at the end   "]) == ["No boundary at the end"]
@@ -0,0 +1,200 @@
+import asyncio
+
+from src.compaction import HistoryCompactor
+from src.voice_sessions import VoiceSessionStore, group_turns, transcript, voice_instruction
+
+PROMPT = "You are a GTM advisor."
+
+
+class FakeChat:
+    def __init__(self, instruction, history):
+        self.instruction = instruction
+        self.history = list(history)
+        self.sent: list[str] = []
+
+
+class FakeModel:
+    def __init__(self, instruction):
+        self.instruction = instruction
+
+    def start_chat(self, history):
+        return FakeChat(self.instruction, history)
+
+
+async def send(chat, message):
+    chat.sent.append(message)
+    reply = f"reply {len(chat.sent)}"
+    chat.history += [user(message), model(reply)]
+    for word in reply.split(" "):
+        yield word
+
+
+async def failing_send(chat, message):
+    yield "partial"
+    raise RuntimeError("stream dropped")
+
+
+def user(text):
+    return {"role": "user", "parts": [text]}
+
+
+def model(text):
+    return {"role": "model", "parts": [text]}
+
+
+def store(**kwargs) -> VoiceSessionStore:
+    return VoiceSessionStore(FakeModel, **kwargs)
+
+
+def turn(s, turns, session_id="s1", prompt=PROMPT, sender=send):
+    """Run one CLM turn; returns the chat it ran on and the streamed tokens."""
+    async def run():
+        chats = []
+
+        async def spy(chat, message):
+            chats.append(chat)
+            async for token in sender(chat, message):
+                yield token
+
+        tokens = []
+        try:
+            async for token in s.stream_turn(session_id, prompt, turns, spy):
+                tokens.append(token)
+        except RuntimeError:
+            pass
+        return chats[0], tokens
+
+    return asyncio.run(run())
+
+
+def test_transcript_keeps_user_and_assistant_turns():
+    messages = [
+        {"role": "system", "content": "ignored"},
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello!"},
+        {"role": "tool", "content": "ignored"},
+    ]
+    assert transcript(messages) == [user("Hi"), model("Hello!")]
+    assert group_turns([model("intro"), user("a"), model("b"), user("c")]) == [
+        [model("intro")], [user("a"), model("b")], [user("c")],
+    ]
+
+
+def test_continuation_sends_only_the_new_message():
+    s = store()
+    first, tokens = turn(s, [user("Hi")])
+    assert tokens == ["reply", "1"]
+    assert first.instruction == voice_instruction(PROMPT)
+    second, _ = turn(s, [user("Hi"), model("reply 1"), user("We sell to banks")])
+    assert second is first
+    assert first.sent == ["Hi", "We sell to banks"]
+    assert (s.reused, s.rebuilt) == (1, 1)
+
+
+def test_transcript_without_our_reply_is_still_a_continuation():
+    s = store()
+    first, _ = turn(s, [user("Hi")])
+    second, _ = turn(s, [user("Hi"), user("Are you there?")])
+    assert second is first
+
+
+def test_changed_last_turn_rebuilds_the_chat():
+    s = store()
+    first, _ = turn(s, [user("Hi")])
+    # Same growth, but the turn the chat last saw is not where it left off.
+    turns = [user("Something else"), model("reply 1"), user("We sell to banks")]
+    second, _ = turn(s, turns)
+    assert second is not first
+    assert second.history[:2] == turns[:2]
+    assert (s.reused, s.rebuilt) == (0, 2)
+
+
+def test_synthetic_greeting_is_not_mistaken_for_the_transcript():
+    s = store()
+    first, _ = turn(s, [])
+    assert first.sent == ["Hello"]
+    second, _ = turn(s, [user("Hi there"), model("reply 1"), user("Next")])
+    assert second is not first
+
+
+def test_prompt_change_rebuilds_the_chat():
+    s = store()
+    first, _ = turn(s, [user("Hi")])
+    second, _ = turn(s, [user("Hi"), model("reply 1"), user("Next")], prompt="Other context")
+    assert second is not first
+    assert second.instruction == voice_instruction("Other context")
+
+
+def test_unfinished_turn_drops_the_chat():
+    s = store()
+    first, tokens = turn(s, [user("Hi")], sender=failing_send)
+    assert tokens == ["partial"]
+    second, _ = turn(s, [user("Hi"), model("partial"), user("Next")])
+    assert second is not first
+
+
+def test_overlapping_turn_gets_its_own_chat():
+    async def scenario():
+        s = store()
+        first = s.stream_turn("s1", PROMPT, [user("Hi")], send)
+        await first.__anext__()  # still streaming: the session is busy
+        second = s.stream_turn("s1", PROMPT, [user("Hi"), user("Wait")], send)
+        await second.__anext__()
+        return s.rebuilt
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_anonymous_turns_are_not_stored():
+    s = store()
+    turn(s, [user("Hi")], session_id=None)
+    assert len(s) == 0
+
+
+def test_sessions_are_capped_and_expire():
+    s = store(max_sessions=2)
+    for sid in ("a", "b", "c"):
+        turn(s, [user("Hi")], session_id=sid)
+    assert list(s._sessions) == ["b", "c"]
+    s.idle_ttl = -1
+    s._expire()
+    assert len(s) == 0
+
+
+def test_models_are_cached_per_prompt():
+    s = store(max_models=2)
+    a = s.model("a")
+    assert s.model("a") is a
+    s.model("b")
+    s.model("c")
+    assert s.model("a") is not a
+    assert s.add_model("c", FakeModel("other")) is s.model("c")
+
+
+def test_compacted_history_replaces_old_exchanges():
+    async def summarize(previous, new_turns, max_words):
+        return f"summary of {len(new_turns)} exchanges"
+
+    long = "word " * 40
+    turns = [user("Hi"), model(long), user("More"), model(long), user("Next")]
+
+    async def scenario():
+        compactor = HistoryCompactor(
+            summarize, keep_turns=1, trigger_tokens=20, summary_tokens=20, batch_turns=1,
+        )
+        s = store(compactor=compactor)
+        async for _ in s.stream_turn("s1", PROMPT, turns, send):
+            pass
+        first = s._sessions["s1"].chat
+        await asyncio.gather(*compactor._tasks.values())
+        async for _ in s.stream_turn("s1", PROMPT, turns + [model("reply 1"), user("And then?")], send):
+            pass
+        return first, s._sessions["s1"].chat
+
+    first, second = asyncio.run(scenario())
+    assert second is not first
+    assert second.history[0]["parts"][0].startswith("Summary of the earlier conversation: summary of")
+    assert user("Hi") not in second.history
+    # The recent exchanges follow, then the turn just sent.
+    assert second.history[-4:-2] == [user("Next"), model("reply 1")]
+    assert second.sent == ["And then?"]
@@ -54,7 +54,7 @@ async function getAgenciesForLocation(locationName: string): Promise<Agency[]> {
            overview, key_services, avg_rating, review_count
     FROM companies
     WHERE app = 'gtm' AND status = 'published'
-      AND (headquarters ILIKE ${'%' + locationName + '%'} OR ${locationName} = ANY(service_areas))
+      AND (headquarters ILIKE ${'%' + locationName + '%'} OR service_areas @> ARRAY[${locationName}]::text[])
     ORDER BY global_rank NULLS LAST
   `;
   return results as Agency[];
@@ -69,7 +69,7 @@ async function getAgenciesForCategory(categoryName: string): Promise<Agency[]> {
            overview, key_services, avg_rating, review_count
     FROM companies
     WHERE app = 'gtm' AND status = 'published'
-      AND ${categoryName} = ANY(category_tags)
+      AND category_tags @> ARRAY[${categoryName}]::text[]
     ORDER BY global_rank NULLS LAST
   `;
   return results as Agency[];
@@ -84,8 +84,8 @@ async function getAgenciesForCityCategory(categoryName: string, locationName: st
            overview, key_services, avg_rating, review_count
     FROM companies
     WHERE app = 'gtm' AND status = 'published'
-      AND ${categoryName} = ANY(category_tags)
-      AND (headquarters ILIKE ${'%' + locationName + '%'} OR ${locationName} = ANY(service_areas))
+      AND category_tags @> ARRAY[${categoryName}]::text[]
+      AND (headquarters ILIKE ${'%' + locationName + '%'} OR service_areas @> ARRAY[${locationName}]::text[])
     ORDER BY global_rank NULLS LAST
   `;
   return results as Agency[];
@@ -100,7 +100,7 @@ async function getAgenciesForCountry(countryName: string): Promise<Agency[]> {
            overview, key_services, avg_rating, review_count
     FROM companies
     WHERE app = 'gtm' AND status = 'published'
-      AND (${countryName} = ANY(service_areas) OR headquarters ILIKE ${'%' + countryName + '%'})
+      AND (service_areas @> ARRAY[${countryName}]::text[] OR headquarters ILIKE ${'%' + countryName + '%'})
     ORDER BY global_rank NULLS LAST
   `;
   return results as Agency[];
@@ -30,7 +30,7 @@ export async function GET(request: NextRequest) {
              pricing_model, min_budget, avg_rating, review_count
       FROM companies
       WHERE app = 'gtm' AND status = 'published'
-        AND (headquarters ILIKE ${locationPattern} OR ${location} = ANY(service_areas))
+        AND (headquarters ILIKE ${locationPattern} OR service_areas @> ARRAY[${location}]::text[])
       ORDER BY global_rank NULLS LAST
       LIMIT ${limit}
     `;
@@ -41,7 +41,7 @@ export async function GET(request: NextRequest) {
              pricing_model, min_budget, avg_rating, review_count
       FROM companies
       WHERE app = 'gtm' AND status = 'published'
-        AND ${specialization} = ANY(specializations)
+        AND specializations @> ARRAY[${specialization}]::text[]
       ORDER BY global_rank NULLS LAST
       LIMIT ${limit}
     `;
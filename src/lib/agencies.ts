@@ -70,7 +70,7 @@ export async function getAgenciesByLocation(location: string, limit = 20): Promi
            overview, key_services, avg_rating, review_count
     FROM companies
     WHERE app = 'gtm' AND status = 'published'
-      AND (headquarters ILIKE ${locationPattern} OR ${location} = ANY(service_areas))
+      AND (headquarters ILIKE ${locationPattern} OR service_areas @> ARRAY[${location}]::text[])
     ORDER BY global_rank NULLS LAST
     LIMIT ${limit}
   `;